@@ -1,8 +1,10 @@
 from __future__ import unicode_literals, division, absolute_import
 from collections import defaultdict
+from contextlib import contextmanager
 from datetime import datetime
 import os
 import re
+import threading
 import urlparse
 
 import jsonschema
@@ -10,9 +12,17 @@ from jsonschema.compat import str_types
 
 from flexget.event import fire_event
 from flexget.utils import qualities, template
-from flexget.utils.tools import parse_timedelta
+from flexget.utils.tools import parse_timedelta, LRUCache
 
 schema_paths = {}
+# Schemas returned by resolve_ref, uri -> schema
+_resolved_refs = {}
+# Validators built for schemas, (id(schema), set_defaults) -> (schema, validator)
+_validators = LRUCache(maxsize=50, name='schema_validators')
+# Validators are reused, and they keep the scope stack of their resolver while validating
+_validate_lock = threading.RLock()
+# Paths checked by the file and path formats in the current thread, when recording
+_path_checks = threading.local()
 
 
 # TODO: Rethink how config key and schema registration work
@@ -24,6 +34,9 @@ def register_schema(path, schema):
     :param schema: The schema, or function which returns the schema
     """
     schema_paths[path] = schema
+    # Registering may change what any of the refs resolve to
+    _resolved_refs.clear()
+    _validators.clear()
 
 
 # Validator that handles root structure of config.
@@ -75,12 +88,16 @@ def one_or_more(schema):
 def resolve_ref(uri):
     """
     Finds and returns a schema pointed to by `uri` that has been registered in the register_schema function.
+    Schemas built by functions are cached until more schemas are registered.
     """
+    if uri in _resolved_refs:
+        return _resolved_refs[uri]
     parsed = urlparse.urlparse(uri)
     if parsed.path in schema_paths:
         schema = schema_paths[parsed.path]
         if callable(schema):
-            return schema(**dict(urlparse.parse_qsl(parsed.query)))
+            schema = schema(**dict(urlparse.parse_qsl(parsed.query)))
+        _resolved_refs[uri] = schema
         return schema
     raise jsonschema.RefResolutionError("%s could not be resolved" % uri)
 
@@ -95,14 +112,9 @@ def process_config(config, schema=None, set_defaults=True):
     """
     if schema is None:
         schema = get_schema()
-    resolver = RefResolver.from_schema(schema)
-    validator = SchemaValidator(schema, resolver=resolver, format_checker=format_checker)
-    if set_defaults:
-        validator.VALIDATORS['properties'] = validate_properties_w_defaults
-    try:
+    validator = _get_validator(schema, set_defaults)
+    with _validate_lock:
         errors = list(validator.iter_errors(config))
-    finally:
-        validator.VALIDATORS['properties'] = jsonschema.Draft4Validator.VALIDATORS['properties']
     # Customize the error messages
     for e in errors:
         set_error_message(e)
@@ -121,6 +133,19 @@ def parse_time(time_string):
     raise ValueError('invalid time `%s`' % time_string)
 
 
+@contextmanager
+def recording_path_checks():
+    """
+    Context manager which records the paths validated by the `file` and `path` formats within it. Yields a list which
+    gets filled with `(path, is_dir)` tuples of the paths which existed.
+    """
+    _path_checks.paths = paths = []
+    try:
+        yield paths
+    finally:
+        _path_checks.paths = None
+
+
 def parse_interval(interval_string):
     """Takes an interval string from the config and turns it into a :class:`datetime.timedelta` object."""
     regexp = r'^\d+ (second|minute|hour|day|week)s?$'
@@ -132,6 +157,24 @@ def parse_interval(interval_string):
 ## Public API end here, the rest should not be used outside this module
 
 
+def _get_validator(schema, set_defaults):
+    """Returns a validator for `schema`, reusing the one built earlier if the same schema is validated against again."""
+    key = (id(schema), set_defaults)
+    cached = _validators.get(key)
+    if cached and cached[0] is schema:
+        return cached[1]
+    cls = DefaultsValidator if set_defaults else SchemaValidator
+    validator = cls(schema, resolver=RefResolver.from_schema(schema), format_checker=format_checker)
+    _validators[key] = (schema, validator)
+    return validator
+
+
+def _record_path_check(path, is_dir):
+    paths = getattr(_path_checks, 'paths', None)
+    if paths is not None:
+        paths.append((path, is_dir))
+
+
 class RefResolver(jsonschema.RefResolver):
     def __init__(self, *args, **kwargs):
         kwargs.setdefault('handlers', {'': resolve_ref})
@@ -185,6 +228,7 @@ def is_file(instance):
     if not isinstance(instance, str_types):
         return True
     if os.path.isfile(os.path.expanduser(instance)):
+        _record_path_check(os.path.expanduser(instance), False)
         return True
     raise ValueError('`%s` does not exist' % instance)
 
@@ -199,6 +243,7 @@ def is_path(instance):
     if result:
         instance = os.path.dirname(instance[0:result.start()])
     if os.path.isdir(os.path.expanduser(instance)):
+        _record_path_check(os.path.expanduser(instance), True)
         return True
     raise ValueError('`%s` does not exist' % instance)
 
@@ -326,3 +371,5 @@ validators = {
 }
 
 SchemaValidator = jsonschema.validators.extend(jsonschema.Draft4Validator, validators)
+# Also fills in the defaults from the schema while validating
+DefaultsValidator = jsonschema.validators.extend(SchemaValidator, {'properties': validate_properties_w_defaults})
@@ -30,42 +30,35 @@ class PluginSchema(Base):
         return '<PluginSchema(plugin=%s,version=%i)>' % (self.plugin, self.version)
 
 
-def get_version(plugin):
-    session = Session()
-    try:
-        schema = session.query(PluginSchema).filter(PluginSchema.plugin == plugin).first()
-        if not schema:
-            log.debug('No schema version stored for %s' % plugin)
-            return None
-        else:
-            return schema.version
-    finally:
-        session.close()
+@with_session
+def get_version(plugin, session=None):
+    schema = session.query(PluginSchema).filter(PluginSchema.plugin == plugin).first()
+    if not schema:
+        log.debug('No schema version stored for %s' % plugin)
+        return None
+    else:
+        return schema.version
 
 
-def set_version(plugin, version):
+@with_session
+def set_version(plugin, version, session=None):
     if plugin not in plugin_schemas:
         raise ValueError('Tried to set schema version for %s plugin with no versioned_base.' % plugin)
     base_version = plugin_schemas[plugin]['version']
     if version != base_version:
         raise ValueError('Tried to set %s plugin schema version to %d when '
                          'it should be %d as defined in versioned_base.' % (plugin, version, base_version))
-    session = Session()
-    try:
-        schema = session.query(PluginSchema).filter(PluginSchema.plugin == plugin).first()
-        if not schema:
-            log.debug('Initializing plugin %s schema version to %i' % (plugin, version))
-            schema = PluginSchema(plugin, version)
-            session.add(schema)
-        else:
-            if version < schema.version:
-                raise ValueError('Tried to set plugin %s schema version to lower value' % plugin)
-            if version != schema.version:
-                log.debug('Updating plugin %s schema version to %i' % (plugin, version))
-                schema.version = version
-        session.commit()
-    finally:
-        session.close()
+    schema = session.query(PluginSchema).filter(PluginSchema.plugin == plugin).first()
+    if not schema:
+        log.debug('Initializing plugin %s schema version to %i' % (plugin, version))
+        schema = PluginSchema(plugin, version)
+        session.add(schema)
+    else:
+        if version < schema.version:
+            raise ValueError('Tried to set plugin %s schema version to lower value' % plugin)
+        if version != schema.version:
+            log.debug('Updating plugin %s schema version to %i' % (plugin, version))
+            schema.version = version
 
 
 def upgrade_required():
@@ -111,13 +104,14 @@ def upgrade(plugin):
 
         @event('manager.upgrade')
         def upgrade_wrapper(manager):
-            ver = get_version(plugin)
             session = Session()
             try:
+                ver = get_version(plugin, session=session)
                 new_ver = func(ver, session)
                 if new_ver > ver:
                     log.info('Plugin `%s` schema upgraded successfully' % plugin)
-                    set_version(plugin, new_ver)
+                    # Use the same session, another connection could not write while this one has changes pending
+                    set_version(plugin, new_ver, session=session)
                     session.commit()
                     manager.db_upgraded = True
                 elif new_ver < ver:
@@ -126,6 +120,7 @@ def upgrade(plugin):
                     manager.shutdown(finish_queue=False)
             except UpgradeImpossible:
                 log.info('Plugin %s database is not upgradable. Flushing data and regenerating.' % plugin)
+                session.rollback()
                 reset_schema(plugin)
                 session.commit()
             except Exception as e:
@@ -2,9 +2,12 @@ from __future__ import unicode_literals, division, absolute_import
 from exceptions import Exception, UnicodeDecodeError, TypeError, KeyError
 import logging
 import copy
+from datetime import date, datetime, timedelta
 import functools
+import weakref
 
 from flexget.plugin import PluginError
+from flexget.utils.frozen import FrozenDict, FrozenList, freeze, thaw
 from flexget.utils.imdb import extract_id, make_url
 from flexget.utils.template import render_from_entry
 
@@ -73,6 +76,7 @@ class Entry(dict):
         self.snapshots = {}
         self._state = 'undecided'
         self._hooks = {'accept': [], 'reject': [], 'fail': [], 'complete': []}
+        self._containers = []
         self.task = None
 
         if len(args) == 2:
@@ -83,6 +87,30 @@ class Entry(dict):
         # Make sure constructor does not escape our __setitem__ enforcement
         self.update(*args, **kwargs)
 
+    def __getstate__(self):
+        # Containers indexing this entry do not follow it into copies or pickles
+        state = self.__dict__.copy()
+        state.pop('_containers', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._containers = []
+
+    def _add_container(self, container):
+        """Registers :class:`~flexget.task.EntryContainer` to be notified when state of this entry changes."""
+        refs = [ref for ref in self._containers if ref() is not None]
+        if not any(ref() is container for ref in refs):
+            refs.append(weakref.ref(container))
+        self._containers = refs
+
+    def _set_state(self, state):
+        old_state, self._state = self._state, state
+        for ref in self._containers:
+            container = ref()
+            if container is not None:
+                container._state_changed(self, old_state)
+
     def trace(self, message, operation=None, plugin=None):
         """
         Adds trace message to the entry which should contain useful information about why
@@ -162,7 +190,7 @@ class Entry(dict):
         if self.rejected:
             log.debug('tried to accept rejected %r' % self)
         elif not self.accepted:
-            self._state = 'accepted'
+            self._set_state('accepted')
             self.trace(reason, operation='accept')
             # Run entry on_accept hooks
             self.run_hooks('accept', reason=reason, **kwargs)
@@ -175,7 +203,7 @@ class Entry(dict):
             self.trace('Tried to reject immortal %s' % reason_str)
             return
         if not self.rejected:
-            self._state = 'rejected'
+            self._set_state('rejected')
             self.trace(reason, operation='reject')
             # Run entry on_reject hooks
             self.run_hooks('reject', reason=reason, **kwargs)
@@ -183,7 +211,7 @@ class Entry(dict):
     def fail(self, reason=None, **kwargs):
         log.debug('Marking entry \'%s\' as failed' % self['title'])
         if not self.failed:
-            self._state = 'failed'
+            self._set_state('failed')
             self.trace(reason, operation='fail')
             log.error('Failed %s (%s)' % (self['title'], reason))
             # Run entry on_fail hooks
@@ -263,13 +291,18 @@ class Entry(dict):
         return self[key]
 
     def __getitem__(self, key):
-        """Supports lazy loading of fields. If a stored value is a :class:`LazyField`, call it, return the result."""
+        """
+        Supports lazy loading of fields. If a stored value is a :class:`LazyField`, call it, return the result.
+        Values shared with a :class:`FrozenEntry` are copied on first access.
+        """
         result = dict.__getitem__(self, key)
         if isinstance(result, LazyField):
             log.trace('evaluating lazy field %s' % key)
             return result()
-        else:
-            return result
+        elif isinstance(result, (FrozenDict, FrozenList)):
+            result = thaw(result)
+            dict.__setitem__(self, key, result)
+        return result
 
     def get(self, key, default=None, eval_lazy=True, lazy=None):
         """
@@ -422,3 +455,55 @@ class Entry(dict):
 
     def __repr__(self):
         return '<Entry(title=%s,state=%s)>' % (self['title'], self._state)
+
+
+#: Field values of these types are shared between :class:`FrozenEntry` and entries made from it
+IMMUTABLE_TYPES = (basestring, int, long, float, bool, type(None), date, datetime, timedelta)
+
+
+class FrozenEntry(object):
+    """
+    Read-only copy of an :class:`Entry`, which can be shared e.g. by tasks using the same cached input.
+
+    Entries made with :meth:`thaw` share field values with it. Dicts and lists are copied when accessed through the
+    entry, so changing them does not affect the frozen entry or other entries made from it. Lazy fields are
+    registered again on each entry. Other mutable values are deep copied for each entry.
+    """
+
+    def __init__(self, entry):
+        self.fields = {}
+        self.copied = {}
+        self.lazy = {}
+        for field, value in dict.iteritems(entry):
+            if isinstance(value, LazyField):
+                self.lazy[field] = list(value.funcs)
+            elif isinstance(value, (dict, list)):
+                self.fields[field] = freeze(value)
+            elif isinstance(value, IMMUTABLE_TYPES):
+                self.fields[field] = value
+            else:
+                try:
+                    self.copied[field] = copy.deepcopy(value)
+                except TypeError:
+                    log.debug('Unable to copy field `%s` of `%s`, using it as is' % (field, entry.get('title')))
+                    self.fields[field] = value
+        self.traces = list(entry.traces)
+        self.snapshots = freeze(entry.snapshots)
+        self.hooks = dict((action, list(hooks)) for action, hooks in entry._hooks.iteritems())
+
+    def thaw(self):
+        """Returns new undecided :class:`Entry` with the fields of this frozen entry."""
+        entry = Entry()
+        dict.update(entry, self.fields)
+        for field, value in self.copied.iteritems():
+            dict.__setitem__(entry, field, copy.deepcopy(value))
+        for field, funcs in self.lazy.iteritems():
+            for func in funcs:
+                entry.register_lazy_fields([field], func)
+        entry.traces = list(self.traces)
+        entry.snapshots = thaw(self.snapshots)
+        entry._hooks = dict((action, list(hooks)) for action, hooks in self.hooks.iteritems())
+        return entry
+
+    def __repr__(self):
+        return '<FrozenEntry(title=%s)>' % self.fields.get('title')
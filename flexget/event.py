@@ -7,6 +7,32 @@ import logging
 log = logging.getLogger('event')
 
 _events = {}
+# Handlers of each fired event ordered by priority, name -> tuple of Event. Rebuilt when the handlers change.
+_dispatch_tables = {}
+# Incremented whenever handlers are added or removed, or their priority changes
+_version = 0
+
+
+def _handlers_changed(name):
+    global _version
+    _version += 1
+    _dispatch_tables.pop(name, None)
+
+
+def _dispatch_table(name):
+    """Returns handlers of event `name` ordered by priority, an empty tuple if there are none."""
+    try:
+        return _dispatch_tables[name]
+    except KeyError:
+        events = _events.get(name, [])
+        events.sort(reverse=True)
+        table = _dispatch_tables[name] = tuple(events)
+        return table
+
+
+def handlers_version():
+    """:return: Number which changes whenever event handlers are added, removed or their priorities change."""
+    return _version
 
 
 class Event(object):
@@ -17,6 +43,15 @@ class Event(object):
         self.func = func
         self.priority = priority
 
+    @property
+    def priority(self):
+        return self._priority
+
+    @priority.setter
+    def priority(self, priority):
+        self._priority = priority
+        _handlers_changed(self.name)
+
     def __call__(self, *args, **kwargs):
         return self.func(*args, **kwargs)
 
@@ -52,7 +87,8 @@ def get_events(name):
     """
     if not name in _events:
         raise KeyError('No such event %s' % name)
-    _events[name].sort(reverse=True)
+    # Sorts the handlers as well
+    _dispatch_table(name)
     return _events[name]
 
 
@@ -72,19 +108,24 @@ def add_event_handler(name, func, priority=128):
     log.trace('registered function %s to event %s' % (func.__name__, name))
     event = Event(name, func, priority)
     events.append(event)
+    _handlers_changed(name)
     return event
 
 
 def remove_event_handlers(name):
     """Removes all handlers for given event `name`."""
     _events.pop(name, None)
+    _handlers_changed(name)
 
 
 def remove_event_handler(name, func):
     """Remove `func` from the handlers for event `name`."""
-    for e in list(_events.get(name, [])):
-        if e.func is func:
-            _events[name].remove(e)
+    events = _events.get(name, [])
+    # list.remove would compare events by priority
+    for index in reversed(xrange(len(events))):
+        if events[index].func == func:
+            del events[index]
+            _handlers_changed(name)
 
 
 def fire_event(name, *args, **kwargs):
@@ -95,7 +136,9 @@ def fire_event(name, *args, **kwargs):
     :param args: List of arguments passed to handler function
     :param kwargs: Key Value arguments passed to handler function
     """
-    if not name in _events:
-        return
-    for event in get_events(name):
+    try:
+        table = _dispatch_tables[name]
+    except KeyError:
+        table = _dispatch_table(name)
+    for event in table:
         event(*args, **kwargs)
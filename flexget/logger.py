@@ -64,10 +64,28 @@ def set_execution(execution):
     FlexGetLogger.local.execution = execution
 
 
+def get_execution():
+    return getattr(FlexGetLogger.local, 'execution', None)
+
+
 def set_task(task):
     FlexGetLogger.local.task = task
 
 
+def get_task():
+    return getattr(FlexGetLogger.local, 'task', '')
+
+
+class ExecutionFilter(logging.Filter):
+    """Only lets through records logged from within a certain execution (see :func:`set_execution`)."""
+
+    def __init__(self, execution):
+        self.execution = execution
+
+    def filter(self, record):
+        return get_execution() == self.execution
+
+
 class PrivacyFilter(logging.Filter):
     """Edits log messages and <hides> obviously private information."""
 
@@ -1,12 +1,16 @@
 from __future__ import unicode_literals, division, absolute_import, print_function
 import atexit
 from contextlib import contextmanager
+import cPickle
+import hashlib
+import json
 import signal
 import os
 import sys
 import shutil
 import logging
 import threading
+import weakref
 import pkg_resources
 import yaml
 from datetime import datetime, timedelta
@@ -14,6 +18,7 @@ from datetime import datetime, timedelta
 import sqlalchemy
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.engine.url import make_url
 from sqlalchemy.pool import SingletonThreadPool
 from sqlalchemy.exc import OperationalError
 
@@ -22,7 +27,7 @@ Base = declarative_base()
 Session = sessionmaker()
 
 from flexget import config_schema, db_schema
-from flexget.event import fire_event
+from flexget.event import fire_event, get_events
 from flexget.ipc import IPCServer, IPCClient
 from flexget.scheduler import Scheduler
 from flexget.utils.tools import pid_exists
@@ -31,6 +36,81 @@ log = logging.getLogger('manager')
 
 manager = None
 DB_CLEANUP_INTERVAL = timedelta(days=7)
+#: Maximum number of rows a cleanup handler removes in one transaction
+DB_CLEANUP_BATCH_SIZE = 500
+#: Time a cleanup handler can use in one cleanup run, the rest is left for the next run
+DB_CLEANUP_TIME_BUDGET = timedelta(minutes=1)
+#: Number of cleanup runs a failing cleanup handler is tried in before it is skipped until the next cleanup
+DB_CLEANUP_ATTEMPTS = 3
+#: Milliseconds a connection waits for another one to release its lock on the database before giving up
+SQLITE_BUSY_TIMEOUT = 30000
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Configures connections to SQLite database files. With write-ahead logging readers (e.g. webui) are not blocked by
+    task writing to the database. synchronous=NORMAL is safe with WAL, only a power loss can lose latest commits.
+    auto_vacuum is set for new databases, existing ones are converted by the next VACUUM.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute('PRAGMA busy_timeout = %d' % SQLITE_BUSY_TIMEOUT)
+        cursor.execute('PRAGMA page_count')
+        if not cursor.fetchone()[0]:
+            # Setting this on existing database needs a write lock, which another connection may be holding
+            cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        cursor.execute('PRAGMA journal_mode = WAL')
+        journal_mode = cursor.fetchone()[0]
+        if journal_mode.lower() != 'wal':
+            # Not supported by all filesystems, e.g. network shares
+            log.debug('Unable to use write-ahead logging, SQLite journal mode is %s' % journal_mode)
+        else:
+            cursor.execute('PRAGMA synchronous = NORMAL')
+    finally:
+        cursor.close()
+
+
+class ThreadConnectionPool(SingletonThreadPool):
+    """
+    Keeps one connection per thread, like :class:`SingletonThreadPool`. Sessions of a thread share its connection, so
+    a session opened while the task session is writing does not wait for the lock held by its own thread. Threads
+    work alongside each other using their own connections.
+
+    Unlike :class:`SingletonThreadPool`, which closes arbitrary connections when there are more threads than
+    `pool_size`, only connections of threads which have exited are closed.
+    """
+
+    def __init__(self, creator, **kw):
+        super(ThreadConnectionPool, self).__init__(creator, **kw)
+        self._owners = {}
+        self._owners_lock = threading.Lock()
+
+    def dispose(self):
+        with self._owners_lock:
+            super(ThreadConnectionPool, self).dispose()
+            self._owners.clear()
+
+    def _do_get(self):
+        try:
+            c = self._conn.current()
+            if c:
+                return c
+        except AttributeError:
+            pass
+        c = self._create_connection()
+        self._conn.current = weakref.ref(c)
+        with self._owners_lock:
+            for record, thread in self._owners.items():
+                if not thread.is_alive():
+                    del self._owners[record]
+                    self._all_conns.discard(record)
+                    record.close()
+            self._owners[c] = threading.current_thread()
+            self._all_conns.add(c)
+        return c
+
+# Pools log under the module of their class, keep routine messages as quiet as those of other sqlalchemy pools
+logging.getLogger('%s.%s' % (__name__, ThreadConnectionPool.__name__)).setLevel(logging.WARNING)
 
 
 @sqlalchemy.event.listens_for(Session, 'before_commit')
@@ -74,6 +154,7 @@ class Manager(object):
 
     * manager.daemon.started
     * manager.daemon.completed
+    * manager.db_cleanup.batch
     * manager.db_cleanup
     """
 
@@ -93,9 +174,14 @@ class Manager(object):
         self.db_filename = None
         self.engine = None
         self.lockfile = None
+        self.validation_cache = None
         self.database_uri = None
         self.db_upgraded = False
         self._has_lock = False
+        self._cleanup_thread = None
+        self._cleanup_stop = threading.Event()
+        # Held while deciding whether to start a cleanup, db_cleanup is called from several job threads
+        self._cleanup_lock = threading.Lock()
 
         self.config = {}
 
@@ -175,6 +261,8 @@ class Manager(object):
         else:
             # Otherwise dispatch the command to the callback function
             options.cli_command_callback(self, options)
+            # Closing the connections moves the write-ahead log into the database file
+            self.engine.dispose()
 
     def execute_command(self, options):
         """
@@ -351,6 +439,7 @@ class Manager(object):
         self.config_name = os.path.splitext(os.path.basename(config))[0]
         self.config_base = os.path.normpath(os.path.dirname(config))
         self.lockfile = os.path.join(self.config_base, '.%s-lock' % self.config_name)
+        self.validation_cache = os.path.join(self.config_base, '.%s-validated' % self.config_name)
 
     def load_config(self):
         """
@@ -542,9 +631,66 @@ class Manager(object):
         """
         Check all root level keywords are valid.
 
+        A valid config is stored along with its defaults in :attr:`validation_cache`, and validation is skipped as
+        long as the config, plugins and FlexGet version stay the same.
+
         :returns: A list of `ValidationError`s
         """
-        return config_schema.process_config(self.config)
+        key = self._validation_key()
+        validated = self._read_validation_cache(key)
+        if validated is not None:
+            log.debug('Config has not changed since it was validated, skipping validation')
+            self.config = validated
+            return []
+        with config_schema.recording_path_checks() as paths:
+            errors = config_schema.process_config(self.config)
+        if not errors:
+            self._write_validation_cache(key, paths)
+        return errors
+
+    def _validation_key(self):
+        """:returns: Hash identifying the config and everything its validation depends on, or None"""
+        from flexget import __version__
+        from flexget.plugin import plugins_hash
+        if not self.validation_cache or not plugins_hash:
+            return None
+        try:
+            config = json.dumps(self.config, sort_keys=True, default=repr)
+        except (TypeError, ValueError):
+            # Keys json can't handle
+            return None
+        return hashlib.sha1('\n'.join([config, plugins_hash, __version__]).encode('utf-8')).hexdigest()
+
+    def _read_validation_cache(self, key):
+        """:returns: The validated config with defaults filled in if `key` matches the cached one, otherwise None"""
+        if not key or not os.path.exists(self.validation_cache):
+            return None
+        try:
+            with open(self.validation_cache, 'rb') as cache_file:
+                cached = cPickle.load(cache_file)
+        except Exception as e:
+            log.debug('Unable to read validation cache %s: %s' % (self.validation_cache, e))
+            return None
+        if cached.get('key') != key:
+            return None
+        # Files and directories in the config must still exist
+        for path, is_dir in cached['paths']:
+            if not (os.path.isdir(path) if is_dir else os.path.isfile(path)):
+                log.debug('`%s` has disappeared since the config was validated' % path)
+                return None
+        return cached['config']
+
+    def _write_validation_cache(self, key, paths):
+        if not key:
+            return
+        try:
+            with open(self.validation_cache + '.tmp', 'wb') as cache_file:
+                cPickle.dump({'key': key, 'config': self.config, 'paths': paths}, cache_file, cPickle.HIGHEST_PROTOCOL)
+            if os.path.exists(self.validation_cache) and sys.platform.startswith('win'):
+                os.remove(self.validation_cache)
+            os.rename(self.validation_cache + '.tmp', self.validation_cache)
+        except (IOError, OSError, cPickle.PicklingError) as e:
+            log.debug('Unable to write validation cache %s: %s' % (self.validation_cache, e))
 
     def init_sqlalchemy(self):
         """Initialize SQLAlchemy"""
@@ -563,6 +709,9 @@ class Manager(object):
                 log.info('Test mode, creating a copy from database ...')
                 if os.path.exists(self.db_filename):
                     shutil.copy(self.db_filename, db_test_filename)
+                    # Commits not yet moved from the write-ahead log to the database file
+                    if os.path.exists(self.db_filename + '-wal'):
+                        shutil.copy(self.db_filename + '-wal', db_test_filename + '-wal')
                 self.db_filename = db_test_filename
                 log.info('Test database created')
 
@@ -575,11 +724,21 @@ class Manager(object):
 
         # fire up the engine
         log.debug('Connecting to: %s' % self.database_uri)
+        url = make_url(self.database_uri)
         try:
-            self.engine = sqlalchemy.create_engine(self.database_uri,
-                                                   echo=self.options.debug_sql,
-                                                   poolclass=SingletonThreadPool,
-                                                   connect_args={'check_same_thread': False})  # assert_unicode=True
+            if url.drivername.startswith('sqlite') and url.database not in [None, '', ':memory:']:
+                # Each thread uses its own connection, readers work alongside a writer
+                self.engine = sqlalchemy.create_engine(self.database_uri,
+                                                       echo=self.options.debug_sql,
+                                                       poolclass=ThreadConnectionPool,
+                                                       connect_args={'check_same_thread': False})
+                sqlalchemy.event.listen(self.engine, 'connect', set_sqlite_pragmas)
+            else:
+                # In-memory databases only exist for a single connection, share it between threads
+                self.engine = sqlalchemy.create_engine(self.database_uri,
+                                                       echo=self.options.debug_sql,
+                                                       poolclass=SingletonThreadPool,
+                                                       connect_args={'check_same_thread': False})
         except ImportError:
             print('FATAL: Unable to use SQLite. Are you running Python 2.5 - 2.7 ?\n'
                   'Python should normally have SQLite support built in.\n'
@@ -737,32 +896,116 @@ class Manager(object):
         os.dup2(so.fileno(), sys.stdout.fileno())
         os.dup2(se.fileno(), sys.stderr.fileno())
 
-    def db_cleanup(self, force=False):
+    def db_cleanup(self, force=False, background=True):
         """
-        Perform database cleanup if cleanup interval has been met.
+        Perform database cleanup if cleanup interval has been met, or continue an unfinished cleanup.
+
+        Cleanup runs in a background thread so it does not hold up task execution. Each handler removes rows in
+        batches of :data:`DB_CLEANUP_BATCH_SIZE`, committing after every batch, and gets
+        :data:`DB_CLEANUP_TIME_BUDGET` per run. Handlers which did not finish are continued on the next call. A handler
+        which raises is retried on the next calls, and skipped after failing in :data:`DB_CLEANUP_ATTEMPTS` runs.
 
         Fires events:
 
+        * manager.db_cleanup.batch
+
+          Gives session and batch size as parameters. Handler should remove at most batch size rows and return the
+          number of rows removed, it is called again until it returns 0.
+
         * manager.db_cleanup
 
-          If interval was met. Gives session to do the cleanup as a parameter.
+          Once all batch handlers have finished. Gives session to do the cleanup as a parameter.
 
         :param bool force: Run the cleanup no matter whether the interval has been met.
+        :param bool background: Run the cleanup in a background thread.
         """
+        with self._cleanup_lock:
+            self._start_db_cleanup(force, background)
+
+    def _start_db_cleanup(self, force, background):
+        if self._cleanup_thread and self._cleanup_thread.is_alive():
+            log.debug('Database cleanup is already running')
+            return
+        progress = self.persist.get('db_cleanup_progress')
         expired = self.persist.get('last_cleanup', datetime(1900, 1, 1)) < datetime.now() - DB_CLEANUP_INTERVAL
-        if force or expired:
-            log.info('Running database cleanup.')
-            session = Session()
-            try:
-                fire_event('manager.db_cleanup', session)
-                session.commit()
-            finally:
-                session.close()
-            # Just in case some plugin was overzealous in its cleaning, mark the config changed
-            self.config_changed()
-            self.persist['last_cleanup'] = datetime.now()
-        else:
+        if not (progress or force or expired):
             log.debug('Not running db cleanup, last run %s' % self.persist.get('last_cleanup'))
+            return
+        if progress:
+            log.info('Continuing database cleanup.')
+        else:
+            log.info('Running database cleanup.')
+            progress = {'finished': [], 'deleted': {}}
+        self._cleanup_stop.clear()
+        # Database in memory only has one connection, which can't be shared with another thread
+        if not background or not isinstance(self.engine.pool, ThreadConnectionPool):
+            self._run_db_cleanup(progress)
+            return
+        self._cleanup_thread = threading.Thread(target=self._run_db_cleanup, args=(progress,), name='db_cleanup')
+        self._cleanup_thread.daemon = True
+        self._cleanup_thread.start()
+
+    def _run_db_cleanup(self, progress):
+        failed = progress.setdefault('failed', {})
+        for handler in get_events('manager.db_cleanup.batch'):
+            name = '%s.%s' % (handler.func.__module__, handler.func.__name__)
+            if name in progress['finished']:
+                continue
+            deadline = datetime.now() + DB_CLEANUP_TIME_BUDGET
+            error = False
+            while True:
+                if self._cleanup_stop.is_set():
+                    log.debug('Database cleanup interrupted, continuing on next run')
+                    self.persist['db_cleanup_progress'] = progress
+                    return
+                session = Session()
+                try:
+                    deleted = handler(session, DB_CLEANUP_BATCH_SIZE)
+                    session.commit()
+                except Exception as e:
+                    log.error('Database cleanup %s failed: %s' % (name, e))
+                    log.debug('Cleanup traceback', exc_info=True)
+                    session.rollback()
+                    error = True
+                    break
+                finally:
+                    session.close()
+                if deleted:
+                    progress['deleted'][name] = progress['deleted'].get(name, 0) + deleted
+                if not deleted:
+                    progress['finished'].append(name)
+                    break
+                if datetime.now() > deadline:
+                    break
+            if error:
+                # Other handlers still run, the failed one is retried on the next runs until it has no attempts left
+                failed[name] = failed.get(name, 0) + 1
+                if failed[name] >= DB_CLEANUP_ATTEMPTS:
+                    log.error('Giving up database cleanup %s after %s failed runs' % (name, failed[name]))
+                    progress['finished'].append(name)
+                self.persist['db_cleanup_progress'] = progress
+                continue
+            log.verbose('Database cleanup %s: %s rows removed%s' %
+                        (name, progress['deleted'].get(name, 0),
+                         '' if name in progress['finished'] else ', continuing on next run'))
+            self.persist['db_cleanup_progress'] = progress
+            if name not in progress['finished']:
+                return
+        if any(name not in progress['finished'] for name in failed):
+            log.verbose('Database cleanup unfinished, failed handlers are retried on next run')
+            return
+
+        session = Session()
+        try:
+            fire_event('manager.db_cleanup', session)
+            session.commit()
+        finally:
+            session.close()
+        del self.persist['db_cleanup_progress']
+        # Just in case some plugin was overzealous in its cleaning, mark the config changed
+        self.config_changed()
+        self.persist['last_cleanup'] = datetime.now()
+        log.info('Database cleanup finished, %s rows removed.' % sum(progress['deleted'].itervalues()))
 
     def shutdown(self, finish_queue=True):
         """
@@ -781,6 +1024,10 @@ class Manager(object):
                 raise
             print('**** Keyboard Interrupt ****')
         fire_event('manager.shutdown', self)
+        if self._cleanup_thread and self._cleanup_thread.is_alive():
+            log.debug('Waiting for database cleanup to stop')
+            self._cleanup_stop.set()
+            self._cleanup_thread.join()
         if not self.unit_test:  # don't scroll "nosetests" summary results when logging is enabled
             log.debug('Shutting down')
         self.engine.dispose()
@@ -790,6 +1037,9 @@ class Manager(object):
                 raise Exception('trying to delete non test database?')
             if self._has_lock:
                 os.remove(self.db_filename)
+                for suffix in ['-wal', '-shm']:
+                    if os.path.exists(self.db_filename + suffix):
+                        os.remove(self.db_filename + suffix)
                 log.info('Removed test database')
         if not self.unit_test:  # don't scroll "nosetests" summary results when logging is enabled
             log.debug('Shutdown completed')
@@ -2,10 +2,14 @@
 """
 
 from __future__ import unicode_literals, division, absolute_import
+import functools
+import hashlib
+import json
 import sys
 import os
 import re
 import logging
+import threading
 import time
 import pkgutil
 import warnings
@@ -14,14 +18,15 @@ from itertools import ifilter
 from requests import RequestException
 
 from flexget import config_schema
-from flexget.event import add_event_handler as add_phase_handler, fire_event, remove_event_handlers
+from flexget.event import (add_event_handler as add_phase_handler, fire_event, remove_event_handlers, get_events,
+                           handlers_version, _events)
 from flexget import plugins as plugins_pkg
 
 log = logging.getLogger('plugin')
 
 __all__ = ['PluginWarning', 'PluginError', 'register_plugin', 'register_parser_option', 'register_task_phase',
            'get_plugin_by_name', 'get_plugins_by_group', 'get_plugin_keywords', 'get_plugins_by_phase',
-           'get_phases_by_plugin', 'internet', 'priority']
+           'get_phases_by_plugin', 'internet', 'priority', 'parallel', 'volatile', 'volatile_inputs']
 
 
 class DependencyError(Exception):
@@ -154,6 +159,103 @@ def priority(value):
         return target
     return decorator
 
+
+def parallel(target):
+    """
+    Decorator for input phase methods which only do independent (network) I/O, and are thus safe to be run in a worker
+    thread at the same time as other inputs of the task. Such methods must not use the task database session.
+
+    Needs to be the outermost decorator of the method.
+    """
+    target.parallel = True
+    return target
+
+
+def is_parallel(handler):
+    """Returns True if phase handler `handler` has been marked with :func:`parallel`"""
+    return getattr(handler.func, 'parallel', False)
+
+
+def volatile(target):
+    """
+    Decorator for input phase methods whose entries are meant to change between reruns of the task, e.g. because they
+    depend on what the task did on the previous run. Other inputs which returned a list of entries are not called again
+    on reruns, copies of the entries they returned on the first run are used instead.
+
+    Needs to be the outermost decorator of the method.
+    """
+    target.volatile = True
+    return target
+
+
+def volatile_inputs(get_inputs):
+    """
+    Decorator for input phase methods which call other inputs (see :func:`call_inputs`). The method is treated as
+    :func:`volatile` when any of the inputs it calls is.
+
+    Needs to be the outermost decorator of the method.
+
+    :param get_inputs: Function returning the list of dicts mapping input plugin name to its config, given the config
+        of the method.
+    """
+
+    def decorator(target):
+        def any_volatile(config):
+            return any(is_volatile(get_plugin_by_name(name).phase_handlers['input'], input_config)
+                       for item in get_inputs(config) for name, input_config in item.iteritems())
+        target.volatile = any_volatile
+        return target
+    return decorator
+
+
+def is_volatile(handler, config=None):
+    """
+    Returns True if phase handler `handler` has been marked with :func:`volatile`, or with :func:`volatile_inputs` and
+    one of the inputs in `config` is volatile.
+    """
+    volatile = getattr(handler.func, 'volatile', False)
+    if callable(volatile):
+        return volatile(config)
+    return volatile
+
+
+def call_inputs(task, inputs):
+    """
+    Calls the input phase handlers of other plugins, e.g. for plugins which take a list of inputs in their config.
+    Handlers marked with :func:`parallel` are run concurrently when the task allows it (see `parallel_inputs`).
+
+    :param task: Current task
+    :param list inputs: List of dicts mapping input plugin name to its config
+    :return: Iterator over (input name, result) tuples in config order.
+        Inputs which raise :class:`PluginError` are logged and skipped.
+    """
+    calls = []
+    for item in inputs:
+        for input_name, input_config in item.iteritems():
+            input = get_plugin_by_name(input_name)
+            if input.api_ver == 1:
+                raise PluginError('Plugin %s does not support API v2' % input_name)
+            calls.append((input_name, input.phase_handlers['input'], input_config))
+
+    threaded = []
+    if task.max_input_workers > 1:
+        threaded = [index for index, (_, handler, _) in enumerate(calls) if is_parallel(handler)]
+    # Sub-inputs act on behalf of the calling plugin, e.g. for simple_persistence
+    funcs = [(task.current_plugin, functools.partial(calls[index][1], task, calls[index][2])) for index in threaded]
+    with task.threaded_inputs(funcs) as results:
+        results = dict(zip(threaded, results))
+        for index, (input_name, handler, input_config) in enumerate(calls):
+            try:
+                if index in results:
+                    result = results[index]()
+                else:
+                    result = handler(task, input_config)
+            except PluginError as e:
+                log.warning('Error during input plugin %s: %s' % (input_name, e))
+                continue
+            yield input_name, result
+
+
 DEFAULT_PRIORITY = 128
 
 plugin_contexts = ['task', 'root']
@@ -175,10 +277,43 @@ plugins = {}
 # Loading done?
 plugins_loaded = False
 
+# Incremented whenever plugins are added or removed or their builtin status or phase handlers change
+_plugins_version = 0
+# Registry signature, and the versions of plugins and event handlers it was computed for
+_registry_signature = (None, None)
+
+#: Hash of the loaded plugin files and names, changes whenever the schemas plugins provide may have changed
+plugins_hash = None
+
 _loaded_plugins = {}
 _plugin_options = []
 _new_phase_queue = {}
 
+#: Bump when the format of the plugin manifest changes
+MANIFEST_VERSION = 1
+# Guards importing plugin modules on demand
+_lazy_lock = threading.RLock()
+
+
+def _plugins_changed():
+    global _plugins_version
+    _plugins_version += 1
+
+
+def get_registry_signature():
+    """
+    :return: Hashable summary of the registered plugins, their builtin status and the priorities of their phase
+      handlers. Results computed from these stay valid as long as the signature stays equal.
+    """
+    global _registry_signature
+    version = (_plugins_version, handlers_version())
+    if _registry_signature[0] != version:
+        signature = frozenset((plugin.name, plugin.builtin, frozenset((phase, plugin.phase_priority(phase))
+                                                                       for phase in plugin.phase_handlers))
+                              for plugin in plugins.values())
+        _registry_signature = (version, signature)
+    return _registry_signature[1]
+
 
 def register_task_phase(name, before=None, after=None):
     """Adds a new task phase to the available phases."""
@@ -267,13 +402,68 @@ class PluginInfo(dict):
 
         self.plugin_class = plugin_class
         self.instance = None
-
-        if self.name in plugins:
+        self.lazy_module = None
+
+        if self.name in plugins and plugins[self.name].lazy_module:
+            # Module listed in the plugin manifest got imported, fill in the placeholder already in use
+            # Keep the basic info of the placeholder, other plugins may have changed it (e.g. disable_builtins)
+            placeholder = plugins[self.name]
+            for key, value in self.iteritems():
+                if key not in placeholder or key in ['lazy_module', 'phase_handlers']:
+                    placeholder[key] = value
+        elif self.name in plugins:
             PluginInfo.dupe_counter += 1
             log.critical('Error while registering plugin %s. %s' %
                          (self.name, ('A plugin with the name %s is already registered' % self.name)))
         else:
             plugins[self.name] = self
+            _plugins_changed()
+
+    @classmethod
+    def from_manifest(cls, info):
+        """
+        Creates a placeholder for plugin described by `info` in the plugin manifest. Its module is imported when
+        anything besides the basic info (e.g. instance, schema or phase handler) is accessed.
+        """
+        self = cls.__new__(cls)
+        dict.__init__(self)
+        for key in ['name', 'api_ver', 'groups', 'builtin', 'debug', 'contexts', 'category']:
+            self[key] = info[key]
+        self.lazy_module = info['module']
+        self.phase_handlers = LazyPhaseHandlers(self, info['phases'])
+        plugins[self.name] = self
+        # Config validation only needs the schema of plugins which are used
+        config_schema.register_schema('/schema/plugin/%s' % self.name, lambda **kwargs: self.schema)
+        return self
+
+    def load(self):
+        """Imports the module of a plugin created from the plugin manifest."""
+        with _lazy_lock:
+            if not self.lazy_module:
+                return
+            module = self.lazy_module
+            log.debug('Loading plugin %s from %s' % (self.name, module))
+            try:
+                __import__(module)
+            except (DependencyError, ImportError) as e:
+                log.critical('Plugin module `%s` failed to import: %s' % (module, getattr(e, 'message', e)))
+            fire_event('plugin.register')
+            remove_event_handlers('plugin.register')
+            for plugin in plugins.values():
+                if not plugin.lazy_module:
+                    plugin.initialize()
+            if self.lazy_module:
+                del plugins[self.name]
+                _plugins_changed()
+                _remove_manifest()
+                raise DependencyError(issued_by=self.name, missing=module,
+                                      message='Plugin %s was not registered by %s' % (self.name, module))
+
+    def phase_priority(self, phase):
+        """Priority of the handler for `phase`, does not import plugins created from the plugin manifest."""
+        if isinstance(self.phase_handlers, LazyPhaseHandlers):
+            return dict.__getitem__(self.phase_handlers, phase)
+        return self.phase_handlers[phase].priority
 
     def initialize(self):
         if self.instance is not None:
@@ -328,11 +518,19 @@ class PluginInfo(dict):
     def __getattr__(self, attr):
         if attr in self:
             return self[attr]
+        if dict.get(self, 'lazy_module'):
+            self.load()
+            return getattr(self, attr)
         return dict.__getattribute__(self, attr)
 
     def __setattr__(self, attr, value):
         self[attr] = value
 
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        if key in ['builtin', 'phase_handlers']:
+            _plugins_changed()
+
     def __str__(self):
         return '<PluginInfo(name=%s)>' % self.name
 
@@ -342,6 +540,39 @@ class PluginInfo(dict):
 register = PluginInfo
 
 
+class LazyPhaseHandlers(dict):
+    """
+    Phase handlers of a plugin which has not been imported yet. Checking which phases the plugin handles does not
+    import it, getting the handlers does.
+    """
+
+    def __init__(self, plugin, phases):
+        dict.__init__(self, phases)
+        self.plugin = plugin
+
+    def _handlers(self):
+        self.plugin.load()
+        return self.plugin.phase_handlers
+
+    def __getitem__(self, phase):
+        return self._handlers()[phase]
+
+    def get(self, phase, default=None):
+        return self._handlers().get(phase, default)
+
+    def values(self):
+        return self._handlers().values()
+
+    def items(self):
+        return self._handlers().items()
+
+    def itervalues(self):
+        return self._handlers().itervalues()
+
+    def iteritems(self):
+        return self._handlers().iteritems()
+
+
 def _strip_trailing_sep(path):
     return path.rstrip("\\/")
 
@@ -365,25 +596,42 @@ def _get_standard_plugins_path():
     return paths
 
 
-def _load_plugins_from_dirs(dirs):
+def _registry_state():
+    """
+    Returns a summary of everything registered globally besides plugins and their phase handlers. Modules which change
+    it at import or plugin registration time can not be left out of the startup.
+    """
+    from flexget import db_schema
+    from flexget.manager import Base
+    events = dict((name, len(handlers)) for name, handlers in _events.iteritems() if not name.startswith('plugin.'))
+    schemas = set(path for path in config_schema.schema_paths if not path.startswith('/schema/plugin/'))
+    return events, schemas, len(Base.metadata.tables), len(db_schema.plugin_schemas), list(task_phases)
+
+
+def _load_plugins_from_dirs(dirs, skip=()):
     """
     :param list dirs: Directories from where plugins are loaded from
+    :param skip: Names of modules which are not imported
+    :return: Dict mapping name of each imported module to a tuple (has side effects, names of plugin modules imported
+        along with it)
     """
 
     log.debug('Trying to load plugins from: %s' % dirs)
     # add all dirs to plugins_pkg load path so that plugins are loaded from flexget and from ~/.flexget/plugins/
     plugins_pkg.__path__ = map(_strip_trailing_sep, dirs)
+    imported = {}
     for importer, name, ispkg in pkgutil.walk_packages(dirs, plugins_pkg.__name__ + '.'):
         if ispkg:
             continue
         # Don't load any plugins again if they are already loaded
         # This can happen if one plugin imports from another plugin
-        if name in sys.modules:
+        if name in sys.modules or name in skip:
             continue
         loader = importer.find_module(name)
         # Don't load from pyc files
         if not loader.filename.endswith('.py'):
             continue
+        modules, plugin_names, state = set(sys.modules), set(plugins), _registry_state()
         try:
             loaded_module = loader.load_module(name)
         except DependencyError as e:
@@ -395,41 +643,171 @@ def _load_plugins_from_dirs(dirs):
                 log.warning(msg)
             else:
                 log.debug(msg)
+            imported[name] = (True, [])
         except ImportError as e:
             log.critical('Plugin `%s` failed to import dependencies' % name)
             log.exception(e)
+            imported[name] = (True, [])
         except Exception as e:
             log.critical('Exception while loading plugin %s' % name)
             log.exception(e)
             raise
         else:
             log.trace('Loaded module %s from %s' % (name, loaded_module.__file__))
+            side_effects = _registry_state() != state or set(plugins) != plugin_names
+            imported[name] = (side_effects, [module for module in set(sys.modules) - modules
+                                             if module.startswith(plugins_pkg.__name__ + '.')])
 
     if _new_phase_queue:
         for phase, args in _new_phase_queue.iteritems():
             log.error('Plugin %s requested new phase %s, but it could not be created at requested '
                       'point (before, after). Plugin is not working properly.' % (args[0], phase))
+    return imported
 
 
-def load_plugins():
-    """Load plugins from the standard plugin paths."""
-    global plugins_loaded
+def _get_manifest_path():
+    """
+    :return: Path of the plugin manifest, or None if it has been disabled by setting `FLEXGET_PLUGIN_MANIFEST`
+        environment variable empty.
+    """
+    path = os.environ.get('FLEXGET_PLUGIN_MANIFEST')
+    if path is None:
+        cache_dir = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        path = os.path.join(cache_dir, 'flexget', 'plugin_manifest.json')
+    return path or None
+
+
+def _manifest_signature(dirs):
+    """Describes the plugin files, manifest is valid only as long as these stay the same."""
+    import flexget
+    files = []
+    for plugin_dir in dirs:
+        for root, subdirs, names in os.walk(plugin_dir):
+            subdirs.sort()
+            for name in sorted(names):
+                if name.endswith('.py'):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    files.append([path, int(stat.st_mtime), stat.st_size])
+    return {'version': MANIFEST_VERSION, 'flexget': flexget.__version__, 'python': sys.version, 'files': files}
+
+
+def _read_manifest(path, signature):
+    try:
+        with open(path) as manifest_file:
+            manifest = json.load(manifest_file)
+    except (IOError, ValueError) as e:
+        log.debug('Plugin manifest %s not available: %s' % (path, e))
+        return None
+    if manifest.get('signature') != signature:
+        log.debug('Plugin files have changed, not using plugin manifest %s' % path)
+        return None
+    return manifest
+
+
+def _write_manifest(path, signature, lazy_modules, registered):
+    """Writes manifest of the plugins which can be imported when they are used instead of at startup."""
+    manifest = {'signature': signature, 'modules': sorted(lazy_modules), 'plugins': []}
+    for plugin in plugins.itervalues():
+        module = registered.get(plugin.name)
+        if module not in lazy_modules:
+            continue
+        manifest['plugins'].append({
+            'name': plugin.name, 'module': module, 'api_ver': plugin.api_ver, 'groups': plugin.groups,
+            'builtin': plugin.builtin, 'debug': plugin.debug, 'contexts': plugin.contexts,
+            'category': plugin.category, 'schema': plugin.schema and plugin.schema.get('id'),
+            'phases': dict((phase, handler.priority) for phase, handler in plugin.phase_handlers.iteritems())})
+    try:
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path + '.tmp', 'w') as manifest_file:
+            json.dump(manifest, manifest_file)
+        os.rename(path + '.tmp', path)
+    except (IOError, OSError) as e:
+        log.debug('Unable to write plugin manifest %s: %s' % (path, e))
+    else:
+        log.debug('Wrote plugin manifest with %s of %s plugins to %s' %
+                  (len(manifest['plugins']), len(plugins), path))
 
-    # suppress DeprecationWarning's
-    warnings.simplefilter('ignore', DeprecationWarning)
 
-    start_time = time.time()
-    # Import all the plugins
-    _load_plugins_from_dirs(_get_standard_plugins_path())
-    # Register them
-    fire_event('plugin.register')
+def _remove_manifest():
+    """Removes the manifest after it turned out to be wrong, so that it gets generated again on next startup."""
+    path = _get_manifest_path()
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def _register_plugins():
+    """
+    Fires plugin.register and initializes the plugins.
+
+    :return: Tuple of names of the modules which register anything else than plugins while doing so, and dict mapping
+        plugin names to the module which registered them.
+    """
+    side_effects = set()
+    registered = {}
+    handlers = list(get_events('plugin.register')) if 'plugin.register' in _events else []
+    for handler in handlers:
+        module = handler.func.__module__
+        plugin_names, state = set(plugins), _registry_state()
+        handler()
+        registered.setdefault(module, set()).update(set(plugins) - plugin_names)
+        if _registry_state() != state:
+            side_effects.add(module)
     # Plugins should only be registered once, remove their handlers after
     remove_event_handlers('plugin.register')
     # After they have all been registered, instantiate them
+    for module, plugin_names in registered.iteritems():
+        state = _registry_state()
+        for name in plugin_names:
+            plugins[name].initialize()
+        if _registry_state() != state:
+            side_effects.add(module)
     for plugin in plugins.values():
-        plugin.initialize()
+        if not plugin.lazy_module:
+            plugin.initialize()
+    return side_effects, dict((name, module) for module, names in registered.iteritems() for name in names)
+
+
+def load_plugins(manifest=True):
+    """
+    Load plugins from the standard plugin paths.
+
+    :param bool manifest: Use the plugin manifest, so that plugin modules which only register plugins are imported
+        when they are first used instead of at startup. Manifest is generated on first load and whenever plugin files
+        change.
+    """
+    global plugins_loaded, plugins_hash
+
+    # suppress DeprecationWarning's
+    warnings.simplefilter('ignore', DeprecationWarning)
+
+    start_time = time.time()
+    dirs = _get_standard_plugins_path()
+    # Manifest only describes loading plugins into a fresh interpreter
+    manifest_path = manifest and not plugins_loaded and _get_manifest_path()
+    signature = _manifest_signature(dirs)
+    contents = manifest_path and _read_manifest(manifest_path, signature)
+    if contents:
+        # Import only the plugins which are needed at startup, the rest are imported when used
+        _load_plugins_from_dirs(dirs, skip=set(contents['modules']))
+        for info in contents['plugins']:
+            PluginInfo.from_manifest(info)
+        _register_plugins()
+    else:
+        # Import all the plugins
+        imported = _load_plugins_from_dirs(dirs)
+        # Register them
+        side_effects, registered = _register_plugins()
+        if manifest_path:
+            lazy_modules = set()
+            for name, (import_side_effects, modules) in imported.iteritems():
+                if not import_side_effects and not side_effects.intersection(modules):
+                    lazy_modules.update(modules)
+            _write_manifest(manifest_path, signature, lazy_modules, registered)
     took = time.time() - start_time
     plugins_loaded = True
+    plugins_hash = hashlib.sha1(json.dumps([signature, sorted(plugins)])).hexdigest()
     log.debug('Plugins took %.2f seconds to load' % took)
 
 
@@ -465,7 +843,7 @@ def get_plugins(phase=None, group=None, context=None, category=None, min_api=Non
 def plugin_schemas(**kwargs):
     """Create a dict schema that matches plugins specified by `kwargs`"""
     return {'type': 'object',
-            'properties': dict((p.name, {'$ref': p.schema['id']}) for p in get_plugins(**kwargs)),
+            'properties': dict((p.name, {'$ref': '/schema/plugin/%s' % p.name}) for p in get_plugins(**kwargs)),
             'additionalProperties': False,
             'error_additionalProperties': '{{message}} Only known plugin names are valid keys.',
             'patternProperties': {'^_': {'title': 'Disabled Plugin'}}}
@@ -17,7 +17,7 @@ from flexget import db_schema
 from flexget.utils.tools import decode_html
 from flexget.utils.requests import Session as ReqSession
 from flexget.utils.database import with_session, pipe_list_synonym, text_date_synonym
-from flexget.utils.sqlalchemy_utils import table_add_column
+from flexget.utils.sqlalchemy_utils import table_add_column, chunked
 from flexget.manager import Session
 from flexget.utils.simple_persistence import SimplePersistence
 
@@ -456,11 +456,6 @@ def mark_expired(session=None):
         for episode in updates.findall('Episode'):
             expired_series.append(int(episode.find("id").text))
 
-        def chunked(seq):
-            """Helper to divide our expired lists into sizes sqlite can handle in a query. (<1000)"""
-            for i in xrange(0, len(seq), 900):
-                yield seq[i:i + 900]
-
         # Update our cache to mark the items that have expired
         for chunk in chunked(expired_series):
             num = session.query(TVDBSeries).filter(TVDBSeries.id.in_(chunk)).update({'expired': True}, 'fetch')
@@ -21,12 +21,14 @@ Base = db_schema.versioned_base('tvrage', 2)
 UPDATE_INTERVAL = '7 days'
 
 
-@event('manager.db_cleanup')
-def db_cleanup(session):
+@event('manager.db_cleanup.batch')
+def db_cleanup(session, batch_size):
     value = datetime.datetime.now() - parse_timedelta('30 days')
-    for de in session.query(TVRageSeries).filter(TVRageSeries.last_update <= value).all():
+    expired = session.query(TVRageSeries).filter(TVRageSeries.last_update <= value).limit(batch_size).all()
+    for de in expired:
         log.debug('deleting %s' % de)
         session.delete(de)
+    return len(expired)
 
 
 @db_schema.upgrade('tvrage')
@@ -4,6 +4,8 @@ from flexget import options
 from flexget.db_schema import reset_schema, plugin_schemas
 from flexget.event import event
 from flexget.manager import Base, Session
+from flexget.plugins.generic.db_vacuum import vacuum_recommendation
+from flexget.utils.sqlalchemy_utils import sqlite_page_stats
 from flexget.utils.tools import console
 
 
@@ -13,6 +15,8 @@ def do_cli(manager, options):
             cleanup(manager)
         elif options.db_action == 'vacuum':
             vacuum()
+        elif options.db_action == 'stats':
+            stats()
         elif options.db_action == 'reset':
             reset(manager)
         elif options.db_action == 'reset-plugin':
@@ -20,7 +24,7 @@ def do_cli(manager, options):
 
 
 def cleanup(manager):
-    manager.db_cleanup(force=True)
+    manager.db_cleanup(force=True, background=False)
     console('Database cleanup complete.')
 
 
@@ -28,6 +32,8 @@ def vacuum():
     console('Running VACUUM on sqlite database, this could take a while.')
     session = Session()
     try:
+        # Also converts databases created before incremental vacuum was enabled
+        session.execute('PRAGMA auto_vacuum = INCREMENTAL')
         session.execute('VACUUM')
         session.commit()
     finally:
@@ -35,6 +41,25 @@ def vacuum():
     console('VACUUM complete.')
 
 
+def stats():
+    session = Session()
+    try:
+        page_stats = sqlite_page_stats(session, fragmentation=True)
+    finally:
+        session.close()
+    console('Page size:        %s bytes' % page_stats['page_size'])
+    console('Pages:            %s' % page_stats['page_count'])
+    console('Free pages:       %s (%.1f%%)' % (page_stats['freelist_count'], page_stats['free_ratio'] * 100))
+    if page_stats['fragmentation'] is None:
+        console('Fragmentation:    unknown, sqlite does not have dbstat table')
+    else:
+        console('Fragmentation:    %.1f%% of pages' % (page_stats['fragmentation'] * 100))
+    console('Auto vacuum:      %s' % {0: 'none', 1: 'full', 2: 'incremental'}.get(page_stats['auto_vacuum']))
+    reason = vacuum_recommendation(page_stats)
+    if reason:
+        console('%s, running `flexget database vacuum` is recommended.' % reason)
+
+
 def reset(manager):
     Base.metadata.drop_all(bind=manager.engine)
     Base.metadata.create_all(bind=manager.engine)
@@ -73,6 +98,7 @@ def register_parser_arguments():
     subparsers = parser.add_subparsers(title='Actions', metavar='<action>', dest='db_action')
     subparsers.add_parser('cleanup', help='make all plugins clean un-needed data from the database')
     subparsers.add_parser('vacuum', help='running vacuum can increase performance and decrease database size')
+    subparsers.add_parser('stats', help='show database size and free space')
     reset_parser = subparsers.add_parser('reset', add_help=False, help='reset the entire database (DANGEROUS!)')
     reset_parser.add_argument('--sure', action='store_true', required=True,
                               help='you must use this flag to indicate you REALLY want to do this')
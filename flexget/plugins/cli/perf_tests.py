@@ -8,7 +8,8 @@ from flexget.utils.tools import console
 
 log = logging.getLogger('perftests')
 
-TESTS = ['imdb_query']
+TESTS = ['imdb_query', 'seen_filter', 'series_parse', 'entry_states', 'plugin_loading', 'event_dispatch',
+         'archive_ingest']
 
 
 def cli_perf_test(manager, options):
@@ -19,6 +20,18 @@ def cli_perf_test(manager, options):
     try:
         if options.test_name == 'imdb_query':
             imdb_query(session)
+        elif options.test_name == 'seen_filter':
+            seen_filter()
+        elif options.test_name == 'series_parse':
+            series_parse(session)
+        elif options.test_name == 'entry_states':
+            entry_states()
+        elif options.test_name == 'plugin_loading':
+            plugin_loading()
+        elif options.test_name == 'event_dispatch':
+            event_dispatch()
+        elif options.test_name == 'archive_ingest':
+            archive_ingest()
     finally:
         session.close()
 
@@ -71,6 +84,247 @@ def imdb_query(session):
     log.debug('Took %.2f seconds to query %i movies' % (took, len(imdb_urls)))
 
 
+def seen_filter():
+    """Reports number of queries seen filter makes in relation to number of entries, half of which are seen."""
+    import time
+    from sqlalchemy import create_engine, event as sa_event
+    from sqlalchemy.orm import sessionmaker
+    from flexget.entry import Entry
+    from flexget.plugins.filter.seen import FilterSeen, SeenEntry, SeenField
+
+    # use separate in-memory database, so that user's seen database is not touched
+    engine = create_engine('sqlite://')
+    SeenEntry.__table__.create(bind=engine)
+    SeenField.__table__.create(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    queries = [0]
+
+    def count_query(*args, **kwargs):
+        queries[0] += 1
+
+    sa_event.listen(engine, 'before_cursor_execute', count_query)
+
+    class FakeTask(object):
+        name = 'perf-test'
+
+        def __init__(self, entries):
+            self.entries = entries
+            self.session = session
+
+    seen = FilterSeen()
+    learned = 0
+    for amount in [10, 100, 1000, 10000]:
+        entries = [Entry('Title %s' % i, 'http://localhost/%s' % i) for i in range(amount)]
+        # learn every other entry which is not yet known
+        for entry in entries[learned * 2::2]:
+            seen.learn(FakeTask([]), entry)
+        session.commit()
+        learned = len(entries[::2])
+
+        queries[0] = 0
+        start_time = time.time()
+        seen.on_task_filter(FakeTask(entries), True)
+        took = time.time() - start_time
+        rejected = len([entry for entry in entries if entry.rejected])
+        console('%6i entries: %4i queries, %6i rejected, took %.3f seconds' % (amount, queries[0], rejected, took))
+    session.close()
+
+
+def series_parse(session):
+    """Compares parsing 1000 entries against 400 series with and without dispatching entries by series name."""
+    import random
+    import time
+    from flexget import plugin
+    from flexget.entry import Entry
+
+    series = plugin.get_plugin_by_name('series').instance
+    rand = random.Random(0)
+    words = ['the', 'of', 'and', 'show', 'news', 'late', 'night', 'world', 'life', 'dead', 'walking', 'big', 'bang',
+             'theory', 'house', 'cards', 'game', 'thrones', 'doctor', 'who', 'family', 'modern', 'guy', 'new', 'girl',
+             'good', 'wife', 'black', 'white', 'mirror', 'south', 'park', 'top', 'gear', 'true', 'detective',
+             'blood', 'lost', 'girls', 'boys', 'men', 'two', 'half', 'mad', 'bad', 'breaking', 'star', 'trek', 'city']
+    names = set()
+    while len(names) < 400:
+        names.add(' '.join(rand.sample(words, rand.randint(1, 3))).title())
+    config = series.prepare_config(sorted(names))
+    titles = []
+    for i in range(1000):
+        if i % 4:
+            name = ' '.join(rand.sample(words, rand.randint(2, 4)))
+        else:
+            name = rand.choice(sorted(names))
+        titles.append('%s.S%02dE%02d.720p.HDTV.x264-GRP' % (name.replace(' ', '.'), rand.randint(1, 9), i % 20 + 1))
+
+    results = []
+    for dispatch in [False, True]:
+        entries = [Entry(title, 'http://localhost/%s' % i) for i, title in enumerate(titles)]
+        start_time = time.time()
+        if dispatch:
+            series_entries = series.dispatch_entries(entries, config)
+        else:
+            series_entries = dict((series_item.keys()[0], entries) for series_item in config)
+        parses = 0
+        for series_item in config:
+            series_name, series_config = series_item.items()[0]
+            if series_name in series_entries:
+                parses += series.parse_series(session, series_entries[series_name], series_name, series_config)
+        took = time.time() - start_time
+        results.append([(e.get('series_name'), e.get('series_id')) for e in entries])
+        console('%s: %i entries, %i series, %i parses, took %.2f seconds' %
+                ('dispatched' if dispatch else 'all series', len(entries), len(config), parses, took))
+    if results[0] != results[1]:
+        console('Parse results differ!')
+
+
+def entry_states():
+    """Times len, indexing, membership and iteration of task entry states with up to 10000 entries."""
+    import time
+    from flexget.entry import Entry
+    from flexget.task import EntryContainer
+
+    for amount in [100, 1000, 10000]:
+        container = EntryContainer()
+        container.extend(Entry('Title %s' % i, 'http://localhost/%s' % i) for i in range(amount))
+        start_time = time.time()
+        # decide entries the way filters do, checking remaining counts as we go
+        for index, entry in enumerate(container.entries):
+            if index % 3 == 0:
+                entry.accept()
+            elif index % 5 == 0:
+                entry.reject()
+            if index % 100 == 0:
+                len(container.undecided)
+        decided = time.time() - start_time
+
+        start_time = time.time()
+        for i in range(100):
+            len(container.accepted), len(container.rejected), len(container.entries)
+        lengths = time.time() - start_time
+
+        start_time = time.time()
+        step = max(1, len(container.accepted) // 100)
+        for i in range(0, len(container.accepted), step):
+            container.accepted[i]
+        indexing = time.time() - start_time
+
+        start_time = time.time()
+        for entry in container[::max(1, amount // 100)]:
+            entry in container.rejected
+        membership = time.time() - start_time
+
+        start_time = time.time()
+        for entry in container.accepted:
+            pass
+        iteration = time.time() - start_time
+        console('%6i entries: decide %.3fs, 300 len %.3fs, 100 index %.3fs, 100 in %.3fs, iterate %.3fs' %
+                (amount, decided, lengths, indexing, membership, iteration))
+
+
+def plugin_loading():
+    """Compares startup of fresh interpreters loading all plugins and loading them via plugin manifest."""
+    import os
+    import shutil
+    import subprocess
+    import sys
+    import tempfile
+    import time
+
+    script = ('import sys, time; start = time.time(); from flexget import logger, plugin; logger.initialize(True); '
+              'plugin.load_plugins(); print time.time() - start, '
+              'len([m for m in sys.modules if m.startswith("flexget.plugins.")])')
+    tempdir = tempfile.mkdtemp()
+    env = dict(os.environ, FLEXGET_PLUGIN_MANIFEST=os.path.join(tempdir, 'manifest.json'))
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    try:
+        # first run generates the manifest
+        for name, runs in [('without manifest', 5), ('generating manifest', 1), ('with manifest', 5)]:
+            took = []
+            for i in range(runs):
+                run_env = env if name != 'without manifest' else dict(env, FLEXGET_PLUGIN_MANIFEST='')
+                start_time = time.time()
+                output = subprocess.Popen([sys.executable, '-c', script], env=run_env, cwd=root,
+                                          stdout=subprocess.PIPE, stderr=open(os.devnull, 'w')).communicate()[0]
+                took.append((time.time() - start_time, float(output.split()[0]), int(output.split()[1])))
+            console('%-20s process %.2f seconds, import and load plugins %.2f seconds, %i plugin modules imported' %
+                    (name, min(t[0] for t in took), min(t[1] for t in took), took[0][2]))
+    finally:
+        shutil.rmtree(tempdir)
+
+
+def event_dispatch():
+    """Times firing events with no handlers and with a few handlers of different priorities."""
+    import time
+    from flexget.event import add_event_handler, fire_event, remove_event_handlers
+
+    def handler(*args, **kwargs):
+        pass
+
+    fires = 100000
+    for amount in [0, 1, 5, 20]:
+        name = 'perf_test.handlers_%s' % amount
+        for i in range(amount):
+            # each handler needs to be a separate function
+            add_event_handler(name, lambda *args, **kwargs: handler(*args, **kwargs), priority=i % 3 * 100)
+        start_time = time.time()
+        for i in range(fires):
+            fire_event(name, None, 'plugin')
+        took = time.time() - start_time
+        remove_event_handlers(name)
+        console('%2i handlers: %.2f microseconds per fire_event' % (amount, took / fires * 1000000))
+
+
+def archive_ingest():
+    """Reports queries and time archive takes on task exit, half of the entries being already archived."""
+    import time
+    from sqlalchemy import create_engine, event as sa_event
+    from sqlalchemy.orm import sessionmaker
+    from flexget.entry import Entry
+    from flexget.manager import Base
+    from flexget.plugins.generic.archive import Archive, ArchiveTag
+
+    # use separate in-memory database, so that user's archive is not touched
+    engine = create_engine('sqlite://')
+    for table in ['archive_entry', 'archive_tag', 'archive_source', 'archive_entry_tags', 'archive_entry_sources']:
+        Base.metadata.tables[table].create(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([ArchiveTag('tag1'), ArchiveTag('tag2')])
+    session.commit()
+
+    queries = [0]
+
+    def count_query(*args, **kwargs):
+        queries[0] += 1
+
+    sa_event.listen(engine, 'before_cursor_execute', count_query)
+
+    class FakeTask(object):
+        def __init__(self, name, entries):
+            self.name = name
+            self.entries = entries
+            self.rejected = entries[::10]
+            self.failed = []
+            self.session = session
+
+    archive = Archive()
+    archived = 0
+    for amount in [10, 100, 1000, 2000]:
+        entries = [Entry('Title %s' % i, 'http://localhost/%s' % i, description='Description %s' % i)
+                   for i in range(amount)]
+        # archive every other entry which is not yet archived, from another task
+        archive.on_task_exit(FakeTask('other', entries[archived * 2::2]), ['tag1'])
+        session.commit()
+        archived = len(entries[::2])
+
+        queries[0] = 0
+        start_time = time.time()
+        archive.on_task_exit(FakeTask('perf-test', entries), ['tag1', 'tag2'])
+        session.commit()
+        took = time.time() - start_time
+        console('%5i entries: %5i queries, took %.3f seconds' % (amount, queries[0], took))
+    session.close()
+
+
 @event('options.register')
 def register_parser_arguments():
     perf_parser = options.register_command('perf-test', cli_perf_test)
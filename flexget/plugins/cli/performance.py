@@ -1,10 +1,14 @@
 from __future__ import unicode_literals, division, absolute_import
 import logging
+import re
+import threading
+import time
 
 from argparse import SUPPRESS
 
 from flexget import options
-from flexget.event import event
+from flexget.event import event, add_event_handler, remove_event_handler
+from flexget.utils.tools import LRUCache
 
 log = logging.getLogger('performance')
 
@@ -12,62 +16,217 @@ performance = {}
 
 _start = {}
 
+# Originals of the SQLAlchemy methods replaced while the hooks are installed
+_originals = {}
+
 query_count = 0
 
+# Statistics for each query fingerprint
+query_stats = {}
+
+# Task, phase and plugin currently running in each thread
+_current = threading.local()
+
 
 def log_query_count(name_point):
     """Debugging purposes, allows logging number of executed queries at :name_point:"""
     log.info('At point named `%s` total of %s queries were ran' % (name_point, query_count))
 
 
+def fingerprint(statement):
+    """
+    Normalizes SQL statement so that queries differing only by their parameters have the same fingerprint.
+
+    :param string statement: SQL statement
+    :return: Statement with literals replaced by ? and IN lists of any length collapsed into IN (?+)
+    """
+    statement = ' '.join(statement.split())
+    statement = re.sub(r"'(?:[^']|'')*'", '?', statement)
+    statement = re.sub(r'\b\d+(?:\.\d+)?\b', '?', statement)
+    return re.sub(r'\bIN \(\?(?:, \?)*\)', 'IN (?+)', statement, flags=re.IGNORECASE)
+
+
+def record_query(statement, took, rows):
+    """Records executed statement for the plugin running in current thread, returns statistics for its fingerprint"""
+    stats = query_stats.setdefault(fingerprint(statement), {'count': 0, 'took': 0, 'rows': 0, 'callers': {}})
+    stats['count'] += 1
+    stats['took'] += took
+    stats['rows'] += rows
+    caller = getattr(_current, 'caller', None) or (None, None, None)
+    stats['callers'][caller] = stats['callers'].get(caller, 0) + 1
+    return stats
+
+
+def query_report(top=10):
+    """Returns lines reporting `top` slowest and most repeated query fingerprints"""
+    lines = []
+    for title, key in [('Slowest queries', 'took'), ('Most repeated queries', 'count')]:
+        lines.append('%s:' % title)
+        for statement, stats in sorted(query_stats.iteritems(), key=lambda item: item[1][key], reverse=True)[:top]:
+            callers = sorted(stats['callers'].iteritems(), key=lambda item: item[1], reverse=True)
+            lines.append('%6i times, took %0.3f sec, %i rows: %s' % (stats['count'], stats['took'], stats['rows'],
+                                                                    statement))
+            callers = ['%s (%i)' % ('/'.join(unicode(c) for c in caller) if caller[0] else 'no plugin', count)
+                       for caller, count in callers]
+            lines.append('       by ' + ', '.join(callers))
+    return lines
+
+
+def dump_json(filename):
+    import json
+
+    data = {
+        'plugins': performance,
+        'queries': [{
+            'fingerprint': statement,
+            'count': stats['count'],
+            'took': stats['took'],
+            'rows': stats['rows'],
+            'callers': [{'task': task, 'phase': phase, 'plugin': plugin, 'count': count}
+                        for (task, phase, plugin), count in stats['callers'].iteritems()]
+        } for statement, stats in query_stats.iteritems()]}
+    with open(filename, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def _recording():
+    """True when the task running in current thread was executed with --debug-perf"""
+    return getattr(_current, 'recording', False)
+
+
+def _count_query(*args, **kwargs):
+    global query_count
+    if _recording():
+        query_count += 1
+    return _originals['execute'](*args, **kwargs)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._perf_start = time.time()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not _recording():
+        return
+    took = time.time() - context._perf_start
+    # rows of selects are counted when they are processed
+    rows = 0
+    if context.isinsert or context.isupdate or context.isdelete:
+        rows = max(cursor.rowcount, 0)
+    context._perf_stats = record_query(statement, took, rows)
+
+
+def _process_rows(self, rows):
+    rows = _originals['process_rows'](self, rows)
+    stats = getattr(self.context, '_perf_stats', None)
+    if stats:
+        stats['rows'] += len(rows)
+    return rows
+
+
+def before_plugin(task, keyword):
+    _current.recording = getattr(task.options, 'debug_perf', False)
+    if not _current.recording:
+        return
+    fd = _start.setdefault(task.name, {})
+    fd.setdefault('time', {})[keyword] = time.time()
+    fd.setdefault('queries', {})[keyword] = query_count
+    _current.caller = (task.name, task.current_phase, keyword)
+
+
+def after_plugin(task, keyword):
+    _current.caller = None
+    if not _recording():
+        return
+    took = time.time() - _start[task.name]['time'][keyword]
+    queries = query_count - _start[task.name]['queries'][keyword]
+    # Store results, increases previous values
+    pd = performance.setdefault(task.name, {})
+    data = pd.setdefault(keyword, {})
+    data['took'] = data.get('took', 0) + took
+    data['queries'] = data.get('queries', 0) + queries
+
+
+def task_completed(task):
+    _current.recording = False
+
+
+def log_results(manager):
+    if not manager.options.execute.debug_perf:
+        return
+    for name, data in performance.iteritems():
+        log.info('Performance results for task %s:' % name)
+        for keyword, results in data.iteritems():
+            took = results['took']
+            queries = results['queries']
+            if took > 0.1 or queries > 10:
+                log.info('%-15s took %0.2f sec (%s queries)' % (keyword, took, queries))
+    for name, cache in sorted(LRUCache.registry.iteritems()):
+        log.info('Cache %s: %s hits, %s misses, %s items' % (name, cache.hits, cache.misses, len(cache)))
+    for line in query_report(manager.options.execute.debug_perf_top):
+        log.info(line)
+    if manager.options.execute.debug_perf_json:
+        dump_json(manager.options.execute.debug_perf_json)
+        log.info('Performance data written to %s' % manager.options.execute.debug_perf_json)
+    # Next report only covers the executions after this one
+    performance.clear()
+    query_stats.clear()
+    _start.clear()
+
+
+_handlers = [('task.execute.before_plugin', before_plugin), ('task.execute.after_plugin', after_plugin),
+             ('task.execute.completed', task_completed), ('manager.execute.completed', log_results)]
+
+
+def install():
+    """
+    Installs the SQLAlchemy hooks and event handlers, unless they already are. They only record tasks executed with
+    --debug-perf, so they can stay installed for the rest of the process.
+    """
+    if _originals:
+        return
+    from sqlalchemy import event as sa_event
+    from sqlalchemy.engine import Connection, Engine, ResultProxy
+
+    # Monkeypatch query counter for SQLAlchemy
+    _originals['execute'] = Connection.__dict__['execute']
+    Connection.execute = _count_query
+    # Record every statement, rows are counted when results are processed
+    sa_event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    sa_event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    _originals['process_rows'] = ResultProxy.__dict__['process_rows']
+    ResultProxy.process_rows = _process_rows
+    for name, handler in _handlers:
+        add_event_handler(name, handler)
+
+
+def uninstall():
+    """Removes everything :func:`install` added."""
+    if not _originals:
+        return
+    from sqlalchemy import event as sa_event
+    from sqlalchemy.engine import Connection, Engine, ResultProxy
+
+    Connection.execute = _originals.pop('execute')
+    ResultProxy.process_rows = _originals.pop('process_rows')
+    sa_event.remove(Engine, 'before_cursor_execute', _before_cursor_execute)
+    sa_event.remove(Engine, 'after_cursor_execute', _after_cursor_execute)
+    for name, handler in _handlers:
+        remove_event_handler(name, handler)
+
+
 @event('manager.execute.started')
 def startup(manager):
     if manager.options.execute.debug_perf:
         log.info('Enabling plugin and SQLAlchemy performance debugging')
-        import time
-
-        # Monkeypatch query counter for SQLAlchemy
-        from sqlalchemy.engine import Connection
-        if hasattr(Connection, 'execute'):
-            orig_f = Connection.execute
-
-            def monkeypatched(*args, **kwargs):
-                global query_count
-                query_count += 1
-                return orig_f(*args, **kwargs)
-
-            Connection.execute = monkeypatched
-        else:
-            log.critical('Unable to monkeypatch sqlalchemy')
-
-        @event('task.execute.before_plugin')
-        def before(task, keyword):
-            fd = _start.setdefault(task.name, {})
-            fd.setdefault('time', {})[keyword] = time.time()
-            fd.setdefault('queries', {})[keyword] = query_count
-
-        @event('task.execute.after_plugin')
-        def after(task, keyword):
-            took = time.time() - _start[task.name]['time'][keyword]
-            queries = query_count - _start[task.name]['queries'][keyword]
-            # Store results, increases previous values
-            pd = performance.setdefault(task.name, {})
-            data = pd.setdefault(keyword, {})
-            data['took'] = data.get('took', 0) + took
-            data['queries'] = data.get('queries', 0) + queries
-
-        @event('manager.execute.completed')
-        def results(manager):
-            for name, data in performance.iteritems():
-                log.info('Performance results for task %s:' % name)
-                for keyword, results in data.iteritems():
-                    took = results['took']
-                    queries = results['queries']
-                    if took > 0.1 or queries > 10:
-                        log.info('%-15s took %0.2f sec (%s queries)' % (keyword, took, queries))
+        install()
 
 
 @event('options.register')
 def register_parser_arguments():
     options.get_parser('execute').add_argument('--debug-perf', action='store_true', dest='debug_perf', default=False,
                                                help=SUPPRESS)
+    options.get_parser('execute').add_argument('--debug-perf-top', type=int, dest='debug_perf_top', default=10,
+                                               metavar='N', help=SUPPRESS)
+    options.get_parser('execute').add_argument('--debug-perf-json', dest='debug_perf_json', metavar='FILE',
+                                               help=SUPPRESS)
@@ -39,26 +39,11 @@ class CrossMatch(object):
 
         match_entries = []
 
-        # TODO: xxx
-        # we probably want to have common "run and combine inputs" function sometime soon .. this code is in
-        # few places already (discover, inputs, ...)
-        # code written so that this can be done easily ...
-        for item in config['from']:
-            for input_name, input_config in item.iteritems():
-                input = plugin.get_plugin_by_name(input_name)
-                if input.api_ver == 1:
-                    raise plugin.PluginError('Plugin %s does not support API v2' % input_name)
-                method = input.phase_handlers['input']
-                try:
-                    result = method(task, input_config)
-                except plugin.PluginError as e:
-                    log.warning('Error during input plugin %s: %s' % (input_name, e))
-                    continue
-                if result:
-                    match_entries.extend(result)
-                else:
-                    log.warning('Input %s did not return anything' % input_name)
-                    continue
+        for input_name, result in plugin.call_inputs(task, config['from']):
+            if result:
+                match_entries.extend(result)
+            else:
+                log.warning('Input %s did not return anything' % input_name)
 
         # perform action on intersecting entries
         for entry in task.entries:
@@ -1,16 +1,16 @@
 from __future__ import unicode_literals, division, absolute_import
 import logging
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Unicode, DateTime, PickleType, Index
+from sqlalchemy import Column, Integer, String, Unicode, DateTime, LargeBinary, Index
 
 from flexget import db_schema, plugin
 from flexget.event import event
 from flexget.entry import Entry
-from flexget.utils.database import safe_pickle_synonym
+from flexget.utils.database import entry_synonym
 from flexget.utils.tools import parse_timedelta
 
 log = logging.getLogger('delay')
-Base = db_schema.versioned_base('delay', 1)
+Base = db_schema.versioned_base('delay', 2)
 
 
 class DelayedEntry(Base):
@@ -21,8 +21,8 @@ class DelayedEntry(Base):
     task = Column('feed', String)
     title = Column(Unicode)
     expire = Column(DateTime)
-    _entry = Column('entry', PickleType)
-    entry = safe_pickle_synonym('_entry')
+    _entry = Column('entry', LargeBinary)
+    entry = entry_synonym('_entry')
 
     def __repr__(self):
         return '<DelayedEntry(title=%s)>' % self.title
@@ -44,6 +44,9 @@ def upgrade(ver, session):
                     session.delete(de)
                     break
         ver = 1
+    if ver == 1:
+        # Entries are now stored with entry_codec, which older versions can not load
+        ver = 2
     return ver
 
 
@@ -67,6 +70,7 @@ class FilterDelay(object):
         except ValueError:
             raise plugin.PluginError('Invalid time format', log)
 
+    @plugin.volatile
     @plugin.priority(-1)
     def on_task_input(self, task, config):
         """Captures the current input then replaces it with entries that have passed the delay."""
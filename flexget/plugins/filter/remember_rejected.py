@@ -2,16 +2,17 @@ from __future__ import unicode_literals, division, absolute_import
 import logging
 from datetime import datetime, timedelta
 
-from sqlalchemy import Column, Integer, String, Unicode, DateTime, ForeignKey, and_, Index
+from sqlalchemy import Column, Integer, String, Unicode, DateTime, ForeignKey, or_, Index
 from sqlalchemy.orm import relation
 
 from flexget import db_schema, plugin
 from flexget.event import event
-from flexget.utils.sqlalchemy_utils import table_columns, drop_tables, table_add_column
+from flexget.utils.sqlalchemy_utils import (table_columns, table_add_column, table_schema, get_index_by_name,
+                                            delete_batch)
 from flexget.utils.tools import parse_timedelta
 
 log = logging.getLogger('remember_rej')
-Base = db_schema.versioned_base('remember_rejected', 3)
+Base = db_schema.versioned_base('remember_rejected', 4)
 
 
 @db_schema.upgrade('remember_rejected')
@@ -33,6 +34,13 @@ def upgrade(ver, session):
         log.info('Adding expires column to remember_rejected_entry table.')
         table_add_column('remember_rejected_entry', 'expires', DateTime, session)
         ver = 3
+    if ver == 3:
+        # Tables created before the index was added to the model are missing it
+        if get_index_by_name(table_schema('remember_rejected_entry', session), 'remember_feed_title_url') is None:
+            log.info('Creating index on remember_rejected_entry table.')
+            index = get_index_by_name(Base.metadata.tables['remember_rejected_entry'], 'remember_feed_title_url')
+            index.create(bind=session.connection())
+        ver = 4
     return ver
 
 
@@ -73,6 +81,10 @@ class FilterRememberRejected(object):
         entry.reject('message', remember=True)
     """
 
+    def __init__(self):
+        # Remembered rejections not yet written to database, by task name
+        self.pending = {}
+
     @plugin.priority(0)
     def on_task_start(self, task, config):
         """Purge remembered entries if the config has changed."""
@@ -103,18 +115,26 @@ class FilterRememberRejected(object):
     def on_task_filter(self, task, config):
         """Reject any remembered entries from previous runs"""
         (task_id,) = task.session.query(RememberTask.id).filter(RememberTask.name == task.name).first()
-        reject_entries = task.session.query(RememberEntry).filter(RememberEntry.task_id == task_id)
-        if reject_entries.count():
-            # Reject all the remembered entries
-            for entry in task.entries:
-                if not entry.get('url'):
-                    # We don't record or reject any entries without url
-                    continue
-                reject_entry = reject_entries.filter(and_(RememberEntry.title == entry['title'],
-                                                          RememberEntry.url == entry['original_url'])).first()
-                if reject_entry:
-                    entry.reject('Rejected on behalf of %s plugin: %s' %
-                        (reject_entry.rejected_by, reject_entry.reason))
+        # Load all unexpired remembered entries of the task at once, plus the ones not yet written
+        remembered = {}
+        reject_entries = task.session.query(RememberEntry.title, RememberEntry.url, RememberEntry.rejected_by,
+                                            RememberEntry.reason).filter(RememberEntry.task_id == task_id).\
+            filter(or_(RememberEntry.expires == None, RememberEntry.expires >= datetime.now())).\
+            order_by(RememberEntry.id)
+        for title, url, rejected_by, reason in reject_entries:
+            remembered.setdefault((title, url), (rejected_by, reason))
+        for row in self.pending.get(task.name, []):
+            remembered.setdefault((row['title'], row['url']), (row['rejected_by'], row['reason']))
+        if not remembered:
+            return
+        # Reject all the remembered entries
+        for entry in task.entries:
+            if not entry.get('url'):
+                # We don't record or reject any entries without url
+                continue
+            reject_entry = remembered.get((entry['title'], entry['original_url']))
+            if reject_entry:
+                entry.reject('Rejected on behalf of %s plugin: %s' % reject_entry)
 
     def on_entry_reject(self, entry, task=None, remember=None, remember_time=None, **kwargs):
         # We only remember rejections that specify the remember keyword argument
@@ -132,19 +152,33 @@ class FilterRememberRejected(object):
         if remember_time:
             message += ' for %i minutes' % (remember_time.seconds / 60)
         log.info(message)
+        # Written to database after the rejecting plugin has finished, see write_pending
+        self.pending.setdefault(task.name, []).append({
+            'title': entry['title'], 'url': entry['original_url'], 'rejected_by': task.current_plugin,
+            'reason': kwargs.get('reason'), 'added': datetime.now(), 'expires': expires})
+
+    def write_pending(self, task):
+        """Inserts the rejections remembered for `task` into database with a single statement"""
+        rows = self.pending.pop(task.name, None)
+        if not rows:
+            return
         (remember_task_id,) = task.session.query(RememberTask.id).filter(RememberTask.name == task.name).first()
-        task.session.add(RememberEntry(title=entry['title'], url=entry['original_url'], task_id=remember_task_id,
-                                       rejected_by=task.current_plugin, reason=kwargs.get('reason'), expires=expires))
-        # The test stops passing when this is taken out for some reason...
-        task.session.flush()
+        for row in rows:
+            row['feed_id'] = remember_task_id
+        task.session.execute(RememberEntry.__table__.insert(), rows)
+        log.debug('Remembered %s rejections' % len(rows))
+
+
+@event('task.execute.after_plugin')
+def write_pending(task, keyword):
+    plugin.get_plugin_by_name('remember_rejected').instance.write_pending(task)
 
 
-@event('manager.db_cleanup')
-def db_cleanup(session):
+@event('manager.db_cleanup.batch')
+def db_cleanup(session, batch_size):
     # Remove entries older than 30 days
-    result = session.query(RememberEntry).filter(RememberEntry.added < datetime.now() - timedelta(days=30)).delete()
-    if result:
-        log.verbose('Removed %d entries from remember rejected table.' % result)
+    query = session.query(RememberEntry).filter(RememberEntry.added < datetime.now() - timedelta(days=30))
+    return delete_batch(query, RememberEntry.id, batch_size)
 
 
 @event('plugin.register')
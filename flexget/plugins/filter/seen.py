@@ -10,9 +10,10 @@ forget (string)
 
 from __future__ import unicode_literals, division, absolute_import
 import logging
+import threading
 from datetime import datetime, timedelta
 
-from sqlalchemy import Column, Integer, DateTime, Unicode, Boolean, or_, select, update, Index
+from sqlalchemy import Column, Integer, DateTime, Unicode, Boolean, or_, select, update, Index, func
 from sqlalchemy.orm import relation
 from sqlalchemy.schema import ForeignKey
 
@@ -20,11 +21,14 @@ from flexget import db_schema, options, plugin
 from flexget.event import event
 from flexget.manager import Session
 from flexget.utils.imdb import is_imdb_url, extract_id
-from flexget.utils.sqlalchemy_utils import table_schema, table_add_column
+from flexget.utils.sqlalchemy_utils import table_schema, table_add_column, chunked
 from flexget.utils.tools import console
 
 log = logging.getLogger('seen')
-Base = db_schema.versioned_base('seen', 4)
+Base = db_schema.versioned_base('seen', 5)
+
+# Process wide :class:`SeenIndex`, only built when running as daemon
+seen_index = None
 
 
 @db_schema.upgrade('seen')
@@ -51,6 +55,17 @@ def upgrade(ver, session):
         entry_table = table_schema('seen_entry', session)
         session.execute(update(entry_table, entry_table.c.local == None, {'local': False}))
         ver = 4
+    if ver == 4:
+        # Seen index finds new rows by id, ids of removed rows must not be given to new ones
+        log.info('Rebuilding seen_field table, this could take a while.')
+        session.execute('DROP INDEX IF EXISTS ix_seen_field_seen_entry_id')
+        session.execute('DROP INDEX IF EXISTS ix_seen_field_value')
+        session.execute('ALTER TABLE seen_field RENAME TO seen_field_old')
+        Base.metadata.tables['seen_field'].create(bind=session.connection())
+        session.execute('INSERT INTO seen_field (id, seen_entry_id, field, value, added) '
+                        'SELECT id, seen_entry_id, field, value, added FROM seen_field_old')
+        session.execute('DROP TABLE seen_field_old')
+        ver = 5
 
     return ver
 
@@ -82,6 +97,7 @@ class SeenEntry(Base):
 class SeenField(Base):
 
     __tablename__ = 'seen_field'
+    __table_args__ = {'sqlite_autoincrement': True}
 
     id = Column(Integer, primary_key=True)
     seen_entry_id = Column(Integer, ForeignKey('seen_entry.id'), nullable=False, index=True)
@@ -127,6 +143,74 @@ def forget(value):
     finally:
         session.commit()
         session.close()
+        if seen_index:
+            seen_index.invalidate()
+
+
+class SeenIndex(object):
+    """
+    In-memory index of all seen values, divided by the scopes seen filter looks them up in. Values which are not in
+    the index have never been seen, so they don't need to be looked up from the database at all. Values in the index
+    may since have been forgotten, they must be confirmed from the database.
+
+    Index is kept current by learning and forgetting seen entries. Rows added by other processes are picked up
+    by :meth:`sync`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._global = set()
+        self._tasks = {}
+        # id of the last SeenField in index, None if index must be rebuilt. SeenField ids are never reused, rows
+        # with higher id have been added since.
+        self._last_id = None
+
+    def invalidate(self):
+        """Rebuild index on next use. Used when seen values are removed."""
+        with self._lock:
+            self._last_id = None
+
+    def add(self, task_name, value, local=False):
+        with self._lock:
+            self._add(task_name, value, local)
+
+    def _add(self, task_name, value, local):
+        self._tasks.setdefault(task_name, set()).add(value)
+        if not local:
+            self._global.add(value)
+
+    def sync(self, session):
+        """Adds values seen since the last sync into the index, or rebuilds whole index if it has been invalidated."""
+        with self._lock:
+            self._sync(session)
+
+    def _sync(self, session):
+        max_id = session.query(func.max(SeenField.id)).scalar() or 0
+        if self._last_id is None or max_id < self._last_id:
+            log.debug('Building seen index')
+            self._global.clear()
+            self._tasks.clear()
+            self._last_id = 0
+        if max_id > self._last_id:
+            query = session.query(SeenField.value, SeenEntry.task, SeenEntry.local).join(SeenEntry).\
+                filter(SeenField.id > self._last_id).filter(SeenField.id <= max_id)
+            for value, task_name, local in query.yield_per(1000):
+                self._add(task_name, value, local)
+            self._last_id = max_id
+
+    def candidates(self, session, values, task_name, local=False):
+        """
+        :param session: Session used to sync the index
+        :param values: Set of values to look for
+        :param task_name: Name of the task looking for the values
+        :param bool local: Only look for values seen in `task_name`
+        :return: Set of values that may have been seen
+        """
+        with self._lock:
+            self._sync(session)
+            if local:
+                return values & self._tasks.get(task_name, set())
+            return values & self._global
 
 
 class FilterSeen(object):
@@ -161,8 +245,9 @@ class FilterSeen(object):
         fields = self.fields
         local = config == 'local'
 
+        # construct list of values looked for each entry
+        entry_values = []
         for entry in task.entries:
-            # construct list of values looked
             values = []
             for field in fields:
                 if field not in entry:
@@ -170,20 +255,47 @@ class FilterSeen(object):
                 if entry[field] not in values and entry[field]:
                     values.append(unicode(entry[field]))
             if values:
-                log.trace('querying for: %s' % ', '.join(values))
-                # check if SeenField.value is any of the values
-                found = task.session.query(SeenField).join(SeenEntry).filter(SeenField.value.in_(values))
-                if local:
-                    found = found.filter(SeenEntry.task == task.name)
-                else:
-                    found = found.filter(SeenEntry.local == False)
-                found = found.first()
-                if found:
-                    log.debug("Rejecting '%s' '%s' because of seen '%s'" % (entry['url'], entry['title'], found.value))
-                    se = task.session.query(SeenEntry).filter(SeenEntry.id == found.seen_entry_id).one()
-                    entry.reject('Entry with %s `%s` is already marked seen in the task %s at %s' %
-                                 (found.field, found.value, se.task, se.added.strftime('%Y-%m-%d %H:%M')),
-                                remember=remember_rejected)
+                entry_values.append((entry, values))
+        if not entry_values:
+            return
+
+        all_values = set(value for entry, values in entry_values for value in values)
+        if seen_index:
+            all_values = seen_index.candidates(task.session, all_values, task.name, local)
+        found = self.find_seen(task, all_values, local)
+        for entry, values in entry_values:
+            # use the earliest seen match if the entry has many seen values
+            matches = [found[value] for value in values if value in found]
+            if not matches:
+                continue
+            field, value, seen_task, added = min(matches)[1:]
+            log.debug("Rejecting '%s' '%s' because of seen '%s'" % (entry['url'], entry['title'], value))
+            entry.reject('Entry with %s `%s` is already marked seen in the task %s at %s' %
+                         (field, value, seen_task, added.strftime('%Y-%m-%d %H:%M')),
+                         remember=remember_rejected)
+
+    def find_seen(self, task, values, local=False):
+        """
+        Looks up which of `values` have been seen, using as few queries as possible.
+
+        :param task: Task whose session (and name, with `local`) is used
+        :param values: Iterable of unicode values to look for
+        :param bool local: Only look for values seen in this task
+        :return: Dict mapping seen values to (seen field id, field, value, task, added) tuples of the
+          first time they were seen
+        """
+        found = {}
+        for chunk in chunked(values):
+            log.trace('querying for: %s' % ', '.join(chunk))
+            query = task.session.query(SeenField.id, SeenField.field, SeenField.value, SeenEntry.task,
+                                       SeenEntry.added).join(SeenEntry).filter(SeenField.value.in_(chunk))
+            if local:
+                query = query.filter(SeenEntry.task == task.name)
+            else:
+                query = query.filter(SeenEntry.local == False)
+            for row in query.order_by(SeenField.id):
+                found.setdefault(row[2], tuple(row))
+        return found
 
     @plugin.priority(-255)
     def on_task_output(self, task, config):
@@ -222,6 +334,9 @@ class FilterSeen(object):
         # Only add the entry to the session if it has one of the required fields
         if se.fields:
             task.session.add(se)
+            if seen_index:
+                for sf in se.fields:
+                    seen_index.add(se.task, sf.value, local)
 
     def forget(self, task, title):
         """Forget SeenEntry with :title:. Return True if forgotten."""
@@ -229,6 +344,8 @@ class FilterSeen(object):
         if se:
             log.debug("Forgotten '%s' (%s fields)" % (title, len(se.fields)))
             task.session.delete(se)
+            if seen_index:
+                seen_index.invalidate()
             return True
 
 
@@ -243,6 +360,23 @@ def db_cleanup(session):
         log.verbose('Removed %d seen fields older than 1 year.' % result)
 
 
+@event('manager.daemon.started')
+def build_seen_index(manager):
+    global seen_index
+    seen_index = SeenIndex()
+    session = Session()
+    try:
+        seen_index.sync(session)
+    finally:
+        session.close()
+
+
+@event('manager.daemon.completed')
+def drop_seen_index(manager):
+    global seen_index
+    seen_index = None
+
+
 def do_cli(manager, options):
     if options.seen_action == 'forget':
         seen_forget(manager, options)
@@ -19,7 +19,7 @@ from flexget.utils import qualities
 from flexget.utils.log import log_once
 from flexget.utils.titles import SeriesParser, ParseWarning, ID_TYPES
 from flexget.utils.sqlalchemy_utils import (table_columns, table_exists, drop_tables, table_schema, table_add_column,
-                                            create_index)
+                                            create_index, delete_batch)
 from flexget.utils.tools import merge_dict_from_to, parse_timedelta
 from flexget.utils.database import quality_property
 
@@ -144,22 +144,20 @@ def upgrade(ver, session):
     return ver
 
 
-@event('manager.db_cleanup')
-def db_cleanup(session):
-    # Clean up old undownloaded releases
-    result = session.query(Release).\
-        filter(Release.downloaded == False).\
-        filter(Release.first_seen < datetime.now() - timedelta(days=120)).delete(False)
-    if result:
-        log.verbose('Removed %d undownloaded episode releases.', result)
-    # Clean up episodes without releases
-    result = session.query(Episode).filter(~Episode.releases.any()).filter(~Episode.begins_series.any()).delete(False)
-    if result:
-        log.verbose('Removed %d episodes without releases.', result)
-    # Clean up series without episodes that aren't in any tasks
-    result = session.query(Series).filter(~Series.episodes.any()).filter(~Series.in_tasks.any()).delete(False)
-    if result:
-        log.verbose('Removed %d series without episodes.', result)
+@event('manager.db_cleanup.batch')
+def db_cleanup(session, batch_size):
+    # Clean up old undownloaded releases first, then episodes without releases, then series without episodes that
+    # aren't in any tasks
+    steps = [
+        (session.query(Release).filter(Release.downloaded == False).
+         filter(Release.first_seen < datetime.now() - timedelta(days=120)), Release.id),
+        (session.query(Episode).filter(~Episode.releases.any()).filter(~Episode.begins_series.any()), Episode.id),
+        (session.query(Series).filter(~Series.episodes.any()).filter(~Series.in_tasks.any()), Series.id)]
+    for query, primary_key in steps:
+        deleted = delete_batch(query, primary_key, batch_size)
+        if deleted:
+            return deleted
+    return 0
 
 
 @event('manager.lock-acquired')
@@ -642,6 +640,14 @@ def forget_series_episode(name, identifier):
         session.close()
 
 
+def get_as_array(config, key):
+    """Return configuration key as array, even if given as a single string"""
+    v = config.get(key, [])
+    if isinstance(v, basestring):
+        return [v]
+    return v
+
+
 def populate_entry_fields(entry, parser):
     entry['series_parser'] = copy(parser)
     # add series, season and episode to entry
@@ -893,13 +899,56 @@ class FilterSeries(FilterSeriesBase):
     def on_task_metainfo(self, task, config):
         config = self.prepare_config(config)
         self.auto_exact(config)
+        series_entries = self.dispatch_entries(task.entries, config)
+        parses = 0
         for series_item in config:
             series_name, series_config = series_item.items()[0]
+            if series_name not in series_entries:
+                continue
             log.trace('series_name: %s series_config: %s', series_name, series_config)
             start_time = time.clock()
-            self.parse_series(task.session, task.entries, series_name, series_config)
+            parses += self.parse_series(task.session, series_entries[series_name], series_name, series_config)
             took = time.clock() - start_time
             log.trace('parsing %s took %s', series_name, took)
+        log.debug('%s entries parsed against %s series with %s parses', len(task.entries), len(config), parses)
+
+    def dispatch_entries(self, entries, config):
+        """
+        Finds the entries each configured series could possibly match, based on the normalized series names
+        the entry title or description must start with.
+
+        :param entries: List of entries to process
+        :param config: Prepared series config
+        :return: Dict mapping series names to lists of entries which should be parsed for them. Series which cannot
+          match any entry are left out.
+        """
+        # series names, indexed by name prefix length and the prefix
+        index = {}
+        series_entries = {}
+        for series_item in config:
+            series_name, series_config = series_item.items()[0]
+            parser = SeriesParser(name=series_name, alternate_names=get_as_array(series_config, 'alternate_name'),
+                                  name_regexps=get_as_array(series_config, 'name_regexp'))
+            prefixes = parser.name_prefixes()
+            if prefixes is None:
+                # no way to tell what custom regexps match, parse all entries
+                series_entries[series_name] = list(entries)
+                continue
+            for prefix in prefixes:
+                index.setdefault(len(prefix), {}).setdefault(prefix, set()).add(series_name)
+
+        for entry in entries:
+            matches = set()
+            for field in ('title', 'description'):
+                data = entry.get(field)
+                if not isinstance(data, basestring) or not data:
+                    continue
+                for data_prefix in SeriesParser.data_prefixes(data):
+                    for length, prefixes in index.iteritems():
+                        matches.update(prefixes.get(data_prefix[:length], ()))
+            for series_name in matches:
+                series_entries.setdefault(series_name, []).append(entry)
+        return series_entries
 
     def on_task_filter(self, task, config):
         """Filter series"""
@@ -981,15 +1030,9 @@ class FilterSeries(FilterSeriesBase):
         :param entries: List of entries to process
         :param series_name: Series name which is being processed
         :param config: Series config being processed
+        :return: Number of times entry fields were parsed
         """
 
-        def get_as_array(config, key):
-            """Return configuration key as array, even if given as a single string"""
-            v = config.get(key, [])
-            if isinstance(v, basestring):
-                return [v]
-            return v
-
         # set parser flags flags based on config / database
         identified_by = config.get('identified_by', 'auto')
         if identified_by == 'auto':
@@ -1011,6 +1054,7 @@ class FilterSeries(FilterSeriesBase):
 
         parser = SeriesParser(**params)
 
+        parses = 0
         for entry in entries:
             # skip processed entries
             if (entry.get('series_parser') and entry['series_parser'].valid and
@@ -1027,6 +1071,7 @@ class FilterSeries(FilterSeriesBase):
                 if entry.get('quality'):
                     log.trace('Setting quality %s from entry field to parser', entry['quality'])
                     quality = entry['quality']
+                parses += 1
                 try:
                     parser.parse(data, field=field, quality=quality)
                 except ParseWarning as pw:
@@ -1050,6 +1095,7 @@ class FilterSeries(FilterSeriesBase):
             if 'set' in config:
                 set = plugin.get_plugin_by_name('set')
                 set.instance.modify(entry, config.get('set'))
+        return parses
 
     def process_series(self, task, series_entries, config):
         """
@@ -1,25 +1,27 @@
 from __future__ import unicode_literals, division, absolute_import
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 import logging
 import re
 from datetime import datetime
 
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.schema import Table, ForeignKey
-from sqlalchemy import Column, Integer, DateTime, Unicode, Index
+from sqlalchemy.sql import table, column, literal_column
+from sqlalchemy import Column, Integer, DateTime, Unicode, Index, event as sa_event
 
 from flexget import db_schema, options, plugin
 from flexget.event import event
 from flexget.entry import Entry
 from flexget.options import ParseExtrasAction, get_parser
-from flexget.utils.sqlalchemy_utils import table_schema, get_index_by_name
+from flexget.utils.sqlalchemy_utils import table_schema, get_index_by_name, chunked
 from flexget.utils.tools import console, strip_html
 from flexget.manager import Session
 
 log = logging.getLogger('archive')
 
-SCHEMA_VER = 0
+SCHEMA_VER = 1
 
 Base = db_schema.versioned_base('archive', SCHEMA_VER)
 
@@ -82,6 +84,65 @@ class ArchiveSource(Base):
         return '<ArchiveSource(id=%s,name=%s)>' % (self.id, self.name)
 
 
+#: Full-text index of entry titles and descriptions, kept in sync with archive_entry by triggers
+archive_fts = table('archive_entry_fts', column('rowid'), column('rank'))
+
+FTS_DDL = [
+    "CREATE VIRTUAL TABLE archive_entry_fts USING fts5(title, description, content='archive_entry', "
+    "content_rowid='id')",
+    "CREATE TRIGGER archive_entry_fts_insert AFTER INSERT ON archive_entry BEGIN "
+    "INSERT INTO archive_entry_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER archive_entry_fts_delete AFTER DELETE ON archive_entry BEGIN "
+    "INSERT INTO archive_entry_fts(archive_entry_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER archive_entry_fts_update AFTER UPDATE OF title, description ON archive_entry BEGIN "
+    "INSERT INTO archive_entry_fts(archive_entry_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO archive_entry_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "INSERT INTO archive_entry_fts(archive_entry_fts) VALUES ('rebuild')"]
+
+
+def create_fts_index(connection):
+    """
+    Creates full-text index for archive search and fills it with existing entries. Search falls back to slower LIKE
+    queries when sqlite does not have FTS5 extension.
+
+    :return: True if index was created
+    """
+    if connection.dialect.name != 'sqlite':
+        return False
+    # Clean up anything left by an earlier, interrupted attempt
+    for trigger in ['insert', 'delete', 'update']:
+        connection.execute('DROP TRIGGER IF EXISTS archive_entry_fts_%s' % trigger)
+    connection.execute('DROP TABLE IF EXISTS archive_entry_fts')
+    try:
+        connection.execute(FTS_DDL[0])
+    except OperationalError as e:
+        log.verbose('Unable to create archive search index, searching will be slower: %s' % e)
+        return False
+    for statement in FTS_DDL[1:]:
+        connection.execute(statement)
+    return True
+
+
+@sa_event.listens_for(ArchiveEntry.__table__, 'after_create')
+def after_entry_table_create(target, connection, **kw):
+    create_fts_index(connection)
+
+
+@sa_event.listens_for(ArchiveEntry.__table__, 'before_drop')
+def before_entry_table_drop(target, connection, **kw):
+    # Triggers are dropped along with archive_entry table
+    if connection.dialect.name == 'sqlite':
+        connection.execute('DROP TABLE IF EXISTS archive_entry_fts')
+
+
+def has_fts_index(session):
+    if session.bind.dialect.name != 'sqlite':
+        return False
+    return bool(session.execute("SELECT 1 FROM sqlite_master WHERE name = 'archive_entry_fts'").scalar())
+
+
 def get_source(name, session):
     """
     :param string name: Source name
@@ -108,6 +169,23 @@ def get_tag(name, session):
         return source
 
 
+def get_entry_ids(keys, session, newest=False):
+    """
+    :param keys: (title, url) pairs
+    :param session: SQLAlchemy session
+    :param bool newest: Give the newest entry of each pair instead of the oldest one
+    :return: Dict mapping the archived pairs to ids of their archive entries
+    """
+    ids = {}
+    order = ArchiveEntry.id.desc() if newest else ArchiveEntry.id
+    for titles in chunked(set(title for title, url in keys)):
+        for id, title, url in session.query(ArchiveEntry.id, ArchiveEntry.title, ArchiveEntry.url).\
+                filter(ArchiveEntry.title.in_(titles)).order_by(order):
+            if (title, url) in keys:
+                ids.setdefault((title, url), id)
+    return ids
+
+
 @db_schema.upgrade('archive')
 def upgrade(ver, session):
     if ver is None:
@@ -134,6 +212,10 @@ def upgrade(ver, session):
             log.critical('one time when you have time, it may take hours')
             log.critical('----------------------------------------------')
         ver = 0
+    if ver == 0:
+        log.info('Building archive search index (may take a while) ...')
+        create_fts_index(session.connection())
+        ver = 1
     return ver
 
 
@@ -161,51 +243,57 @@ class Archive(object):
         else:
             tag_names = config
 
-        tags = []
-        for tag_name in set(tag_names):
-            tags.append(get_tag(tag_name, task.session))
+        session = task.session
+        tags = [get_tag(tag_name, session) for tag_name in set(tag_names)]
+        source = get_source(task.name, session)
+        # new tags and source need ids for association rows
+        session.add_all(tags + [source])
+        session.flush()
 
-        count = 0
-        processed = []
+        # entry can be in multiple lists, archive each title and url only once
+        entries = OrderedDict()
         for entry in task.entries + task.rejected + task.failed:
-            # I think entry can be in multiple of those lists .. not sure though!
-            if entry in processed:
-                continue
-            else:
-                processed.append(entry)
-
-            ae = task.session.query(ArchiveEntry).\
-                filter(ArchiveEntry.title == entry['title']).\
-                filter(ArchiveEntry.url == entry['url']).first()
-            if ae:
-                # add (missing) sources
-                source = get_source(task.name, task.session)
-                if not source in ae.sources:
-                    log.debug('Adding `%s` into `%s` sources' % (task.name, ae))
-                    ae.sources.append(source)
-                # add (missing) tags
-                for tag_name in tag_names:
-                    atag = get_tag(tag_name, task.session)
-                    if not atag in ae.tags:
-                        log.debug('Adding tag %s into %s' % (tag_name, ae))
-                        ae.tags.append(atag)
-            else:
-                # create new archive entry
-                ae = ArchiveEntry()
-                ae.title = entry['title']
-                ae.url = entry['url']
-                if 'description' in entry:
-                    ae.description = entry['description']
-                ae.task = task.name
-                ae.sources.append(get_source(task.name, task.session))
-                if tags:
-                    # note, we're extending empty list
-                    ae.tags.extend(tags)
-                log.debug('Adding `%s` with %i tags to archive' % (ae, len(tags)))
-                task.session.add(ae)
-                count += 1
-        if count:
-            log.verbose('Added %i new entries to archive' % count)
+            entries.setdefault((entry['title'], entry['url']), entry)
+        if not entries:
+            return
+
+        archived = get_entry_ids(entries, session)
+
+        # find which archived entries already have the source and tags
+        has_source = set()
+        has_tag = set()
+        for ids in chunked(archived.values()):
+            has_source.update(row[0] for row in session.query(archive_sources_table.c.entry_id).
+                              filter(archive_sources_table.c.entry_id.in_(ids)).
+                              filter(archive_sources_table.c.source_id == source.id))
+            if tags:
+                has_tag.update(session.query(archive_tags_table.c.entry_id, archive_tags_table.c.tag_id).
+                               filter(archive_tags_table.c.entry_id.in_(ids)).
+                               filter(archive_tags_table.c.tag_id.in_([tag.id for tag in tags])))
+        source_rows = [{'entry_id': id, 'source_id': source.id} for id in archived.itervalues() if id not in has_source]
+        tag_rows = [{'entry_id': id, 'tag_id': tag.id} for id in archived.itervalues() for tag in tags
+                    if (id, tag.id) not in has_tag]
+        if source_rows or tag_rows:
+            log.debug('Adding missing sources to %i and tags to %i archived entries' %
+                      (len(source_rows), len(tag_rows)))
+
+        new = [key for key in entries if key not in archived]
+        if new:
+            added = datetime.now()
+            session.execute(ArchiveEntry.__table__.insert(),
+                            [{'title': title, 'url': url, 'description': entries[(title, url)].get('description'),
+                              'feed': task.name, 'added': added} for title, url in new])
+            # Look the rows up by their keys, ids of other rows may have been taken meanwhile. If another execution
+            # archived the same entry meanwhile, ours is the newest one.
+            for id in get_entry_ids(set(new), session, newest=True).itervalues():
+                source_rows.append({'entry_id': id, 'source_id': source.id})
+                tag_rows.extend({'entry_id': id, 'tag_id': tag.id} for tag in tags)
+            log.verbose('Added %i new entries to archive' % len(new))
+
+        if source_rows:
+            session.execute(archive_sources_table.insert(), source_rows)
+        if tag_rows:
+            session.execute(archive_tags_table.insert(), tag_rows)
 
     def on_task_abort(self, task, config):
         """
@@ -241,7 +329,8 @@ class UrlrewriteArchive(object):
         try:
             for query in entry.get('search_strings', [entry['title']]):
                 log.debug('looking for `%s` config: %s' % (query, config))
-                for archive_entry in search(session, query, desc=True):
+                # Titles are matched like other search plugins do, descriptions would give too wide matches
+                for archive_entry in search(session, query, desc=True, title_only=True):
                     log.debug('rewrite search result: %s' % archive_entry)
                     entry = Entry()
                     entry.update_using_map(self.entry_map, archive_entry, ignore_none=True)
@@ -350,32 +439,53 @@ def tag_source(source_name, tag_names=None):
 
 
 # API function, was also used from webui .. needs to be rethinked
-def search(session, text, tags=None, sources=None, desc=False):
+def search(session, text, tags=None, sources=None, desc=False, relevance=False, title_only=False):
     """
     Search from the archive.
 
+    With the full-text index, entries having all words of `text` (or words starting with them) in title or description
+    are returned. Without it titles are matched against `text`, ignoring spaces and dots.
+
     :param string text: Search text, spaces and dots are tried to be ignored.
     :param Session session: SQLAlchemy session, should not be closed while iterating results.
     :param list tags: Optional list of acceptable tags
     :param list sources: Optional list of acceptable sources
     :param bool desc: Sort results descending
+    :param bool relevance: Sort results by relevance instead of date, requires the full-text index
+    :param bool title_only: Only return entries whose title starts with `text`, ignoring spaces and dots, like searches
+      without the full-text index do. The index is still used to find the candidates.
     :return: ArchiveEntries responding to query
     """
-    keyword = unicode(text).replace(' ', '%').replace('.', '%')
-    # clean the text from any unwanted regexp, convert spaces and keep dots as dots
-    normalized_re = re.escape(text.replace('.', ' ')).replace('\\ ', ' ').replace(' ', '.')
-    find_re = re.compile(normalized_re, re.IGNORECASE)
-    query = session.query(ArchiveEntry).filter(ArchiveEntry.title.like('%' + keyword + '%'))
+    words = re.findall(r'\w+', unicode(text), re.UNICODE)
+    use_index = words and has_fts_index(session)
+    find_re = None
+    if title_only or not use_index:
+        # clean the text from any unwanted regexp, convert spaces and keep dots as dots
+        normalized_re = re.escape(text.replace('.', ' ')).replace('\\ ', ' ').replace(' ', '.')
+        find_re = re.compile(normalized_re, re.IGNORECASE)
+    query = session.query(ArchiveEntry)
+    if use_index:
+        match = ' '.join('"%s"*' % word for word in words)
+        if title_only:
+            match = 'title : (%s)' % match
+        query = query.join(archive_fts, archive_fts.c.rowid == ArchiveEntry.id).\
+            filter(literal_column('archive_entry_fts').match(match))
+    else:
+        relevance = False
+        keyword = unicode(text).replace(' ', '%').replace('.', '%')
+        query = query.filter(ArchiveEntry.title.like('%' + keyword + '%'))
     if tags:
         query = query.filter(ArchiveEntry.tags.any(ArchiveTag.name.in_(tags)))
     if sources:
         query = query.filter(ArchiveEntry.sources.any(ArchiveSource.name.in_(sources)))
-    if desc:
+    if relevance:
+        query = query.order_by(archive_fts.c.rank)
+    elif desc:
         query = query.order_by(ArchiveEntry.added.desc())
     else:
         query = query.order_by(ArchiveEntry.added.asc())
-    for a in query.yield_per(5):
-        if find_re.match(a.title):
+    for a in query.yield_per(100):
+        if not find_re or find_re.match(a.title):
             yield a
         else:
             log.trace('title %s is too wide match' % a.title)
@@ -385,6 +495,7 @@ def cli_search(options):
     search_term = ' '.join(options.keywords)
     tags = options.tags
     sources = options.sources
+    relevance = options.sort_by == 'relevance'
 
     def print_ae(ae):
         diff = datetime.now() - ae.added
@@ -408,7 +519,7 @@ def cli_search(options):
         console('Please wait...')
         console('')
         results = False
-        for ae in search(session, search_term, tags=tags, sources=sources):
+        for ae in search(session, search_term, tags=tags, sources=sources, relevance=relevance):
             print_ae(ae)
             results = True
         if not results:
@@ -492,6 +603,8 @@ def register_parser_arguments():
     search_parser.add_argument('keywords', metavar='<keyword>', nargs='+', help='keyword(s) to search for')
     search_parser.add_argument('--tags', metavar='TAG', nargs='+', default=[], help='tag(s) to search within')
     search_parser.add_argument('--sources', metavar='SOURCE', nargs='+', default=[], help='source(s) to search within')
+    search_parser.add_argument('--sort-by', choices=['added', 'relevance'], default='added',
+                               help='sort results by date added (default) or by relevance')
     inject_parser = archive_parser.add_subparser('inject', help='inject entries from the archive back into tasks')
     inject_parser.add_argument('ids', nargs='+', type=int, metavar='ID', help='archive ID of an item to inject')
     inject_parser.add_argument('--immortal', action='store_true', help='injected entries will not be able to be '
@@ -1,5 +1,6 @@
 from __future__ import unicode_literals, division, absolute_import
 import logging
+import sqlite3
 from flexget.event import event
 
 log = logging.getLogger('db_analyze')
@@ -8,5 +9,11 @@ log = logging.getLogger('db_analyze')
 # Run after the cleanup is actually finished
 @event('manager.db_cleanup', 0)
 def on_cleanup(session):
-    log.info('Running ANALYZE on database to improve performance.')
-    session.execute('ANALYZE')
+    # PRAGMA optimize only analyzes tables whose statistics are missing or out of date
+    if sqlite3.sqlite_version_info >= (3, 18, 0) and session.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").scalar():
+        log.verbose('Running PRAGMA optimize on database.')
+        session.execute('PRAGMA optimize')
+    else:
+        log.info('Running ANALYZE on database to improve performance.')
+        session.execute('ANALYZE')
@@ -1,20 +1,70 @@
 from __future__ import unicode_literals, division, absolute_import
 import logging
 from datetime import datetime, timedelta
-from flexget.utils.simple_persistence import SimplePersistence
 from flexget.event import event
+from flexget.utils.sqlalchemy_utils import sqlite_page_stats
 
 log = logging.getLogger('db_vacuum')
-VACUUM_INTERVAL = timedelta(weeks=24) # 6 months
+#: Value of auto_vacuum pragma when incremental vacuum is enabled
+AUTO_VACUUM_INCREMENTAL = 2
+#: Number of free pages released in one slice, other connections can write to database between slices
+VACUUM_SLICE_PAGES = 1000
+VACUUM_TIME_BUDGET = timedelta(seconds=30)
+#: Above this part of free pages a full VACUUM is recommended
+FULL_VACUUM_FREE_RATIO = 0.25
+#: Above this part of fragmented pages a full VACUUM is recommended
+FULL_VACUUM_FRAGMENTATION = 0.5
+
+
+def incremental_vacuum(session, pages=VACUUM_SLICE_PAGES, time_budget=VACUUM_TIME_BUDGET):
+    """
+    Releases free pages of the database in slices of `pages`, until none are left or `time_budget` is used.
+
+    :return: Number of pages released
+    """
+    released = 0
+    deadline = datetime.now() + time_budget
+    # incremental_vacuum frees one page per step, so this has to use dbapi cursor to fetch all results
+    cursor = session.connection().connection.cursor()
+    try:
+        free = session.execute('PRAGMA freelist_count').scalar()
+        while free and datetime.now() < deadline:
+            cursor.execute('PRAGMA incremental_vacuum(%d)' % pages)
+            cursor.fetchall()
+            left = session.execute('PRAGMA freelist_count').scalar()
+            released += free - left
+            free = left
+    finally:
+        cursor.close()
+    return released
+
+
+def vacuum_recommendation(stats):
+    """Returns reason to run `flexget database vacuum`, or None if it is not needed."""
+    if stats['auto_vacuum'] != AUTO_VACUUM_INCREMENTAL:
+        return 'Database does not release free space on cleanup yet'
+    if stats['free_ratio'] > FULL_VACUUM_FREE_RATIO:
+        return '%d%% of the database file is free space' % (stats['free_ratio'] * 100)
+    if stats.get('fragmentation') is not None and stats['fragmentation'] > FULL_VACUUM_FRAGMENTATION:
+        return '%d%% of the database pages are fragmented' % (stats['fragmentation'] * 100)
+
+
+def log_page_stats(stats):
+    log.verbose('Database has %(page_count)s pages of %(page_size)s bytes, %(freelist_count)s of them free.' % stats)
+    if stats.get('fragmentation') is not None:
+        log.verbose('%d%% of the database pages are fragmented.' % (stats['fragmentation'] * 100))
+    reason = vacuum_recommendation(stats)
+    if reason:
+        log.info('%s, running `flexget database vacuum` is recommended.' % reason)
 
 
 # Run after the cleanup is actually finished, but before analyze
 @event('manager.db_cleanup', 1)
 def on_cleanup(session):
-    # Vacuum can take a long time, and is not needed frequently
-    persistence = SimplePersistence('db_vacuum')
-    last_vacuum = persistence.get('last_vacuum')
-    if not last_vacuum or last_vacuum < datetime.now() - VACUUM_INTERVAL:
-        log.info('Running VACUUM on database to improve performance and decrease db size.')
-        session.execute('VACUUM')
-        persistence['last_vacuum'] = datetime.now()
+    # Older databases are not converted here, full VACUUM would keep the database locked from running tasks
+    # for too long. `flexget database vacuum` converts them.
+    if sqlite_page_stats(session)['auto_vacuum'] == AUTO_VACUUM_INCREMENTAL:
+        released = incremental_vacuum(session)
+        if released:
+            log.verbose('Released %s free database pages.' % released)
+    log_page_stats(sqlite_page_stats(session, fragmentation=True))
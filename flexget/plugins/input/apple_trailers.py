@@ -39,6 +39,7 @@ class AppleTrailers(InputRSS):
         # configure them
         task.config['headers'] = {'User-Agent': 'QuickTime/7.6.6'}
 
+    @plugin.parallel
     @plugin.priority(127)
     @cached('apple_trailers')
     def on_task_input(self, task, config):
@@ -3,17 +3,18 @@ import logging
 import pickle
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, DateTime, PickleType, Index
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary, Index
 
 from flexget import db_schema, plugin
 from flexget.entry import Entry
 from flexget.event import event
-from flexget.utils.database import safe_pickle_synonym
-from flexget.utils.sqlalchemy_utils import table_schema
+from flexget.utils.database import entry_synonym
+from flexget.utils.entry_codec import decode_entry
+from flexget.utils.sqlalchemy_utils import table_schema, table_add_column, chunked
 from flexget.utils.tools import parse_timedelta
 
 log = logging.getLogger('backlog')
-Base = db_schema.versioned_base('backlog', 1)
+Base = db_schema.versioned_base('backlog', 3)
 
 
 @db_schema.upgrade('backlog')
@@ -34,6 +35,13 @@ def upgrade(ver, session):
         log.info('Creating index on backlog table.')
         Index('ix_backlog_feed_expire', backlog_table.c.feed, backlog_table.c.expire).create(bind=session.bind)
         ver = 1
+    if ver == 1:
+        # Existing rows are left without url, their entry is loaded to check it
+        table_add_column('backlog', 'url', String, session)
+        ver = 2
+    if ver == 2:
+        # Entries are now stored with entry_codec, which older versions can not load
+        ver = 3
     return ver
 
 
@@ -44,9 +52,10 @@ class BacklogEntry(Base):
     id = Column(Integer, primary_key=True)
     task = Column('feed', String)
     title = Column(String)
+    url = Column(String)
     expire = Column(DateTime)
-    _entry = Column('entry', PickleType)
-    entry = safe_pickle_synonym('_entry')
+    _entry = Column('entry', LargeBinary)
+    entry = entry_synonym('_entry')
 
     def __repr__(self):
         return '<BacklogEntry(title=%s)>' % (self.title)
@@ -69,6 +78,7 @@ class InputBacklog(object):
         from flexget import validator
         return validator.factory('interval')
 
+    @plugin.volatile
     @plugin.priority(-255)
     def on_task_input(self, task, config):
         # Get a list of entries to inject
@@ -110,6 +120,7 @@ class InputBacklog(object):
             log.debug('Saving %s' % entry['title'])
             backlog_entry = BacklogEntry()
             backlog_entry.title = entry['title']
+            backlog_entry.url = snapshot['url']
             backlog_entry.entry = snapshot
             backlog_entry.task = task.name
             backlog_entry.expire = expire_time
@@ -122,23 +133,34 @@ class InputBacklog(object):
 
     def get_injections(self, task):
         """Insert missing entries from backlog."""
-        entries = []
+        in_task = set((entry.get('title'), entry.get('url')) for entry in task.entries)
+        # Expired entries are injected one last time before purging, entries backlogged without amount expire
+        # immediately. Stored entries are loaded only for the rows which are injected.
         task_backlog = task.session.query(BacklogEntry).filter(BacklogEntry.task == task.name)
-        for backlog_entry in task_backlog.all():
-            entry = Entry(backlog_entry.entry)
-
-            # this is already in the task
-            if task.find_entry(title=entry['title'], url=entry['url']):
+        inject_ids = []
+        for id, title, url in task_backlog.with_entities(BacklogEntry.id, BacklogEntry.title, BacklogEntry.url):
+            # url is not known for entries backlogged before it was stored, check those after loading
+            if url is not None and (title, url) in in_task:
                 continue
-            log.debug('Restoring %s' % entry['title'])
-            entries.append(entry)
+            inject_ids.append(id)
+
+        entries = []
+        for ids in chunked(inject_ids):
+            for stored in task_backlog.with_entities(BacklogEntry._entry).filter(BacklogEntry.id.in_(ids)).\
+                    order_by(BacklogEntry.id):
+                entry = Entry(decode_entry(stored[0]))
+                # this is already in the task
+                if (entry['title'], entry['url']) in in_task:
+                    continue
+                log.debug('Restoring %s' % entry['title'])
+                entries.append(entry)
         if entries:
             log.verbose('Added %s entries from backlog' % len(entries))
 
         # purge expired
-        for backlog_entry in task_backlog.filter(datetime.now() > BacklogEntry.expire).all():
-            log.debug('Purging %s' % backlog_entry.title)
-            task.session.delete(backlog_entry)
+        purged = task_backlog.filter(datetime.now() > BacklogEntry.expire).delete(synchronize_session=False)
+        if purged:
+            log.debug('Purged %s expired entries from backlog' % purged)
 
         return entries
 
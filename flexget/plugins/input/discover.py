@@ -34,12 +34,14 @@ class DiscoverEntry(Base):
 Index('ix_discover_entry_title_task', DiscoverEntry.title, DiscoverEntry.task)
 
 
-@event('manager.db_cleanup')
-def db_cleanup(session):
+@event('manager.db_cleanup.batch')
+def db_cleanup(session, batch_size):
     value = datetime.datetime.now() - parse_timedelta('7 days')
-    for de in session.query(DiscoverEntry).filter(DiscoverEntry.last_execution <= value).all():
+    expired = session.query(DiscoverEntry).filter(DiscoverEntry.last_execution <= value).limit(batch_size).all()
+    for de in expired:
         log.debug('deleting %s' % de)
         session.delete(de)
+    return len(expired)
 
 
 class Discover(object):
@@ -84,34 +86,24 @@ class Discover(object):
         entry_titles = set()
         entry_urls = set()
         # run inputs
-        for item in config['what']:
-            for input_name, input_config in item.iteritems():
-                input = get_plugin_by_name(input_name)
-                if input.api_ver == 1:
-                    raise PluginError('Plugin %s does not support API v2' % input_name)
-                method = input.phase_handlers['input']
-                try:
-                    result = method(task, input_config)
-                except PluginError as e:
-                    log.warning('Error during input plugin %s: %s' % (input_name, e))
-                    continue
-                if not result:
-                    log.warning('Input %s did not return anything' % input_name)
-                    continue
+        for input_name, result in plugin.call_inputs(task, config['what']):
+            if not result:
+                log.warning('Input %s did not return anything' % input_name)
+                continue
 
-                for entry in result:
-                    urls = ([entry['url']] if entry.get('url') else []) + entry.get('urls', [])
-                    if any(url in entry_urls for url in urls):
-                        log.debug('URL for `%s` already in entry list, skipping.' % entry['title'])
-                        continue
+            for entry in result:
+                urls = ([entry['url']] if entry.get('url') else []) + entry.get('urls', [])
+                if any(url in entry_urls for url in urls):
+                    log.debug('URL for `%s` already in entry list, skipping.' % entry['title'])
+                    continue
 
-                    if entry['title'] in entry_titles:
-                        log.verbose('Ignored duplicate title `%s`' % entry['title'])    # TODO: should combine?
-                        continue
+                if entry['title'] in entry_titles:
+                    log.verbose('Ignored duplicate title `%s`' % entry['title'])    # TODO: should combine?
+                    continue
 
-                    entries.append(entry)
-                    entry_titles.add(entry['title'])
-                    entry_urls.update(urls)
+                entries.append(entry)
+                entry_titles.add(entry['title'])
+                entry_urls.update(urls)
         return entries
 
     def execute_searches(self, config, entries):
@@ -239,6 +231,7 @@ class Discover(object):
                         (config['interval'], interval_count))
         return result
 
+    @plugin.volatile
     def on_task_input(self, task, config):
         task.no_entries_ok = True
         entries = self.execute_inputs(config, task)
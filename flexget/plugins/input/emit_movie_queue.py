@@ -33,6 +33,7 @@ class EmitMovieQueue(object):
         config.setdefault('quality', False)
         return config
 
+    @plugin.volatile
     def on_task_input(self, task, config):
         if not config:
             return
@@ -54,6 +54,7 @@ class GenSeries(object):
         # configure series plugin, bad way but this is debug shit
         task.config['series'] = series
 
+    @plugin.volatile
     def on_task_input(self, task, config):
         entries = []
         for num, entry in enumerate(self.entries):
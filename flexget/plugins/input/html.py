@@ -70,6 +70,7 @@ class InputHtml(object):
         get_auth_from_url()
         return config
 
+    @plugin.parallel
     @cached('html')
     @plugin.internet(log)
     def on_task_input(self, task, config):
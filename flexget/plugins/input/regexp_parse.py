@@ -145,6 +145,7 @@ class RegexpParse(object):
                 return False
         return entry.isvalid()
 
+    @plugin.parallel
     @cached('text')
     @plugin.internet(log)
     def on_task_input(self, task, config):
@@ -64,6 +64,7 @@ class RlsLog(object):
 
         return releases
 
+    @plugin.parallel
     @cached('rlslog')
     @plugin.internet(log)
     def on_task_input(self, task, config):
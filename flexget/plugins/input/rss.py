@@ -179,6 +179,7 @@ class InputRSS(object):
             entry['filename'] = basename
             log.trace('filename `%s` from enclosure', entry['filename'])
 
+    @plugin.parallel
     @cached('rss')
     @plugin.internet(log)
     def on_task_input(self, task, config):
@@ -83,6 +83,7 @@ class InputScenereleases(object):
 
         return releases
 
+    @plugin.parallel
     @cached('scenereleases')
     @plugin.internet(log)
     def on_task_input(self, task, config):
@@ -55,6 +55,7 @@ class Text(object):
         for k, v in d.iteritems():
             entry[k] = v % entry
 
+    @plugin.parallel
     @cached('text')
     @plugin.internet(log)
     def on_task_input(self, task, config):
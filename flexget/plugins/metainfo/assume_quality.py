@@ -54,10 +54,10 @@ class AssumeQuality(object):
             log.debug('\t%s: %s vs %s', component.type, component.name, qualitycomponent.name)
             if component.name != 'unknown':
                 log.debug('\t%s: keeping %s', component.type, component.name)
-                setattr(newquality, component.type, component)
+                newquality = newquality.replace(**{component.type: component})
             elif qualitycomponent.name != 'unknown':
                 log.debug('\t%s: assuming %s', component.type, qualitycomponent.name)
-                setattr(newquality, component.type, qualitycomponent)
+                newquality = newquality.replace(**{component.type: qualitycomponent})
                 entry['assumed_quality'] = True
             elif component.name == 'unknown' and qualitycomponent.name == 'unknown':
                 log.debug('\t%s: got nothing', component.type)
@@ -0,0 +1,43 @@
+from __future__ import unicode_literals, division, absolute_import
+import logging
+
+from flexget import plugin
+from flexget.event import event
+
+log = logging.getLogger('parallel_inputs')
+
+
+class ParallelInputs(object):
+    """
+    Fetches inputs which support it (e.g. rss, html) at the same time, instead of one after another.
+    Entries are still added to the task in configuration order.
+
+    Example::
+
+      parallel_inputs: yes
+
+    Or with a number of worker threads to use (default 4)::
+
+      parallel_inputs: 8
+    """
+
+    schema = {
+        'oneOf': [
+            {'type': 'boolean'},
+            {'type': 'integer', 'minimum': 1}
+        ]
+    }
+
+    default_workers = 4
+
+    @plugin.priority(255)
+    def on_task_start(self, task, config):
+        if config is True:
+            config = self.default_workers
+        task.max_input_workers = int(config) or 1
+        log.debug('using %s worker threads for inputs' % task.max_input_workers)
+
+
+@event('plugin.register')
+def register_plugin():
+    plugin.register(ParallelInputs, 'parallel_inputs', api_ver=2)
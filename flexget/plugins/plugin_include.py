@@ -4,7 +4,7 @@ import os
 import yaml
 
 from flexget import plugin
-from flexget.config_schema import one_or_more, process_config
+from flexget.config_schema import one_or_more, process_config, resolve_ref
 from flexget.event import event
 from flexget.utils.tools import MergeException, merge_dict_from_to
 
@@ -38,7 +38,7 @@ class PluginInclude(object):
             if not os.path.isabs(name):
                 name = os.path.join(task.manager.config_base, name)
             include = yaml.load(file(name))
-            errors = process_config(include, plugin.plugin_schemas(context='task'))
+            errors = process_config(include, resolve_ref('/schema/plugins?context=task'))
             if errors:
                 log.error('Included file %s has invalid config:' % name)
                 for error in errors:
@@ -3,6 +3,7 @@ import copy
 from datetime import datetime, timedelta, time as dt_time
 import fnmatch
 from hashlib import md5
+import heapq
 import itertools
 import logging
 import Queue
@@ -15,7 +16,8 @@ from sqlalchemy import Column, String, DateTime
 from flexget.config_schema import register_config_key, parse_time
 from flexget.db_schema import versioned_base
 from flexget.event import event
-from flexget.logger import FlexGetFormatter
+from flexget import logger
+from flexget.logger import FlexGetFormatter, ExecutionFilter
 from flexget.manager import Session
 
 log = logging.getLogger('scheduler')
@@ -55,7 +57,7 @@ yaml_schedule = {
 }
 
 
-main_schema = {
+schedules_schema = {
     'type': 'array',
     'items': {
         'properties': {
@@ -68,6 +70,22 @@ main_schema = {
 }
 
 
+main_schema = {
+    'oneOf': [
+        schedules_schema,
+        {
+            'type': 'object',
+            'properties': {
+                'max_workers': {'type': 'integer', 'minimum': 1},
+                'triggers': schedules_schema
+            },
+            'additionalProperties': False
+        }
+    ],
+    'error_oneOf': 'schedules must be a list of schedules, or a dict with `max_workers` and `triggers` keys'
+}
+
+
 class DBTrigger(Base):
     __tablename__ = 'scheduler_triggers'
 
@@ -95,6 +113,12 @@ class Scheduler(threading.Thread):
         self.manager = manager
         self.triggers = []
         self.run_schedules = True
+        #: How many jobs are allowed to run at the same time
+        self.max_workers = 1
+        # Jobs currently being executed by a worker thread, guarded by the condition
+        self._running_jobs = []
+        self._jobs_changed = threading.Condition()
+        self._stdout = self._stderr = None
         self._shutdown_now = False
         self._shutdown_when_finished = False
 
@@ -102,9 +126,16 @@ class Scheduler(threading.Thread):
         """Clears current schedules and loads them from the config."""
         with self.triggers_lock:
             self.triggers = []
-            if 'schedules' not in self.manager.config:
+            config = self.manager.config.get('schedules')
+            if isinstance(config, dict):
+                self.max_workers = config.get('max_workers', 1)
+                config = config.get('triggers')
+            else:
+                self.max_workers = 1
+            if config is None:
                 log.info('No schedules defined in config. Defaulting to run all tasks on a 1 hour interval.')
-            for item in self.manager.config.get('schedules', [{'tasks': ['*'], 'interval': {'hours': 1}}]):
+                config = [{'tasks': ['*'], 'interval': {'hours': 1}}]
+            for item in config:
                 tasks = item['tasks']
                 if not isinstance(tasks, list):
                     tasks = [tasks]
@@ -151,6 +182,9 @@ class Scheduler(threading.Thread):
             job = Job(task, options=options, output=output, priority=priority, trigger_id=trigger_id)
             self.run_queue.put(job)
             finished_events.append(job.finished_event)
+        # Wake up the scheduler thread so that the jobs get started right away
+        with self._jobs_changed:
+            self._jobs_changed.notify_all()
         return finished_events
 
     def queue_pending_jobs(self):
@@ -159,7 +193,8 @@ class Scheduler(threading.Thread):
             for trigger in self.triggers:
                 if trigger.should_run:
                     with self.run_queue.mutex:
-                        if any(j.trigger_id == trigger.uid for j in self.run_queue.queue):
+                        pending = self.run_queue.queue + self._running_jobs
+                        if any(j.trigger_id == trigger.uid for j in pending):
                             log.error('Not firing schedule %r. Tasks from last run have still not finished.' % trigger)
                             log.error('You may need to increase the interval for this schedule.')
                             continue
@@ -177,40 +212,79 @@ class Scheduler(threading.Thread):
         super(Scheduler, self).start()
 
     def run(self):
-        from flexget.task import Task, TaskAbort
-        while not self._shutdown_now:
-            if self.run_schedules:
-                self.queue_pending_jobs()
-            # Grab the first job from the run queue and do it
-            try:
-                job = self.run_queue.get(timeout=0.5)
-            except Queue.Empty:
-                if self._shutdown_when_finished:
-                    self._shutdown_now = True
-                continue
-            if job.output:
-                # Hook up our log and stdout to give back to the requester
-                old_stdout, old_stderr = sys.stdout, sys.stderr
-                sys.stdout, sys.stderr = Tee(job.output, sys.stdout), Tee(job.output, sys.stderr)
-                # TODO: Use a filter to capture only the logging for this execution?
-                streamhandler = logging.StreamHandler(job.output)
-                streamhandler.setFormatter(FlexGetFormatter())
-                logging.getLogger().addHandler(streamhandler)
-            try:
-                Task(self.manager, job.task, options=job.options).execute()
-            except TaskAbort as e:
-                log.debug('task %s aborted: %r' % (job.task, e))
-            finally:
-                self.run_queue.task_done()
-                job.finished_event.set()
-                if job.output:
-                    sys.stdout, sys.stderr = old_stdout, old_stderr
-                    logging.getLogger().removeHandler(streamhandler)
+        # Output written from job threads is copied to the output of the job, if it has one
+        old_stdout, old_stderr = sys.stdout, sys.stderr
+        self._stdout, self._stderr = ExecutionTee(old_stdout), ExecutionTee(old_stderr)
+        sys.stdout, sys.stderr = self._stdout, self._stderr
+        try:
+            while not self._shutdown_now:
+                if self.run_schedules:
+                    self.queue_pending_jobs()
+                with self._jobs_changed:
+                    job = None
+                    if len(self._running_jobs) < self.max_workers:
+                        job = self._get_next_job()
+                    if job is None:
+                        if self._shutdown_when_finished and not self._running_jobs and not self.run_queue.qsize():
+                            self._shutdown_now = True
+                        else:
+                            self._jobs_changed.wait(0.5)
+                        continue
+                    self._running_jobs.append(job)
+                worker = threading.Thread(target=self._run_job, args=(job,), name='job-%s' % job.count)
+                worker.daemon = True
+                worker.start()
+            # Let the jobs which are already running finish
+            for job in list(self._running_jobs):
+                job.finished_event.wait()
+        finally:
+            sys.stdout, sys.stderr = old_stdout, old_stderr
         remaining_jobs = self.run_queue.qsize()
         if remaining_jobs:
             log.warning('Scheduler shut down with %s jobs remaining in the queue to run.' % remaining_jobs)
         log.debug('scheduler shut down')
 
+    def _get_next_job(self):
+        """
+        Removes and returns the first job in priority order whose task is not already being run by another worker.
+        Returns None if there is no such job waiting.
+        """
+        running_tasks = set(j.task for j in self._running_jobs)
+        with self.run_queue.mutex:
+            for job in sorted(self.run_queue.queue):
+                if job.task not in running_tasks:
+                    self.run_queue.queue.remove(job)
+                    heapq.heapify(self.run_queue.queue)
+                    return job
+        return None
+
+    def _run_job(self, job):
+        """Executes `job`, this is run in a worker thread of its own."""
+        from flexget.task import Task, TaskAbort
+        logger.set_execution(job.count)
+        if job.output:
+            # Hook up our log and stdout to give back to the requester
+            self._stdout.outputs[job.count] = self._stderr.outputs[job.count] = job.output
+            streamhandler = logging.StreamHandler(job.output)
+            streamhandler.setFormatter(FlexGetFormatter())
+            streamhandler.addFilter(ExecutionFilter(job.count))
+            logging.getLogger().addHandler(streamhandler)
+        try:
+            Task(self.manager, job.task, options=job.options).execute()
+        except TaskAbort as e:
+            log.debug('task %s aborted: %r' % (job.task, e))
+        finally:
+            if job.output:
+                self._stdout.outputs.pop(job.count, None)
+                self._stderr.outputs.pop(job.count, None)
+                logging.getLogger().removeHandler(streamhandler)
+            logger.set_execution(None)
+            self.run_queue.task_done()
+            with self._jobs_changed:
+                self._running_jobs.remove(job)
+                self._jobs_changed.notify_all()
+            job.finished_event.set()
+
     def wait(self):
         """
         Waits for the thread to exit.
@@ -221,7 +295,7 @@ class Scheduler(threading.Thread):
 
     def shutdown(self, finish_queue=True):
         """
-        Ends the thread. If a job is running, waits for it to finish first.
+        Ends the thread. If jobs are running, waits for them to finish first.
 
         :param bool finish_queue: If this is True, shutdown will wait until all queued tasks have finished.
         """
@@ -241,7 +315,7 @@ class Job(object):
     options = None
     #: :class:`BufferQueue` to write the task execution output to. '[[END]]' will be sent to the queue when complete
     output = None
-    # Used to keep jobs in order, when priority is the same
+    # Used to keep jobs in order, when priority is the same. Also identifies the execution for log capturing.
     _counter = itertools.count()
 
     def __init__(self, task, options=None, output=None, priority=1, trigger_id=None):
@@ -385,20 +459,36 @@ class Trigger(object):
         return 'Trigger(tasks=%r, amount=%r, unit=%r)' % (self.tasks, self.amount, self.unit)
 
 
-class Tee(object):
-    """Used so that output to sys.stdout can be grabbed and still displayed."""
-    def __init__(self, *files):
-        self.files = files
-
-    def __getattr__(self, meth):
-        def method_runner(*args, **kwargs):
-            for f in self.files:
-                try:
-                    getattr(f, meth)(*args, **kwargs)
-                except AttributeError:
-                    # We don't really care if all of our 'files' fully support the file api
-                    pass
-        return method_runner
+class ExecutionTee(object):
+    """
+    Stands in for sys.stdout or sys.stderr while the scheduler is running. Everything is written to the original
+    stream, and also to the output registered for the execution the writing thread belongs to, if any.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        #: Maps execution ids to file-like objects
+        self.outputs = {}
+
+    def write(self, text):
+        self.stream.write(text)
+        output = self.outputs.get(logger.get_execution())
+        if output is not None:
+            output.write(text)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        self.stream.flush()
+        output = self.outputs.get(logger.get_execution())
+        # We don't really care if our outputs fully support the file api
+        if hasattr(output, 'flush'):
+            output.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
 
 
 class BufferQueue(Queue.Queue):
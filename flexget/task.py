@@ -1,25 +1,34 @@
 from __future__ import unicode_literals, division, absolute_import
+import bisect
+from contextlib import contextmanager
 import copy
 from functools import wraps
 import hashlib
 import itertools
 import logging
+import threading
 
 from sqlalchemy import Column, Unicode, String, Integer
 
 from flexget import config_schema
 from flexget import db_schema
-from flexget.entry import EntryUnicodeError
+from flexget.entry import Entry, EntryUnicodeError, FrozenEntry
 from flexget.event import fire_event, event
 from flexget.manager import Session
-from flexget.plugin import (get_plugins_by_phase, task_phases, phase_methods, PluginWarning, PluginError,
-                            DependencyError, plugins as all_plugins, plugin_schemas)
+from flexget.plugin import (get_plugins, task_phases, phase_methods, PluginWarning, PluginError,
+                            DependencyError, plugins as all_plugins, plugin_schemas, is_parallel,
+                            is_volatile, get_registry_signature)
 from flexget.utils import requests
+from flexget.utils.frozen import freeze, thaw, ThawedDict
+from flexget.utils.tools import threaded_calls, LRUCache
 from flexget.utils.simple_persistence import SimpleTaskPersistence
 
 log = logging.getLogger('task')
 Base = db_schema.versioned_base('feed', 0)
 
+# Plugins run on each phase, (phase, configured plugin names, plugin registry signature) -> tuple of PluginInfo
+_phase_plans = LRUCache(maxsize=1000, name='phase_plans')
+
 
 class TaskConfigHash(Base):
     """Stores the config hash for tasks so that we can tell if the config has changed since last run."""
@@ -70,16 +79,37 @@ class EntryIterator(object):
         self.all_entries = entries
         if isinstance(states, basestring):
             states = [states]
-        self.filter = lambda e: e._state in states
+        self.states = frozenset(states)
+        entries._add_view(self.states)
 
     def __iter__(self):
-        return itertools.ifilter(self.filter, self.all_entries)
+        # Entries may change state or get added while iterating, look the next position up again from the index
+        # whenever it has changed, so that they are seen the same way as when filtering the whole list
+        container = self.all_entries
+        position = -1
+        changes = None
+        while True:
+            if changes != container._changes:
+                positions = container._view(self.states)
+                changes = container._changes
+                index = bisect.bisect_right(positions, position)
+            else:
+                index += 1
+            if index >= len(positions):
+                return
+            position = positions[index]
+            yield list.__getitem__(container, position)
 
     def __bool__(self):
-        return any(e for e in self)
+        return bool(self.all_entries._view(self.states))
+
+    __nonzero__ = __bool__
 
     def __len__(self):
-        return sum(1 for e in self)
+        return len(self.all_entries._view(self.states))
+
+    def __contains__(self, entry):
+        return self.all_entries._position(entry) is not None and entry._state in self.states
 
     def __add__(self, other):
         return itertools.chain(self, other)
@@ -90,14 +120,14 @@ class EntryIterator(object):
     def __getitem__(self, item):
         if not isinstance(item, int):
             raise ValueError('Index must be integer.')
-        for index, entry in enumerate(self):
-            if index == item:
-                return entry
-        else:
+        try:
+            position = self.all_entries._view(self.states)[item]
+        except IndexError:
             raise IndexError('%d is out of bounds' % item)
+        return list.__getitem__(self.all_entries, position)
 
     def __getslice__(self, a, b):
-        return list(itertools.islice(self, a, b))
+        return [list.__getitem__(self.all_entries, position) for position in self.all_entries._view(self.states)[a:b]]
 
     def reverse(self):
         self.all_entries.sort(reverse=True)
@@ -106,11 +136,34 @@ class EntryIterator(object):
         self.all_entries.sort(*args, **kwargs)
 
 
+def _reindexes(method):
+    """Wraps a list method which may move entries around, so that :class:`EntryContainer` index gets rebuilt."""
+
+    def wrapper(self, *args, **kwargs):
+        self._positions = None
+        self._changes += 1
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
 class EntryContainer(list):
-    """Container for a list of entries, also contains accepted, rejected failed iterators over them."""
+    """
+    Container for a list of entries, also contains accepted, rejected failed iterators over them.
+
+    Keeps positions of entries in each state, updated by :meth:`Entry.accept`, :meth:`Entry.reject` and
+    :meth:`Entry.fail`, so that length, membership and indexing of the iterators do not scan the whole list.
+    Appending entries extends the index, other modifications of the list rebuild it on next access.
+    """
 
     def __init__(self, iterable=None):
         list.__init__(self, iterable or [])
+        self._positions = None  # entry id -> position in list, None when index needs to be rebuilt
+        self._duplicates = set()  # ids of entries which are in the list more than once
+        self._views = {}  # frozenset of states -> sorted positions of entries in those states
+        self._changes = 0  # incremented whenever index changes, lets iterators know when to look positions up
 
         self._entries = EntryIterator(self, ['undecided', 'accepted'])
         self._accepted = EntryIterator(self, 'accepted')  # accepted entries, can still be rejected
@@ -125,10 +178,112 @@ class EntryContainer(list):
     failed = property(lambda self: self._failed)
     undecided = property(lambda self: self._undecided)
 
+    def _add_view(self, states):
+        self._views.setdefault(states, [])
+        self._positions = None
+        self._changes += 1
+
+    def _index(self, position, entry):
+        self._changes += 1
+        if id(entry) in self._positions:
+            self._duplicates.add(id(entry))
+        else:
+            self._positions[id(entry)] = position
+            entry._add_container(self)
+        for states, positions in self._views.iteritems():
+            if entry._state in states:
+                positions.append(position)
+
+    def _reindex(self):
+        self._positions = {}
+        self._duplicates = set()
+        for states in self._views:
+            self._views[states] = []
+        for position, entry in enumerate(self):
+            self._index(position, entry)
+
+    def _view(self, states):
+        if self._positions is None:
+            self._reindex()
+        return self._views[states]
+
+    def _position(self, entry):
+        """Return position of the given entry object in the list, or None if it is not contained."""
+        if self._positions is None:
+            self._reindex()
+        return self._positions.get(id(entry))
+
+    def _state_changed(self, entry, old_state):
+        """Called by :class:`Entry` when its state changes."""
+        if self._positions is None:
+            return
+        self._changes += 1
+        position = self._positions.get(id(entry))
+        if position is None or list.__getitem__(self, position) is not entry:
+            # We are no longer holding this entry
+            return
+        if id(entry) in self._duplicates:
+            self._positions = None
+            return
+        for states, positions in self._views.iteritems():
+            was_in, now_in = old_state in states, entry._state in states
+            if now_in and not was_in:
+                bisect.insort(positions, position)
+            elif was_in and not now_in:
+                del positions[bisect.bisect_left(positions, position)]
+
+    def append(self, entry):
+        list.append(self, entry)
+        if self._positions is not None:
+            self._index(len(self) - 1, entry)
+
+    def extend(self, entries):
+        start = len(self)
+        list.extend(self, entries)
+        if self._positions is not None:
+            for position in xrange(start, len(self)):
+                self._index(position, list.__getitem__(self, position))
+
+    def __iadd__(self, entries):
+        self.extend(entries)
+        return self
+
+    __setitem__ = _reindexes(list.__setitem__)
+    __delitem__ = _reindexes(list.__delitem__)
+    __setslice__ = _reindexes(list.__setslice__)
+    __delslice__ = _reindexes(list.__delslice__)
+    __imul__ = _reindexes(list.__imul__)
+    insert = _reindexes(list.insert)
+    pop = _reindexes(list.pop)
+    remove = _reindexes(list.remove)
+    reverse = _reindexes(list.reverse)
+    sort = _reindexes(list.sort)
+
+    def __reduce__(self):
+        # Index is keyed by entry ids, copies and pickles build their own
+        return self.__class__, (list(self),)
+
     def __repr__(self):
         return '<EntryContainer(%s)>' % list.__repr__(self)
 
 
+def phase_plan(phase, names):
+    """
+    Returns the plugins to run on `phase` in order. Plans are cached until plugins or their priorities change.
+
+    :param string phase: Name of the phase
+    :param frozenset names: Plugins configured for the task
+    :return: Tuple of :class:`flexget.plugin.PluginInfo`
+    """
+    key = (phase, names, get_registry_signature())
+    plan = _phase_plans.get(key)
+    if plan is None:
+        # Sorting by priority does not import plugins listed in the plugin manifest, only using them does
+        plugins = sorted(get_plugins(phase=phase), key=lambda p: p.phase_priority(phase), reverse=True)
+        plan = _phase_plans[key] = tuple(p for p in plugins if p.name in names or p.builtin)
+    return plan
+
+
 class TaskAbort(Exception):
     def __init__(self, reason, silent=False):
         self.reason = reason
@@ -167,6 +322,8 @@ class Task(object):
     """
 
     max_reruns = 5
+    #: Number of threads used to run input plugins marked with :func:`flexget.plugin.parallel`, 1 disables threading
+    max_input_workers = 1
 
     def __init__(self, manager, name, config=None, options=None):
         """
@@ -179,7 +336,8 @@ class Task(object):
         # raw_config should remain the untouched input config
         if config is None:
             config = manager.config['tasks'].get(name, {})
-        self.config = copy.deepcopy(config)
+        # Frozen parts are shared with prepared_config and the plugin configs, they are copied only when accessed
+        self.config = thaw(freeze(config))
         self.prepared_config = None
         if options is None:
             options = copy.copy(self.manager.options.execute)
@@ -194,6 +352,10 @@ class Task(object):
 
         # not to be reset
         self._rerun_count = 0
+        # Copies of the entries returned by input plugins on the first run, injected again on reruns
+        self._input_snapshots = {}
+        # Holds current_phase and current_plugin, which are kept per thread as some inputs may be run in worker threads
+        self._local = threading.local()
 
         self.config_modified = None
 
@@ -246,6 +408,22 @@ class Task(object):
     def is_rerun(self):
         return self._rerun_count
 
+    @property
+    def current_phase(self):
+        return getattr(self._local, 'current_phase', None)
+
+    @current_phase.setter
+    def current_phase(self, phase):
+        self._local.current_phase = phase
+
+    @property
+    def current_plugin(self):
+        return getattr(self._local, 'current_plugin', None)
+
+    @current_plugin.setter
+    def current_plugin(self, plugin):
+        self._local.current_plugin = plugin
+
     # TODO: can we get rid of this now that Tasks are instantiated on demand?
     def _reset(self):
         """Reset task state"""
@@ -339,10 +517,43 @@ class Task(object):
           An iterator over configured :class:`flexget.plugin.PluginInfo` instances enabled on this task.
         """
         if phase:
-            plugins = sorted(get_plugins_by_phase(phase), key=lambda p: p.phase_handlers[phase], reverse=True)
-        else:
-            plugins = all_plugins.itervalues()
-        return (p for p in plugins if p.name in self.config or p.builtin)
+            return self._iter_phase_plan(phase)
+        return (p for p in all_plugins.itervalues() if p.name in self.config or p.builtin)
+
+    def _iter_phase_plan(self, phase):
+        """Iterates over the plugins in the execution plan of `phase`, follows plugins being added to the config."""
+        names = frozenset(self.config)
+        plan = phase_plan(phase, names)
+        done = set()
+        index = 0
+        while index < len(plan):
+            plugin = plan[index]
+            index += 1
+            if plugin.name in done:
+                continue
+            yield plugin
+            done.add(plugin.name)
+            if frozenset(self.config) != names:
+                # Config was modified (e.g. by template), continue with the plan for the new config
+                names = frozenset(self.config)
+                priority = plugin.phase_priority(phase)
+                plan = phase_plan(phase, names)
+                index = 0
+                while index < len(plan) and plan[index].phase_priority(phase) > priority:
+                    index += 1
+
+    def plugin_config(self, name):
+        """
+        :param string name: Name of the plugin
+        :return: Copy of the config of the plugin, which it can modify without affecting the task config. Only the
+          parts the plugin accesses get copied.
+        """
+        config = dict.get(self.config, name)
+        frozen = freeze(config)
+        if frozen is not config and isinstance(self.config, ThawedDict):
+            # Share the frozen version with the next plugin calls until the task config is modified again
+            dict.__setitem__(self.config, name, frozen)
+        return thaw(frozen)
 
     def __run_task_phase(self, phase):
         """Executes task phase, ie. call all enabled plugins on the task.
@@ -366,38 +577,110 @@ class Task(object):
                 else:
                     log.warning('Task doesn\'t have any %s plugins, you should add (at least) one!' % phase)
 
-        for plugin in self.plugins(phase):
-            # Abort this phase if one of the plugins disables it
-            if phase in self.disabled_phases:
-                return
-            # store execute info, except during entry events
-            self.current_phase = phase
-            self.current_plugin = plugin.name
-
-            if plugin.api_ver == 1:
-                # backwards compatibility
-                # pass method only task (old behaviour)
-                args = (self,)
-            else:
-                # pass method task, copy of config (so plugin cannot modify it)
-                args = (self, copy.copy(self.config.get(plugin.name)))
-
-            try:
-                fire_event('task.execute.before_plugin', self, plugin.name)
-                response = self.__run_plugin(plugin, phase, args)
+        threaded = []
+        if phase == 'input' and self.max_input_workers > 1:
+            threaded = [p for p in self.plugins(phase) if p.api_ver > 1 and is_parallel(p.phase_handlers[phase]) and
+                        p.name not in self._input_snapshots]
+        calls = [(p.name, self.__threaded_plugin(p, phase, (self, self.plugin_config(p.name))))
+                 for p in threaded]
+        self.current_phase = phase
+        with self.threaded_inputs(calls) as results:
+            results = dict(zip((p.name for p in threaded), results))
+            for plugin in self.plugins(phase):
+                # Abort this phase if one of the plugins disables it
+                if phase in self.disabled_phases:
+                    return
+                # store execute info, except during entry events
+                self.current_phase = phase
+                self.current_plugin = plugin.name
+
+                if plugin.api_ver == 1:
+                    # backwards compatibility
+                    # pass method only task (old behaviour)
+                    args = (self,)
+                else:
+                    # pass method task, copy of config (so plugin cannot modify it)
+                    args = (self, self.plugin_config(plugin.name))
+
+                if phase == 'input' and plugin.name in self._input_snapshots:
+                    # Rerun, inject the entries from the first run again instead of calling the input
+                    response = [e.thaw() for e in self._input_snapshots[plugin.name]]
+                    log.debug('reusing %s entries from input %s' % (len(response), plugin.name))
+                elif plugin.name in results:
+                    # Already running in a worker thread, which also fires the plugin events
+                    response = self.__run_plugin(plugin, phase, method=results[plugin.name])
+                else:
+                    fire_event('task.execute.before_plugin', self, plugin.name)
+                    try:
+                        response = self.__run_plugin(plugin, phase, args)
+                    finally:
+                        fire_event('task.execute.after_plugin', self, plugin.name)
+                if (phase == 'input' and isinstance(response, list) and self.max_reruns and
+                        plugin.name not in self._input_snapshots and
+                        not is_volatile(plugin.phase_handlers[phase], self.config.get(plugin.name))):
+                    self._input_snapshots[plugin.name] = [FrozenEntry(e) for e in response]
                 if phase == 'input' and response:
                     # add entries returned by input to self.all_entries
                     for e in response:
                         e.task = self
                     self.all_entries.extend(response)
+
+                # Make sure we abort if any plugin sets our abort flag
+                if self._abort and phase != 'abort':
+                    if results:
+                        # The abort may have come from a worker thread, make sure it is not ignored
+                        raise TaskAbort(self._abort_reason, silent=self._silent_abort)
+                    return
+
+    @contextmanager
+    def threaded_inputs(self, calls):
+        """
+        Runs input functions in worker threads, see :func:`flexget.utils.tools.threaded_calls`. Up to
+        :attr:`max_input_workers` are used.
+
+        In the worker threads :attr:`current_plugin` is set to the given plugin name, and :attr:`simple_persistence`
+        changes are buffered and saved from the calling thread once the result has been fetched. Apart from that, the
+        functions must not use the task session.
+
+        :param calls: List of (plugin name, function) tuples.
+        :return: Yields a list of callables returning (or raising) the results, in the same order as `calls`.
+        """
+        phase = self.current_phase
+        buffers = [{} for _ in calls]
+
+        def worker(plugin_name, func, buffer):
+            def run():
+                self.current_phase, self.current_plugin = phase, plugin_name
+                self.simple_persistence.start_buffering(buffer)
+                try:
+                    return func()
+                finally:
+                    self.simple_persistence.stop_buffering()
+            return run
+
+        def result_getter(result, buffer):
+            def get():
+                try:
+                    return result()
+                finally:
+                    self.simple_persistence.apply(buffer)
+            return get
+
+        funcs = [worker(name, func, buffer) for (name, func), buffer in zip(calls, buffers)]
+        with threaded_calls(funcs, self.max_input_workers) as results:
+            yield [result_getter(result, buffer) for result, buffer in zip(results, buffers)]
+
+    def __threaded_plugin(self, plugin, phase, args):
+        """Returns a function calling the `phase` handler of `plugin`, for running it in a worker thread."""
+        def call():
+            fire_event('task.execute.before_plugin', self, plugin.name)
+            try:
+                return plugin.phase_handlers[phase](*args)
             finally:
                 fire_event('task.execute.after_plugin', self, plugin.name)
+        return call
 
-            # Make sure we abort if any plugin sets our abort flag
-            if self._abort and phase != 'abort':
-                return
-
-    def __run_plugin(self, plugin, phase, args=None, kwargs=None):
+    def __run_plugin(self, plugin, phase, args=None, kwargs=None, method=None):
         """
         Execute given plugins phase method, with supplied args and kwargs.
         If plugin throws unexpected exceptions :meth:`abort` will be called.
@@ -406,9 +689,11 @@ class Task(object):
         :param string phase: Name of the phase to be executed
         :param args: Passed to the plugin
         :param kwargs: Passed to the plugin
+        :param method: Called instead of the phase handler of the plugin, if given
         """
         keyword = plugin.name
-        method = plugin.phase_handlers[phase]
+        if method is None:
+            method = plugin.phase_handlers[phase]
         if args is None:
             args = []
         if kwargs is None:
@@ -482,6 +767,8 @@ class Task(object):
             self.manager.db_cleanup()
 
         self._reset()
+        if not self.is_rerun:
+            self._input_snapshots = {}
         log.debug('executing %s' % self.name)
         if not self.enabled:
             log.debug('task %s disabled during preparation, not running' % self.name)
@@ -504,7 +791,7 @@ class Task(object):
         if self.is_rerun:
             # Restore the config to state right after start phase
             if self.prepared_config:
-                self.config = copy.deepcopy(self.prepared_config)
+                self.config = thaw(self.prepared_config)
             else:
                 log.error('BUG: No prepared_config on rerun, please report.')
             self.config_modified = False
@@ -537,7 +824,7 @@ class Task(object):
                     self.__run_task_phase(phase)
                     if phase == 'start':
                         # Store a copy of the config state after start phase to restore for reruns
-                        self.prepared_config = copy.deepcopy(self.config)
+                        self.prepared_config = freeze(self.config)
         except TaskAbort:
             # Roll back the session before calling abort handlers
             self.session.rollback()
@@ -562,9 +849,9 @@ class Task(object):
         if self._rerun:
             log.info('Rerunning the task in case better resolution can be achieved.')
             self._rerun_count += 1
-            # TODO: Potential optimization is to take snapshots (maybe make the ones backlog uses built in instead of
-            # taking another one) after input and just inject the same entries for the rerun
             self.execute()
+        else:
+            self._input_snapshots = {}
 
     def __eq__(self, other):
         if hasattr(other, 'name'):
@@ -577,7 +864,9 @@ class Task(object):
         new.__dict__.update(self.__dict__)
         # Some mutable objects need to be copies
         new.options = copy.copy(self.options)
-        new.config = copy.deepcopy(self.config)
+        new.config = thaw(freeze(self.config))
+        new._local = threading.local()
+        new.current_phase, new.current_plugin = self.current_phase, self.current_plugin
         return new
 
     copy = __copy__
@@ -591,3 +880,10 @@ def register_config_key():
     }
 
     config_schema.register_config_key('tasks', task_config_schema, required=True)
+    # Entry fields left out when entries are stored into the database, by e.g. backlog, delay and cached inputs
+    entry_storage_schema = {
+        'type': 'object',
+        'properties': {'exclude_fields': config_schema.one_or_more({'type': 'string'})},
+        'additionalProperties': False
+    }
+    config_schema.register_config_key('entry_storage', entry_storage_schema)
@@ -1,19 +1,19 @@
 from __future__ import unicode_literals, division, absolute_import
-import copy
 import logging
 import hashlib
 from datetime import datetime, timedelta
-from sqlalchemy import Column, Integer, String, DateTime, PickleType, Unicode, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary, Unicode, ForeignKey
 from sqlalchemy.orm import relation
 from flexget import db_schema
-from flexget.utils.database import safe_pickle_synonym
+from flexget.utils.database import entry_synonym
+from flexget.utils.sqlalchemy_utils import delete_batch
 from flexget.utils.tools import parse_timedelta, TimedDict
-from flexget.entry import Entry
+from flexget.entry import Entry, FrozenEntry
 from flexget.event import event
 from flexget.plugin import PluginError
 
 log = logging.getLogger('input_cache')
-Base = db_schema.versioned_base('input_cache', 0)
+Base = db_schema.versioned_base('input_cache', 1)
 
 
 class InputCache(Base):
@@ -33,18 +33,25 @@ class InputCacheEntry(Base):
     __tablename__ = 'input_cache_entry'
 
     id = Column(Integer, primary_key=True)
-    _entry = Column('entry', PickleType)
-    entry = safe_pickle_synonym('_entry')
+    _entry = Column('entry', LargeBinary)
+    entry = entry_synonym('_entry')
 
     cache_id = Column(Integer, ForeignKey('input_cache.id'), nullable=False)
 
 
-@event('manager.db_cleanup')
-def db_cleanup(session):
+@db_schema.upgrade('input_cache')
+def upgrade(ver, session):
+    if ver == 0:
+        # Entries are now stored with entry_codec, which older versions can not load
+        ver = 1
+    return ver
+
+
+@event('manager.db_cleanup.batch')
+def db_cleanup(session, batch_size):
     """Removes old input caches from plugins that are no longer configured."""
-    result = session.query(InputCache).filter(InputCache.added < datetime.now() - timedelta(days=7)).delete()
-    if result:
-        log.verbose('Removed %s old input caches.' % result)
+    query = session.query(InputCache).filter(InputCache.added < datetime.now() - timedelta(days=7))
+    return delete_batch(query, InputCache.id, batch_size)
 
 
 def config_hash(config):
@@ -70,6 +77,9 @@ class cached(object):
       If the key is not given or present in the configuration :name: is expected to be a cache name (ie. url)
 
     .. note:: Configuration assumptions may make this unusable in some (future) inputs
+
+    Entries are kept in memory as :class:`~flexget.entry.FrozenEntry` instances, each cache hit gets new entries
+    which share unchanged values with them.
     """
 
     cache = TimedDict(cache_time='5 minutes')
@@ -108,10 +118,7 @@ class cached(object):
             if cache_name in self.cache:
                 # return from the cache
                 log.trace('cache hit')
-                entries = []
-                for entry in self.cache[cache_name]:
-                    fresh = copy.deepcopy(entry)
-                    entries.append(fresh)
+                entries = [entry.thaw() for entry in self.cache[cache_name]]
                 if entries:
                     log.verbose('Restored %s entries from cache' % len(entries))
                 return entries
@@ -126,7 +133,7 @@ class cached(object):
                         entries = [Entry(e.entry) for e in db_cache.entries]
                         log.verbose('Restored %s entries from db cache' % len(entries))
                         # Store to in memory cache
-                        self.cache[cache_name] = copy.deepcopy(entries)
+                        self.cache[cache_name] = [FrozenEntry(e) for e in entries]
                         return entries
 
                 # Nothing was restored from db or memory cache, run the function
@@ -145,7 +152,7 @@ class cached(object):
                             entries = [Entry(e.entry) for e in db_cache.entries]
                             log.verbose('Restored %s entries from db cache' % len(entries))
                             # Store to in memory cache
-                            self.cache[cache_name] = copy.deepcopy(entries)
+                            self.cache[cache_name] = [FrozenEntry(e) for e in entries]
                             return entries
                     # If there was nothing in the db cache, re-raise the error.
                     raise
@@ -156,11 +163,7 @@ class cached(object):
                     return response
                 # store results to cache
                 log.debug('storing to cache %s %s entries' % (cache_name, len(response)))
-                try:
-                    self.cache[cache_name] = copy.deepcopy(response)
-                except TypeError:
-                    # might be caused because of backlog restoring some idiotic stuff, so not neccessarily a bug
-                    log.critical('Unable to save task content into cache, if problem persists longer than a day please report this as a bug')
+                self.cache[cache_name] = [FrozenEntry(e) for e in response]
                 if self.persist:
                     # Store to database
                     log.debug('Storing cache %s to database.' % cache_name)
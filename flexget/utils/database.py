@@ -6,7 +6,7 @@ from sqlalchemy.orm import synonym
 from sqlalchemy.ext.hybrid import Comparator, hybrid_property
 
 from flexget.manager import Session
-from flexget.utils import qualities
+from flexget.utils import qualities, entry_codec
 
 
 def with_session(func):
@@ -123,6 +123,33 @@ def safe_pickle_synonym(name):
     return synonym(name, descriptor=property(getter, setter))
 
 
+def excluded_entry_fields():
+    """Returns entry fields which are not stored, configured with `entry_storage` config key."""
+    from flexget.manager import manager
+    config = manager and manager.config and manager.config.get('entry_storage') or {}
+    fields = config.get('exclude_fields', [])
+    return [fields] if isinstance(fields, basestring) else fields
+
+
+def entry_synonym(name, exclude=None):
+    """Used to store Entry instances into a LargeBinary column in the database.
+
+    Entries are stored using :mod:`flexget.utils.entry_codec` and only decoded when accessed, so queries which only
+    need other columns never decode them. Old pickled values are still loaded.
+
+    :param exclude: Names of entry fields which are not stored, in addition to the configured ones
+    """
+
+    def getter(self):
+        return entry_codec.decode_entry(getattr(self, name))
+
+    def setter(self, entry):
+        fields = set(exclude or []).union(excluded_entry_fields())
+        setattr(self, name, entry_codec.encode_entry(entry, fields))
+
+    return synonym(name, descriptor=property(getter, setter))
+
+
 class CaseInsensitiveWord(Comparator):
     """Hybrid value representing a string that compares case insensitively."""
 
@@ -0,0 +1,214 @@
+"""
+Compact binary format for storing entries into the database.
+
+Values are written with a one byte type tag, integers, lengths and counts as varints. Besides builtin types,
+datetimes, dates, timedeltas and qualities (by canonical name) are supported. Values of other types are left out, like
+:func:`~flexget.utils.database.safe_pickle_synonym` does.
+
+Encoded data starts with :data:`MAGIC` and format version, data without it is treated as pickle, which is how entries
+were stored before.
+"""
+from __future__ import unicode_literals, division, absolute_import
+from datetime import datetime, date, timedelta
+import cPickle
+import logging
+import struct
+import zlib
+
+from dateutil.tz import tzoffset
+
+from flexget.utils import qualities
+
+log = logging.getLogger('entry_codec')
+
+MAGIC = b'FGE'
+VERSION = 1
+#: Data longer than this is compressed
+COMPRESS_SIZE = 512
+FLAG_ZLIB = 1
+
+_float = struct.Struct(b'>d')
+_datetime = struct.Struct(b'>HBBBBBIh')
+_date = struct.Struct(b'>HBB')
+_timedelta = struct.Struct(b'>iiI')
+#: utc offset stored for naive datetimes
+_NAIVE = -32768
+
+
+def _write_varint(out, value):
+    while value > 0x7f:
+        out.append(chr(value & 0x7f | 0x80))
+        value >>= 7
+    out.append(chr(value))
+
+
+def _write_bytes(out, tag, data):
+    out.append(tag)
+    _write_varint(out, len(data))
+    out.append(data)
+
+
+def _write(out, value):
+    # Exact types first, they are by far the most common
+    value_type = type(value)
+    if value_type is unicode:
+        _write_bytes(out, b's', value.encode('utf-8'))
+    elif value is None:
+        out.append(b'N')
+    elif isinstance(value, bool):
+        out.append(b'T' if value else b'F')
+    elif isinstance(value, (int, long)):
+        # zigzag encoded, so small negative numbers stay short as well
+        out.append(b'i')
+        _write_varint(out, value << 1 if value >= 0 else (-value << 1) - 1)
+    elif isinstance(value, float):
+        out.append(b'f' + _float.pack(value))
+    elif isinstance(value, unicode):
+        _write_bytes(out, b's', value.encode('utf-8'))
+    elif isinstance(value, str):
+        _write_bytes(out, b'b', value)
+    elif isinstance(value, datetime):
+        offset = value.utcoffset()
+        offset = _NAIVE if offset is None else offset.days * 1440 + offset.seconds // 60
+        out.append(b'D' + _datetime.pack(value.year, value.month, value.day, value.hour, value.minute, value.second,
+                                         value.microsecond, offset))
+    elif isinstance(value, date):
+        out.append(b'a' + _date.pack(value.year, value.month, value.day))
+    elif isinstance(value, timedelta):
+        out.append(b'R' + _timedelta.pack(value.days, value.seconds, value.microseconds))
+    elif isinstance(value, qualities.Quality):
+        _write_bytes(out, b'Q', value.name.encode('utf-8'))
+    elif isinstance(value, dict):
+        items = []
+        for key, item in dict.iteritems(value):
+            try:
+                items.append((_encode_value(key), _encode_value(item)))
+            except TypeError as e:
+                log.trace('Leaving out %s: %s' % (key, e))
+        out.append(b'd')
+        _write_varint(out, len(items))
+        for key, item in items:
+            out.append(key)
+            out.append(item)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        items = []
+        for item in value:
+            try:
+                items.append(_encode_value(item))
+            except TypeError as e:
+                log.trace('Leaving out list item: %s' % e)
+        out.append(b'u' if isinstance(value, tuple) else b'e' if isinstance(value, (set, frozenset)) else b'l')
+        _write_varint(out, len(items))
+        out.extend(items)
+    else:
+        raise TypeError('%r can not be stored' % value_type)
+
+
+def _encode_value(value):
+    out = []
+    _write(out, value)
+    return b''.join(out)
+
+
+def encode_entry(entry, exclude=None):
+    """
+    :param dict entry: Entry or dict to encode
+    :param exclude: Names of fields to leave out
+    :return: Encoded entry as a byte string
+    """
+    if exclude:
+        entry = dict((key, value) for key, value in dict.iteritems(entry) if key not in exclude)
+    data = _encode_value(dict(entry))
+    flags = 0
+    if len(data) > COMPRESS_SIZE:
+        compressed = zlib.compress(data)
+        if len(compressed) < len(data):
+            data, flags = compressed, FLAG_ZLIB
+    return MAGIC + chr(VERSION) + chr(flags) + data
+
+
+class _Reader(object):
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def varint(self):
+        result = shift = 0
+        while True:
+            byte = ord(self.data[self.pos])
+            self.pos += 1
+            result |= (byte & 0x7f) << shift
+            if not byte & 0x80:
+                return result
+            shift += 7
+
+    def take(self, size):
+        start = self.pos
+        self.pos += size
+        return self.data[start:self.pos]
+
+    def unpack(self, fmt):
+        return fmt.unpack(self.take(fmt.size))
+
+    def read(self):
+        tag = self.take(1)
+        if tag == b's':
+            return self.take(self.varint()).decode('utf-8')
+        elif tag == b'i':
+            value = self.varint()
+            return -(value + 1 >> 1) if value & 1 else value >> 1
+        elif tag == b'd':
+            result = {}
+            for i in xrange(self.varint()):
+                key = self.read()
+                result[key] = self.read()
+            return result
+        elif tag == b'N':
+            return None
+        elif tag == b'T':
+            return True
+        elif tag == b'F':
+            return False
+        elif tag == b'l':
+            return [self.read() for i in xrange(self.varint())]
+        elif tag == b'D':
+            values = self.unpack(_datetime)
+            offset = values[-1]
+            tz = None if offset == _NAIVE else tzoffset(None, offset * 60)
+            return datetime(*values[:-1], tzinfo=tz)
+        elif tag == b'f':
+            return self.unpack(_float)[0]
+        elif tag == b'b':
+            return self.take(self.varint())
+        elif tag == b'u':
+            return tuple(self.read() for i in xrange(self.varint()))
+        elif tag == b'e':
+            return set(self.read() for i in xrange(self.varint()))
+        elif tag == b'a':
+            return date(*self.unpack(_date))
+        elif tag == b'R':
+            return timedelta(*self.unpack(_timedelta))
+        elif tag == b'Q':
+            name = self.take(self.varint()).decode('utf-8')
+            return qualities.Quality() if name == 'unknown' else qualities.get(name)
+        raise ValueError('Unknown type tag %r at %i' % (tag, self.pos - 1))
+
+
+def decode_entry(data):
+    """
+    :param data: Data from :func:`encode_entry`, or a pickle
+    :return: Decoded entry as a dict
+    """
+    if data is None:
+        return None
+    data = bytes(data)
+    if not data.startswith(MAGIC):
+        return cPickle.loads(data)
+    version, flags = ord(data[3]), ord(data[4])
+    if version != VERSION:
+        raise ValueError('Unsupported entry format version %s' % version)
+    data = data[5:]
+    if flags & FLAG_ZLIB:
+        data = zlib.decompress(data)
+    return _Reader(data).read()
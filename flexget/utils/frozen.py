@@ -0,0 +1,209 @@
+"""
+Read-only config structures which can be shared between tasks, reruns and plugins without copying them.
+
+:func:`freeze` turns a config into :class:`FrozenDict` and :class:`FrozenList` nodes. :func:`thaw` gives a mutable
+version of a frozen node, which copies only the nodes that are accessed through it. Parts of the config nobody looks
+into are never copied.
+
+Thawed dicts and lists copy nested nodes in their item access methods. Python reads the items of dict and list
+subclasses directly in ``dict(thawed)``, ``list(thawed)``, ``func(**thawed)`` and ``other.update(thawed)``, so nested
+nodes got that way may still be frozen. Use ``thawed.copy()`` or :func:`copy.copy` for a modifiable shallow copy, or
+:func:`unfreeze` for a plain deep copy.
+"""
+from __future__ import unicode_literals, division, absolute_import
+import copy
+
+import yaml
+
+
+class ReadOnlyError(TypeError):
+    """Raised when modifying a frozen config node."""
+
+
+def _read_only(self, *args, **kwargs):
+    raise ReadOnlyError('%s is read-only, use flexget.utils.frozen.thaw to get a modifiable copy' %
+                        type(self).__name__)
+
+
+class FrozenDict(dict):
+    """A dict which can not be modified. Values are frozen as well."""
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self):
+        return thaw(self)
+
+    copy = __copy__
+
+    def __deepcopy__(self, memo):
+        return unfreeze(self, memo)
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+class FrozenList(list):
+    """A list which can not be modified. Items are frozen as well."""
+
+    __setitem__ = __delitem__ = __setslice__ = __delslice__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = reverse = sort = _read_only
+
+    def __copy__(self):
+        return thaw(self)
+
+    def __deepcopy__(self, memo):
+        return unfreeze(self, memo)
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+
+class ThawedDict(dict):
+    """
+    Modifiable copy of a :class:`FrozenDict`. Frozen values are replaced with thawed copies of them when they are
+    accessed, so modifying them never touches the frozen original.
+    """
+
+    def _thawed(self, key, value):
+        if isinstance(value, (FrozenDict, FrozenList)):
+            value = thaw(value)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def __getitem__(self, key):
+        return self._thawed(key, dict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        dict.__setitem__(self, key, default)
+        return default
+
+    def pop(self, key, *default):
+        return thaw(dict.pop(self, key, *default))
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        return key, thaw(value)
+
+    def iteritems(self):
+        for key in self.keys():
+            yield key, self[key]
+
+    def itervalues(self):
+        for key in self.keys():
+            yield self[key]
+
+    def items(self):
+        return list(self.iteritems())
+
+    def values(self):
+        return list(self.itervalues())
+
+    def __copy__(self):
+        return ThawedDict(self)
+
+    copy = __copy__
+
+    def __deepcopy__(self, memo):
+        return unfreeze(self, memo)
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+class ThawedList(list):
+    """
+    Modifiable copy of a :class:`FrozenList`. Frozen items are replaced with thawed copies of them when they are
+    accessed, so modifying them never touches the frozen original.
+    """
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ThawedList(list.__getitem__(self, index))
+        value = list.__getitem__(self, index)
+        if isinstance(value, (FrozenDict, FrozenList)):
+            value = thaw(value)
+            list.__setitem__(self, index, value)
+        return value
+
+    def __getslice__(self, i, j):
+        return ThawedList(list.__getslice__(self, i, j))
+
+    def __iter__(self):
+        # Same as list iteration, items appended meanwhile are included
+        index = 0
+        while index < len(self):
+            yield self[index]
+            index += 1
+
+    def __reversed__(self):
+        for index in xrange(len(self) - 1, -1, -1):
+            yield self[index]
+
+    def pop(self, *index):
+        return thaw(list.pop(self, *index))
+
+    def __copy__(self):
+        return ThawedList(self)
+
+    def __deepcopy__(self, memo):
+        return unfreeze(self, memo)
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+
+def freeze(value):
+    """
+    Returns a read-only version of `value`, dicts and lists in it are replaced with frozen ones. Already frozen parts,
+    including the ones of thawed dicts and lists that have not been accessed, are reused as is.
+    """
+    if isinstance(value, (FrozenDict, FrozenList)):
+        return value
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in dict.iteritems(value))
+    if isinstance(value, list):
+        return FrozenList(freeze(item) for item in list.__iter__(value))
+    return value
+
+
+def thaw(value):
+    """
+    Returns a modifiable version of a frozen dict or list. Only the top level is copied, nested frozen values are copied
+    when accessed. Other values are returned as is.
+    """
+    if isinstance(value, FrozenDict):
+        return ThawedDict(value)
+    if isinstance(value, FrozenList):
+        return ThawedList(value)
+    return value
+
+
+def unfreeze(value, memo=None):
+    """Returns a deep copy of `value` made of plain dicts and lists."""
+    if isinstance(value, dict):
+        return dict((key, unfreeze(item, memo)) for key, item in dict.iteritems(value))
+    if isinstance(value, list):
+        return [unfreeze(item, memo) for item in list.__iter__(value)]
+    return copy.deepcopy(value, memo)
+
+
+def _represent_dict(dumper, data):
+    return dumper.represent_dict(dict(data))
+
+
+def _represent_list(dumper, data):
+    return dumper.represent_list(list(data))
+
+
+for _dumper in (yaml.Dumper, yaml.SafeDumper):
+    for _cls in (FrozenDict, ThawedDict):
+        yaml.add_representer(_cls, _represent_dict, Dumper=_dumper)
+    for _cls in (FrozenList, ThawedList):
+        yaml.add_representer(_cls, _represent_list, Dumper=_dumper)
@@ -6,7 +6,7 @@ import hashlib
 from datetime import datetime, timedelta
 from sqlalchemy import Column, Integer, String, DateTime, Index
 from flexget import db_schema
-from flexget.utils.sqlalchemy_utils import table_schema
+from flexget.utils.sqlalchemy_utils import table_schema, delete_batch
 from flexget.manager import Session
 from flexget.event import event
 from flexget import logger as f_logger
@@ -41,14 +41,11 @@ class LogMessage(Base):
         return "<LogMessage('%s')>" % self.md5sum
 
 
-@event('manager.db_cleanup')
-def purge(session):
+@event('manager.db_cleanup.batch')
+def purge(session, batch_size):
     """Purge old messages from database"""
     old = datetime.now() - timedelta(days=365)
-
-    result = session.query(LogMessage).filter(LogMessage.added < old).delete()
-    if result:
-        log.verbose('Purged %s entries from log_once table.' % result)
+    return delete_batch(session.query(LogMessage).filter(LogMessage.added < old), LogMessage.id, batch_size)
 
 
 def log_once(message, logger=logging.getLogger('log_once'), once_level=logging.INFO, suppressed_level=f_logger.VERBOSE):
@@ -3,6 +3,8 @@ import re
 import copy
 import logging
 
+from flexget.utils.tools import LRUCache
+
 log = logging.getLogger('utils.qualities')
 
 
@@ -185,58 +187,105 @@ for items in (_resolutions, _sources, _codecs, _audios):
     for item in items:
         _registry[item.name] = item
 
+# Bit for each component (type, value), used for evaluating compiled Requirements
+_bits = {}
+for item in _UNKNOWNS.values() + _registry.values():
+    _bits.setdefault((item.type, item.value), 1 << len(_bits))
+
+
+# Parsed qualities by text, release names repeat between feeds and runs
+_cache = LRUCache(maxsize=5000, name='qualities')
+# Compiled requirement masks by requirement components
+_requirements_cache = LRUCache(maxsize=1000, name='quality requirements')
+
 
 def all_components():
     return _registry.itervalues()
 
 
 class Quality(object):
-    """Parses and stores the quality of an entry in the four component categories."""
+    """
+    Parses and stores the quality of an entry in the four component categories.
 
-    def __init__(self, text=''):
+    Quality objects are immutable, so they can be shared. Parsed qualities are memoized by text.
+    """
+
+    def __new__(cls, text=''):
         """
         :param text: A string to parse quality from
         """
-        self.text = text
-        self.clean_text = text
-        if text:
-            self.parse(text)
-        else:
-            self.resolution = _UNKNOWNS['resolution']
-            self.source = _UNKNOWNS['source']
-            self.codec = _UNKNOWNS['codec']
-            self.audio = _UNKNOWNS['audio']
+        if not text:
+            self = object.__new__(cls)
+            self.__dict__.update(text=text, clean_text=text, **_UNKNOWNS)
+            return self
+        try:
+            return _cache[text]
+        except KeyError:
+            pass
+        self = object.__new__(cls)
+        self.__dict__.update(cls._parse(text))
+        _cache[text] = self
+        return self
+
+    def __init__(self, text=''):
+        # All done in __new__
+        pass
 
-    def parse(self, text):
+    @staticmethod
+    def _parse(text):
         """Parses a string to determine the quality in the four component categories.
 
         :param text: The string to parse
+        :return: dict of the components, `text` and `clean_text`
         """
-        self.text = text
-        self.clean_text = text
-        self.resolution = self._find_best(_resolutions, _UNKNOWNS['resolution'])
-        self.source = self._find_best(_sources, _UNKNOWNS['source'])
-        self.codec = self._find_best(_codecs, _UNKNOWNS['codec'])
-        self.audio = self._find_best(_audios, _UNKNOWNS['audio'])
+        result = {'text': text}
+        for type, qlist in (('resolution', _resolutions), ('source', _sources), ('codec', _codecs),
+                            ('audio', _audios)):
+            result[type], text = Quality._find_best(qlist, text, _UNKNOWNS[type])
+        result['clean_text'] = text
         # If any of the matched components have defaults, set them now.
-        for component in self.components:
+        for component in [result['resolution'], result['source'], result['codec'], result['audio']]:
             for default in component.defaults:
                 default = _registry[default]
-                if not getattr(self, default.type):
-                    setattr(self, default.type, default)
+                if not result[default.type]:
+                    result[default.type] = default
+        return result
+
+    @staticmethod
+    def _find_best(qlist, text, default=None):
+        """Finds the highest matching quality component from `qlist`
 
-    def _find_best(self, qlist, default=None):
-        """Finds the highest matching quality component from `qlist`"""
+        :return: tuple (component, remaining text without the component)
+        """
         result = None
         for item in qlist:
-            match = item.matches(self.clean_text)
+            match = item.matches(text)
             if match[0]:
                 result = item
-                self.clean_text = match[1]
+                text = match[1]
                 if item.modifier is not None:
                     # If this item has a modifier, do not proceed to check higher qualities in the list
                     break
-        return result or default
+        return result or default, text
+
+    def replace(self, **components):
+        """Returns a new Quality with given `components` (type: component) replaced."""
+        result = object.__new__(self.__class__)
+        result.__dict__.update(self.__dict__)
+        result.__dict__.update(components)
+        return result
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Quality objects are immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('Quality objects are immutable')
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo=None):
+        return self
 
     @property
     def name(self):
@@ -247,6 +296,16 @@ class Quality(object):
     def components(self):
         return [self.resolution, self.source, self.codec, self.audio]
 
+    @property
+    def mask(self):
+        """Bits of the components of this quality, or None if some component is not known."""
+        if '_mask' not in self.__dict__:
+            try:
+                self.__dict__['_mask'] = sum(_bits[(c.type, c.value)] for c in self.components)
+            except KeyError:
+                self.__dict__['_mask'] = None
+        return self.__dict__['_mask']
+
     @property
     def _comparator(self):
         modifier = sum(c.modifier for c in self.components if c.modifier)
@@ -323,10 +382,7 @@ def get(quality_name):
         found_components[component.type] = component
     if not found_components:
         raise ValueError('No quality specified')
-    result = Quality()
-    for type, component in found_components.iteritems():
-        setattr(result, type, component)
-    return result
+    return Quality().replace(**found_components)
 
 
 class RequirementComponent(object):
@@ -398,6 +454,7 @@ class Requirements(object):
     """Represents requirements for allowable qualities. Can determine whether a given Quality passes requirements."""
     def __init__(self, req=''):
         self.text = ''
+        self._masks = None
         self.resolution = RequirementComponent('resolution')
         self.source = RequirementComponent('source')
         self.codec = RequirementComponent('codec')
@@ -415,6 +472,7 @@ class Requirements(object):
 
         :param text: The string containing quality requirements.
         """
+        self._masks = None
         text = text.lower()
         if self.text:
             self.text += ' '
@@ -452,11 +510,37 @@ class Requirements(object):
             qual = Quality(qual)
             if not qual:
                 raise TypeError('`%s` does not appear to be a valid quality string.' % qual.text)
+        if qual.mask is not None:
+            return not qual.mask & self.masks[bool(loose)]
         for r_component, q_component in zip(self.components, qual.components):
             if not r_component.allows(q_component, loose=loose):
                 return False
         return True
 
+    @property
+    def masks(self):
+        """
+        Requirements compiled into bitmasks of the disallowed components, (strict, loose). Quality is allowed if
+        none of its component bits (:attr:`Quality.mask`) are in the mask.
+        """
+        if self._masks is None:
+            key = tuple((c.min and c.min.name, c.max and c.max.name, tuple(q.name for q in c.acceptable),
+                         tuple(q.name for q in c.none_of)) for c in self.components)
+            try:
+                self._masks = _requirements_cache[key]
+            except KeyError:
+                self._masks = _requirements_cache[key] = self._compile()
+        return self._masks
+
+    def _compile(self):
+        masks = [0, 0]
+        components = dict((component.type, component) for component in self.components)
+        for item in _UNKNOWNS.values() + _registry.values():
+            for loose in (False, True):
+                if not components[item.type].allows(item, loose=loose):
+                    masks[loose] |= _bits[(item.type, item.value)]
+        return tuple(masks)
+
     def __str__(self):
         return self.text or 'any'
 
@@ -13,6 +13,7 @@ from contextlib import contextmanager
 from datetime import datetime
 import logging
 import pickle
+import threading
 
 from sqlalchemy import Column, Integer, String, DateTime, PickleType, select, Index
 
@@ -140,6 +141,7 @@ class SimpleTaskPersistence(SimplePersistence):
 
     def __init__(self, task):
         self.task = task
+        self._local = threading.local()
 
     @property
     def plugin(self):
@@ -151,4 +153,56 @@ class SimpleTaskPersistence(SimplePersistence):
 
     @property
     def _session(self):
+        if self.buffer is not None:
+            # The task session cannot be used from worker threads, let reads use their own session instead
+            return None
         return self.task.session
+
+    @property
+    def buffer(self):
+        """Dict of pending changes if buffering has been started in the current thread, otherwise None."""
+        return getattr(self._local, 'buffer', None)
+
+    def start_buffering(self, buffer):
+        """
+        Used when a plugin is run in a worker thread. Until :meth:`stop_buffering` is called from the same thread, any
+        changes are collected into `buffer` dict, to be saved later from the task thread with :meth:`apply`.
+        """
+        self._local.buffer = buffer
+
+    def stop_buffering(self):
+        self._local.buffer = None
+
+    def apply(self, buffer):
+        """Saves changes which were made in a worker thread. See :meth:`start_buffering`."""
+        for (plugin, key), value in buffer.iteritems():
+            persistence = SimplePersistence(plugin, session=self.task.session)
+            persistence.taskname = self.taskname
+            if value is _deleted:
+                persistence.pop(key, None)
+            else:
+                persistence[key] = value
+
+    def __setitem__(self, key, value):
+        if self.buffer is not None:
+            self.buffer[(self.plugin, key)] = value
+            return
+        super(SimpleTaskPersistence, self).__setitem__(key, value)
+
+    def __getitem__(self, key):
+        if self.buffer is not None and (self.plugin, key) in self.buffer:
+            value = self.buffer[(self.plugin, key)]
+            if value is _deleted:
+                raise KeyError('%s is not contained in the simple_persistence table.' % key)
+            return value
+        return super(SimpleTaskPersistence, self).__getitem__(key)
+
+    def __delitem__(self, key):
+        if self.buffer is not None:
+            self.buffer[(self.plugin, key)] = _deleted
+            return
+        super(SimpleTaskPersistence, self).__delitem__(key)
+
+
+# Marks keys deleted while buffering in SimpleTaskPersistence
+_deleted = object()
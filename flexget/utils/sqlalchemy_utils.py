@@ -122,3 +122,75 @@ def create_index(table_name, session, *column_names):
         Index(index_name, *columns).create(bind=session.bind)
     except OperationalError:
         log.debug('Error creating index.', exc_info=True)
+
+
+def chunked(seq, size=900):
+    """
+    Divides `seq` into lists of at most `size` items, small enough to be used in an IN clause.
+    (sqlite limits the number of variables in a single query to 999)
+
+    :param seq: Sequence to divide
+    :param int size: Maximum number of items in one chunk
+    """
+    seq = list(seq)
+    for i in xrange(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def delete_batch(query, primary_key, size=500):
+    """
+    Deletes at most `size` of the rows matched by `query`. Used by cleanup handlers to delete rows in short
+    transactions instead of all at once.
+
+    :param query: Query for the rows to delete
+    :param primary_key: Primary key column of the queried entity, e.g. `Release.id`
+    :param int size: Maximum number of rows to delete
+    :return: Number of rows deleted
+    """
+    ids = [row[0] for row in query.with_entities(primary_key).limit(size)]
+    if not ids:
+        return 0
+    return query.session.query(primary_key.class_).filter(primary_key.in_(ids)).delete(synchronize_session=False)
+
+
+def sqlite_page_stats(session, fragmentation=False):
+    """
+    Returns page statistics of sqlite database. `free_ratio` is the part of the database file taken by unused pages,
+    which only a full VACUUM returns to the filesystem when incremental vacuum is not enabled.
+
+    :param bool fragmentation: Also give `fragmentation`, see :func:`sqlite_fragmentation`. It reads through every
+      page of the database.
+    :return: Dict with keys `page_size`, `page_count`, `freelist_count`, `free_ratio` and `auto_vacuum`
+    """
+    stats = {}
+    for pragma in ['page_size', 'page_count', 'freelist_count', 'auto_vacuum']:
+        stats[pragma] = session.execute('PRAGMA %s' % pragma).scalar()
+    stats['free_ratio'] = stats['freelist_count'] / stats['page_count'] if stats['page_count'] else 0
+    if fragmentation:
+        stats['fragmentation'] = sqlite_fragmentation(session)
+    return stats
+
+
+def sqlite_fragmentation(session):
+    """
+    Returns the part of the pages of tables and indexes which do not directly follow the previous page of the same
+    table or index in the database file, so reading them in order needs a seek. Full VACUUM rewrites each table and
+    index into consecutive pages.
+
+    :return: Fragmentation between 0 and 1, or None if sqlite was built without the dbstat virtual table
+    """
+    try:
+        # dbstat lists the pages of each table and index in the order they are traversed
+        rows = session.execute('SELECT name, pageno FROM dbstat').fetchall()
+    except OperationalError as e:
+        log.debug('Unable to read dbstat: %s' % e)
+        return None
+    if not rows:
+        return 0
+    fragmented = 0
+    previous = None, None
+    for name, pageno in rows:
+        if name == previous[0] and pageno != previous[1] + 1:
+            fragmented += 1
+        previous = name, pageno
+    return fragmented / len(rows)
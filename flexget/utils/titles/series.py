@@ -7,7 +7,7 @@ from dateutil.parser import parse as parsedate
 
 from flexget.utils.titles.parser import TitleParser, ParseWarning
 from flexget.utils import qualities
-from flexget.utils.tools import ReList
+from flexget.utils.tools import ReList, LRUCache
 
 log = logging.getLogger('seriesparser')
 
@@ -17,6 +17,20 @@ log.setLevel(logging.INFO)
 
 ID_TYPES = ['ep', 'date', 'sequence', 'id']
 
+# Parsers are created for each series on every task run, keep their compiled regexps around
+regexp_cache = LRUCache(maxsize=1000, name='series regexps')
+
+
+def cached_regexps(key, regexps):
+    """Returns ReList of `regexps` compiled, or the one cached with `key`"""
+    try:
+        compiled = regexp_cache[key]
+    except KeyError:
+        # iterating ReList compiles all of the regexps
+        compiled = list(ReList(regexps))
+        regexp_cache[key] = compiled
+    return ReList(compiled)
+
 
 class SeriesParser(TitleParser):
 
@@ -67,6 +81,9 @@ class SeriesParser(TitleParser):
         '(?:\[[^\[\]]*\])',  # ignores group names before the name, eg [foobar] name
         '(?:HD.720p?:)',
         '(?:HD.1080p?:)']
+    ignore_prefix_re = re.compile('|'.join(ignore_prefixes), re.IGNORECASE | re.UNICODE)
+    # Blanks are any non word characters except & and _
+    blank_re = re.compile(r'(?:[^\w&]|_)+', re.UNICODE)
 
     def __init__(self, name='', alternate_names=None, identified_by='auto', name_regexps=None, ep_regexps=None,
                  date_regexps=None, sequence_regexps=None, id_regexps=None, strict_name=False, allow_groups=None,
@@ -102,13 +119,16 @@ class SeriesParser(TitleParser):
         self.identified_by = identified_by
         # Stores the type of identifier found, 'ep', 'date', 'sequence' or 'special'
         self.id_type = None
-        self.name_regexps = ReList(name_regexps or [])
+        self.name_regexps = ReList()
+        if name_regexps:
+            self.name_regexps = cached_regexps(('name_regexps', tuple(name_regexps)), name_regexps)
         self.re_from_name = False
         # If custom identifier regexps were provided, prepend them to the appropriate type of built in regexps
         for mode in ID_TYPES:
             listname = mode + '_regexps'
             if locals()[listname]:
-                setattr(self, listname, ReList(locals()[listname] + getattr(SeriesParser, listname)))
+                setattr(self, listname, cached_regexps((listname, tuple(locals()[listname])),
+                                                       locals()[listname] + getattr(SeriesParser, listname)))
         self.strict_name = strict_name
         self.allow_groups = allow_groups or []
         self.allow_seasonless = allow_seasonless
@@ -175,6 +195,42 @@ class SeriesParser(TitleParser):
         res = '^' + ignore + blank + '*' + '(' + res + ')(?:\\b|_)' + blank + '*'
         return res
 
+    def name_prefixes(self):
+        """
+        Returns normalized prefixes for name and alternate names, at least one of which the normalized data
+        (see :meth:`data_prefixes`) starts with when the name regexps generated by :meth:`name_to_re` match.
+        Returns None when custom name regexps are used, as any data may match them then.
+        """
+        if self.name_regexps and not self.re_from_name:
+            return None
+        prefixes = []
+        for name in [self.name] + self.alternate_names:
+            # same normalization as name_to_re
+            if name.endswith(')'):
+                p_start = name.rfind('(')
+                if p_start != -1:
+                    name = name[:p_start - 1]
+            words = re.sub(self.blank_re, ' ', name).strip().lower().split(' ')
+            prefix = words[0]
+            # the part after '&' or 'and' may match either one of them, only use part before it
+            for word in words[1:]:
+                if word in ['&', 'and']:
+                    break
+                prefix += word
+            if not prefix:
+                return None
+            prefixes.append(prefix)
+        return prefixes
+
+    @classmethod
+    def data_prefixes(cls, data):
+        """Returns normalized forms of `data`, with and without possible ignored prefix, for use with name_prefixes"""
+        result = [re.sub(cls.blank_re, '', data).lower()]
+        match = cls.ignore_prefix_re.match(data)
+        if match:
+            result.append(re.sub(cls.blank_re, '', data[match.end():]).lower())
+        return result
+
     def parse(self, data=None, field=None, quality=None):
         # Clear the output variables before parsing
         self._reset()
@@ -201,7 +257,14 @@ class SeriesParser(TitleParser):
         # regexp name matching
         if not self.name_regexps:
             # if we don't have name_regexps, generate one from the name
-            self.name_regexps = ReList(self.name_to_re(name) for name in [self.name] + self.alternate_names)
+            key = ('name', self.name, tuple(self.alternate_names), self.strict_name, tuple(self.ignore_prefixes))
+            try:
+                name_regexps, self.strict_name = regexp_cache[key]
+            except KeyError:
+                # name_to_re may turn on strict_name, it is cached along with the regexps
+                name_regexps = list(ReList(self.name_to_re(name) for name in [self.name] + self.alternate_names))
+                regexp_cache[key] = name_regexps, self.strict_name
+            self.name_regexps = ReList(name_regexps)
             # With auto regex generation, the first regex group captures the name
             self.re_from_name = True
         # try all specified regexps on this data
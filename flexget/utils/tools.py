@@ -9,7 +9,9 @@ import time
 import re
 import sys
 import locale
-from collections import MutableMapping
+import threading
+from collections import MutableMapping, OrderedDict
+from contextlib import contextmanager
 from urlparse import urlparse
 from htmlentitydefs import name2codepoint
 from datetime import timedelta, datetime
@@ -131,12 +133,20 @@ def _xmlcharref_encode(unicode_data, encoding):
     return ''.join(chars)
 
 
+def _merge_type(value):
+    """Dicts and lists are merged regardless of their exact type, eg. frozen or thawed config nodes."""
+    for container in (dict, list):
+        if isinstance(value, container):
+            return container
+    return type(value)
+
+
 def merge_dict_from_to(d1, d2):
     """Merges dictionary d1 into dictionary d2. d1 will remain in original form."""
     import copy
     for k, v in d1.items():
         if k in d2:
-            if type(v) == type(d2[k]):
+            if _merge_type(v) == _merge_type(d2[k]):
                 if isinstance(v, dict):
                     merge_dict_from_to(d1[k], d2[k])
                 elif isinstance(v, list):
@@ -401,3 +411,105 @@ class TimedDict(MutableMapping):
 
     def __repr__(self):
         return '%s(%r)' % (self.__class__.__name__, dict(zip(self._store, (v[1] for v in self._store.values()))))
+
+
+class LRUCache(MutableMapping):
+    """
+    Acts like a normal dict, but holds at most `maxsize` items, dropping the least recently used ones.
+
+    Lookups are counted in `hits` and `misses`. Caches given a `name` are listed in :attr:`LRUCache.registry`,
+    and their statistics are logged with --debug-perf.
+    """
+
+    #: Named caches, name -> cache
+    registry = {}
+
+    def __init__(self, maxsize=1000, name=None):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._store = OrderedDict()
+        self._lock = threading.Lock()
+        if name:
+            LRUCache.registry[name] = self
+
+    def __getitem__(self, key):
+        with self._lock:
+            try:
+                value = self._store.pop(key)
+            except KeyError:
+                self.misses += 1
+                raise
+            # move to most recently used
+            self._store[key] = value
+            self.hits += 1
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._store.pop(key, None)
+            self._store[key] = value
+            while len(self._store) > self.maxsize:
+                self._store.popitem(last=False)
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._store[key]
+
+    def __contains__(self, key):
+        # does not count as a lookup
+        return key in self._store
+
+    def __iter__(self):
+        return iter(self._store.keys())
+
+    def __len__(self):
+        return len(self._store)
+
+    def __repr__(self):
+        return '%s(maxsize=%r, hits=%r, misses=%r, size=%r)' % (self.__class__.__name__, self.maxsize, self.hits,
+                                                                 self.misses, len(self))
+
+
+@contextmanager
+def threaded_calls(funcs, max_workers):
+    """
+    Starts calling each of `funcs` (without arguments) in a pool of at most `max_workers` threads. Logging in the
+    worker threads is attributed to the same task and execution as in the calling thread.
+
+    Yields a list of callables in the same order as `funcs`. Each one waits for the respective call to finish and
+    returns its result, or re-raises the exception it raised. On exit waits for all calls to finish.
+    """
+    from multiprocessing.pool import ThreadPool
+    from flexget import logger
+
+    if not funcs:
+        yield []
+        return
+    task, execution = logger.get_task(), logger.get_execution()
+
+    def call(func):
+        logger.set_task(task)
+        logger.set_execution(execution)
+        try:
+            return func(), None
+        except Exception:
+            return None, sys.exc_info()
+        finally:
+            logger.set_task('')
+            logger.set_execution(None)
+
+    def result_getter(async_result):
+        def result():
+            value, exc_info = async_result.get()
+            if exc_info:
+                raise exc_info[0], exc_info[1], exc_info[2]
+            return value
+        return result
+
+    pool = ThreadPool(min(max_workers, len(funcs)))
+    try:
+        yield [result_getter(pool.apply_async(call, (func,))) for func in funcs]
+    finally:
+        pool.close()
+        pool.join()
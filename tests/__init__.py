@@ -38,7 +38,7 @@ def setup_once():
     if not plugins_loaded:
         flexget.logger.initialize(True)
         setup_logging_level()
-        load_plugins()
+        load_plugins(manifest=False)
         # store options for MockManager
         test_arguments = get_parser().parse_args(['execute'])
         plugins_loaded = True
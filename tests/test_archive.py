@@ -0,0 +1,111 @@
+from __future__ import unicode_literals, division, absolute_import
+from tests import FlexGetBase
+from flexget.entry import Entry
+from flexget.manager import Session
+from flexget.plugin import get_plugin_by_name
+from flexget.plugins.generic.archive import ArchiveEntry, ArchiveTag, search
+
+
+class TestArchiveSearch(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test:
+            mock:
+              - {title: 'Some.Show.S01E01.720p', url: 'http://localhost/1'}
+              - {title: 'Other.Thing', url: 'http://localhost/2', description: 'some show in description'}
+              - {title: 'Unrelated', url: 'http://localhost/3'}
+            archive: [mytag]
+          other:
+            mock:
+              - {title: 'Some.Show.S01E02.720p', url: 'http://localhost/4'}
+            archive: yes
+    """
+
+    def titles(self, session, text, **kwargs):
+        return sorted(ae.title for ae in search(session, text, **kwargs))
+
+    def test_search(self):
+        self.execute_task('test')
+        self.execute_task('other')
+        session = Session()
+        try:
+            assert self.titles(session, 'some show') == ['Other.Thing', 'Some.Show.S01E01.720p',
+                                                         'Some.Show.S01E02.720p']
+            assert self.titles(session, 'Some.Show.S01') == ['Some.Show.S01E01.720p', 'Some.Show.S01E02.720p']
+            assert self.titles(session, 'some show', tags=['mytag']) == ['Other.Thing', 'Some.Show.S01E01.720p']
+            assert self.titles(session, 'some show', sources=['other']) == ['Some.Show.S01E02.720p']
+            assert [ae.title for ae in search(session, 'some show', relevance=True)][-1] == 'Other.Thing', \
+                'description match should be least relevant'
+            # Index follows changes of the archive
+            session.query(ArchiveEntry).filter(ArchiveEntry.title == 'Unrelated').update({'title': 'Some.Update'})
+            session.query(ArchiveEntry).filter(ArchiveEntry.title == 'Other.Thing').delete()
+            session.commit()
+            assert self.titles(session, 'some') == ['Some.Show.S01E01.720p', 'Some.Show.S01E02.720p', 'Some.Update']
+        finally:
+            session.close()
+
+    def test_title_only(self):
+        self.execute_task('test')
+        self.execute_task('other')
+        session = Session()
+        try:
+            # Search plugin matches titles starting with the search text, like without the index
+            assert self.titles(session, 'some show', title_only=True) == ['Some.Show.S01E01.720p',
+                                                                          'Some.Show.S01E02.720p']
+            assert self.titles(session, 'Some.Show.S01E02', title_only=True) == ['Some.Show.S01E02.720p']
+            assert self.titles(session, 'show s01', title_only=True) == []
+        finally:
+            session.close()
+        entries = get_plugin_by_name('flexget_archive').instance.search(Entry(title='some show', url=''))
+        assert sorted(e['title'] for e in entries) == ['Some.Show.S01E01.720p', 'Some.Show.S01E02.720p']
+
+    def test_fallback(self):
+        self.execute_task('test')
+        session = Session()
+        try:
+            session.execute('DROP TABLE archive_entry_fts')
+            # Without index only titles are searched
+            assert self.titles(session, 'some show') == ['Some.Show.S01E01.720p']
+        finally:
+            session.close()
+
+
+class TestArchiveIngest(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          first:
+            mock:
+              - {title: 'entry 1', url: 'http://localhost/1', description: 'first'}
+              - {title: 'entry 2', url: 'http://localhost/2'}
+            archive: [tag1]
+          second:
+            mock:
+              - {title: 'entry 1', url: 'http://localhost/1'}
+              - {title: 'entry 1', url: 'http://localhost/other'}
+              - {title: 'entry 3', url: 'http://localhost/3'}
+            regexp:
+              reject: [entry 3]
+            archive: [tag1, tag2]
+    """
+
+    def test_ingest(self):
+        self.execute_task('first')
+        self.execute_task('second')
+        self.execute_task('second')
+        session = Session()
+        try:
+            entries = dict(((ae.title, ae.url), ae) for ae in session.query(ArchiveEntry))
+            assert len(entries) == 4, 'entries should have been archived once'
+            first = entries[('entry 1', 'http://localhost/1')]
+            assert first.description == 'first' and first.task == 'first'
+            assert sorted(s.name for s in first.sources) == ['first', 'second']
+            assert sorted(t.name for t in first.tags) == ['tag1', 'tag2']
+            assert [s.name for s in entries[('entry 2', 'http://localhost/2')].sources] == ['first']
+            rejected = entries[('entry 3', 'http://localhost/3')]
+            assert [s.name for s in rejected.sources] == ['second'], 'rejected entries should be archived'
+            assert sorted(t.name for t in rejected.tags) == ['tag1', 'tag2']
+            assert session.query(ArchiveTag).count() == 2
+        finally:
+            session.close()
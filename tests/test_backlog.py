@@ -1,4 +1,5 @@
 from __future__ import unicode_literals, division, absolute_import
+from datetime import datetime
 from tests import FlexGetBase
 
 
@@ -38,3 +39,67 @@ class TestBacklog(FlexGetBase):
         entry = self.task.find_entry(title='Test.S01E01.hdtv-FlexGet')
         assert entry['description'] == ''
         assert 'laterfield' not in entry
+
+
+class TestBacklogInjection(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test:
+            mock:
+              - {title: 'entry 1', url: 'http://localhost/1'}
+              - {title: 'entry 2', url: 'http://localhost/2'}
+              - {title: 'entry 3', url: 'http://localhost/3'}
+            backlog: 10 minutes
+          rewrite:
+            mock:
+              - {title: 'entry 1', url: 'http://localhost/1'}
+              - {title: 'entry 2', url: 'http://localhost/2'}
+            set:
+              url: 'http://localhost/rewritten'
+            plugin_priority:
+              set: 255
+            accept_all: yes
+            # Backlogs entry 2 after its url was changed
+            limit_new: 1
+    """
+
+    def test_injection(self):
+        from flexget.manager import Session
+        from flexget.plugins.input.backlog import BacklogEntry
+        self.execute_task('test')
+        self.manager.config['tasks']['test']['mock'] = [{'title': 'entry 1', 'url': 'http://localhost/1'},
+                                                        {'title': 'entry 2', 'url': 'http://localhost/other'}]
+        self.execute_task('test')
+        # entry 2 has a different url, so the backlogged one is injected too
+        assert sorted((e['title'], e['url']) for e in self.task.entries) == [
+            ('entry 1', 'http://localhost/1'), ('entry 2', 'http://localhost/2'),
+            ('entry 2', 'http://localhost/other'), ('entry 3', 'http://localhost/3')]
+        session = Session()
+        try:
+            session.query(BacklogEntry).filter(BacklogEntry.title == 'entry 3').update({'url': None})
+            session.query(BacklogEntry).filter(BacklogEntry.title != 'entry 3').update({'expire': datetime(2000, 1, 1)})
+            session.commit()
+        finally:
+            session.close()
+        del self.manager.config['tasks']['test']['backlog']
+        self.manager.config['tasks']['test']['mock'] = [{'title': 'entry 3', 'url': 'http://localhost/3'}]
+        self.execute_task('test')
+        # expired entries are injected one last time
+        assert len(self.task.entries) == 3, 'entry 3 should have been in the task only once'
+        self.execute_task('test')
+        assert len(self.task.entries) == 1, 'expired entries should have been purged'
+
+    def test_url_after_input(self):
+        from flexget.manager import Session
+        from flexget.plugins.input.backlog import BacklogEntry
+        self.execute_task('rewrite')
+        assert self.task.find_entry('rejected', title='entry 2', url='http://localhost/rewritten')
+        session = Session()
+        try:
+            # The stored entry is the one from input, the url stored with it should be the same
+            backlog_entry = session.query(BacklogEntry).filter(BacklogEntry.task == 'rewrite').one()
+            assert backlog_entry.entry['url'] == 'http://localhost/2'
+            assert backlog_entry.url == 'http://localhost/2'
+        finally:
+            session.close()
@@ -58,3 +58,24 @@ class TestInputCache(FlexGetBase):
         assert self.task.entries, 'should have created entries at the start'
         self.execute_task('test_db')
         assert self.task.entries, 'should have created entries from the cache'
+
+
+class TestFrozenEntry(object):
+
+    def test_copy_on_write(self):
+        from flexget.entry import FrozenEntry
+        original = Entry(title='Test', url='http://test.com', tags=['a'], info={'b': [1]})
+        original.register_lazy_fields(['lazy'], lambda entry, field: entry['title'] + ' lazy')
+        frozen = FrozenEntry(original)
+        first, second = frozen.thaw(), frozen.thaw()
+        assert first['tags'] == ['a'] and first['lazy'] == 'Test lazy'
+        first['tags'].append('b')
+        first['info']['b'].append(2)
+        first['title'] = 'Changed'
+        assert first['lazy'] == 'Changed lazy', 'lazy field should use the new entry'
+        assert second['tags'] == ['a'] and second['info'] == {'b': [1]} and second['title'] == 'Test'
+        assert frozen.thaw()['tags'] == ['a']
+        # Changing the original after freezing does not affect the frozen entry
+        original['tags'].append('c')
+        assert frozen.thaw()['tags'] == ['a']
+        assert second.undecided and not second.accepted
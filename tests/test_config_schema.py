@@ -1,8 +1,12 @@
 from __future__ import unicode_literals, division, absolute_import
+import os
+import shutil
+import tempfile
 
 import jsonschema
 
 from flexget import config_schema
+from flexget.manager import Manager
 from tests import FlexGetBase
 
 
@@ -149,3 +153,47 @@ class TestSchemaValidator(FlexGetBase):
         config = {"p": "foo"}
         config_schema.process_config(config, schema)
         assert config["p"] == "foo"
+
+
+class TestValidationCache(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test:
+            mock:
+              - {title: 'entry 1'}
+    """
+
+    def setup(self):
+        FlexGetBase.setup(self)
+        self.tmpdir = tempfile.mkdtemp()
+        self.manager.validation_cache = os.path.join(self.tmpdir, '.config-validated')
+        self.manager.config['tasks']['test']['exists'] = os.path.join(self.tmpdir, 'exists')
+        os.mkdir(os.path.join(self.tmpdir, 'exists'))
+        # MockManager does not return the errors
+        self.validate_config = lambda: Manager.validate_config(self.manager)
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+        FlexGetBase.teardown(self)
+
+    def test_cached_validation(self):
+        assert not self.validate_config()
+        validated = self.manager.config
+        process_config = config_schema.process_config
+
+        def fail(*args, **kwargs):
+            assert False, 'unchanged config was validated again'
+        config_schema.process_config = fail
+        try:
+            assert not self.validate_config()
+        finally:
+            config_schema.process_config = process_config
+        assert self.manager.config == validated
+        # Changed config is validated again
+        self.manager.config['tasks']['test']['invalid_plugin'] = True
+        assert self.validate_config()
+        del self.manager.config['tasks']['test']['invalid_plugin']
+        # So is a config referring to paths which no longer exist
+        os.rmdir(os.path.join(self.tmpdir, 'exists'))
+        assert self.validate_config()
@@ -0,0 +1,269 @@
+from __future__ import unicode_literals, division, absolute_import
+import os
+import shutil
+import tempfile
+
+from tests import FlexGetBase
+
+
+class FileDatabaseBase(FlexGetBase):
+    """Uses a database file, the default in-memory database can only be used by one connection."""
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.database_uri = 'sqlite:///%s' % os.path.join(self.tmpdir, 'test.sqlite').replace('\\', '\\\\')
+        FlexGetBase.setup(self)
+
+    def teardown(self):
+        FlexGetBase.teardown(self)
+        shutil.rmtree(self.tmpdir)
+
+
+class TestSqliteEngine(FileDatabaseBase):
+
+    __yaml__ = """
+        tasks:
+          test:
+            mock:
+              - {title: 'foo.s01e01.720p', url: 'http://localhost/1'}
+            series: [foo]
+            exec:
+              on_output:
+                for_accepted: 'exit 1'
+              fail_entries: yes
+    """
+
+    def test_concurrent_sessions(self):
+        import threading
+        from flexget.manager import Session
+        from flexget.task import TaskConfigHash
+        engine = self.manager.engine
+        assert engine.execute('PRAGMA journal_mode').scalar() == 'wal'
+        assert engine.execute('PRAGMA synchronous').scalar() == 1, 'synchronous should be NORMAL'
+        counts = []
+
+        def read():
+            reader = Session()
+            try:
+                counts.append(reader.query(TaskConfigHash).count())
+            finally:
+                reader.close()
+
+        writer = Session()
+        try:
+            writer.add(TaskConfigHash(task='test', hash='abc'))
+            writer.flush()
+            # Reader in another thread has its own connection and does not wait for the writer
+            reader = threading.Thread(target=read)
+            reader.start()
+            reader.join()
+            writer.commit()
+            read()
+        finally:
+            writer.close()
+        assert counts == [0, 1]
+
+    def test_nested_session(self):
+        from flexget.manager import Session
+        from flexget.plugins.filter.retry_failed import FailedEntry
+        # Failed entries are stored using a new session, while the task session has series changes pending
+        self.execute_task('test')
+        assert not self.task.aborted
+        session = Session()
+        try:
+            assert session.query(FailedEntry).filter(FailedEntry.title == 'foo.s01e01.720p').count() == 1
+        finally:
+            session.close()
+
+    def test_incremental_vacuum(self):
+        from flexget.manager import Session
+        from flexget.plugins.generic.db_vacuum import incremental_vacuum
+        from flexget.task import TaskConfigHash
+        from flexget.utils.sqlalchemy_utils import sqlite_page_stats
+        session = Session()
+        try:
+            assert sqlite_page_stats(session)['auto_vacuum'] == 2, 'new database should use incremental vacuum'
+            session.add_all(TaskConfigHash(task='task %s' % i, hash='x' * 1000) for i in range(500))
+            session.commit()
+            session.query(TaskConfigHash).delete()
+            session.commit()
+            free = sqlite_page_stats(session)['freelist_count']
+            assert free > 10
+            assert incremental_vacuum(session, pages=10) == free
+            stats = sqlite_page_stats(session)
+            assert stats['freelist_count'] == 0 and stats['free_ratio'] == 0
+        finally:
+            session.close()
+
+    def test_no_automatic_conversion(self):
+        from flexget.manager import Session
+        from flexget.plugins.generic.db_vacuum import on_cleanup, vacuum_recommendation
+        from flexget.utils.sqlalchemy_utils import sqlite_page_stats
+        session = Session()
+        try:
+            session.execute('PRAGMA auto_vacuum = NONE')
+            session.execute('VACUUM')
+            # Converting needs full VACUUM, which is left for `flexget database vacuum`
+            on_cleanup(session)
+            stats = sqlite_page_stats(session)
+            assert stats['auto_vacuum'] == 0
+            assert vacuum_recommendation(stats)
+        finally:
+            session.close()
+
+
+class TestSqliteStats(object):
+
+    def test_fragmentation(self):
+        from sqlalchemy import create_engine
+        from flexget.plugins.generic.db_vacuum import vacuum_recommendation
+        from flexget.utils.sqlalchemy_utils import sqlite_page_stats
+        connection = create_engine('sqlite://').connect()
+        try:
+            connection.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            connection.execute('CREATE TABLE a (data TEXT)')
+            connection.execute('CREATE TABLE b (data TEXT)')
+            # Rows filling a page each, the tables take turns getting the next page
+            for i in range(50):
+                connection.execute("INSERT INTO a VALUES (?)", 'x' * 3000)
+                connection.execute("INSERT INTO b VALUES (?)", 'x' * 3000)
+            stats = sqlite_page_stats(connection, fragmentation=True)
+            assert stats['fragmentation'] > 0.9, stats
+            assert 'fragmented' in vacuum_recommendation(stats)
+            connection.execute('VACUUM')
+            stats = sqlite_page_stats(connection, fragmentation=True)
+            assert stats['fragmentation'] < 0.1, stats
+            assert not vacuum_recommendation(stats)
+        finally:
+            connection.close()
+
+
+class TestDbCleanup(FileDatabaseBase):
+    # Cleanup only runs in the background with a database file
+
+    __yaml__ = """
+        tasks:
+          test:
+            mock: []
+    """
+
+    def setup(self):
+        import threading
+        from flexget.event import add_event_handler
+        FileDatabaseBase.setup(self)
+        self.calls = {'first': 0, 'second': 0, 'third': 0}
+        self.entered = threading.Event()
+        self.proceed = threading.Event()
+        self.fail = False
+        self.handlers = [self.first, self.second, self.third]
+        for handler, priority in zip(self.handlers, [255, 2, 1]):
+            add_event_handler('manager.db_cleanup.batch', handler, priority=priority)
+
+    def teardown(self):
+        from flexget.event import remove_event_handler
+        self.proceed.set()
+        for handler in self.handlers:
+            remove_event_handler('manager.db_cleanup.batch', handler)
+        FileDatabaseBase.teardown(self)
+
+    def first(self, session, batch_size):
+        self.calls['first'] += 1
+        return 0
+
+    def second(self, session, batch_size):
+        self.calls['second'] += 1
+        self.entered.set()
+        self.proceed.wait()
+        if self.fail:
+            raise ValueError('cleanup failed')
+        # Remove one row per batch, three in total
+        return 1 if self.calls['second'] <= 3 else 0
+
+    def third(self, session, batch_size):
+        self.calls['third'] += 1
+        return 0
+
+    def handler_name(self, handler):
+        return '%s.%s' % (handler.__module__, handler.__name__)
+
+    def wait_cleanup(self):
+        thread = self.manager._cleanup_thread
+        assert thread, 'cleanup should run in a background thread'
+        thread.join(10)
+        assert not thread.is_alive(), 'cleanup did not finish'
+
+    def test_background(self):
+        import threading
+        self.manager.db_cleanup(force=True)
+        assert self.entered.wait(5), 'cleanup did not start'
+        thread = self.manager._cleanup_thread
+        assert thread.is_alive()
+        # Concurrent calls from job threads must not start another cleanup
+        callers = [threading.Thread(target=self.manager.db_cleanup, kwargs={'force': True}) for _ in range(5)]
+        for caller in callers:
+            caller.start()
+        for caller in callers:
+            caller.join()
+        assert self.manager._cleanup_thread is thread
+        self.proceed.set()
+        self.wait_cleanup()
+        assert self.calls == {'first': 1, 'second': 4, 'third': 1}
+        assert 'db_cleanup_progress' not in self.manager.persist
+        assert 'last_cleanup' in self.manager.persist
+
+    def test_stop_and_resume(self):
+        import threading
+        from tests import MockManager
+        self.manager.db_cleanup(force=True)
+        assert self.entered.wait(5), 'cleanup did not start'
+        shutdown = threading.Thread(target=self.manager.shutdown)
+        shutdown.start()
+        assert self.manager._cleanup_stop.wait(5), 'shutdown did not stop cleanup'
+        self.proceed.set()
+        shutdown.join(10)
+        assert not shutdown.is_alive(), 'shutdown did not finish'
+        assert self.calls == {'first': 1, 'second': 1, 'third': 0}
+        progress = self.manager.persist['db_cleanup_progress']
+        assert self.handler_name(self.first) in progress['finished']
+        assert self.handler_name(self.second) not in progress['finished']
+        assert progress['deleted'] == {self.handler_name(self.second): 1}
+        assert 'last_cleanup' not in self.manager.persist
+        # Continues where it stopped after a restart, without running finished handlers again
+        self.manager.__del__()
+        self.manager = MockManager(self.__yaml__, self.__class__.__name__, db_uri=self.database_uri)
+        self.manager.db_cleanup()
+        self.wait_cleanup()
+        assert self.calls == {'first': 1, 'second': 4, 'third': 1}
+        assert 'db_cleanup_progress' not in self.manager.persist
+        assert 'last_cleanup' in self.manager.persist
+
+    def test_failed_handler(self):
+        self.fail = True
+        self.proceed.set()
+        self.manager.db_cleanup(force=True)
+        self.wait_cleanup()
+        progress = self.manager.persist['db_cleanup_progress']
+        assert self.handler_name(self.second) not in progress['finished'], 'failed handler should stay unfinished'
+        assert progress['failed'] == {self.handler_name(self.second): 1}
+        assert self.calls['third'] == 1, 'handlers after the failed one should run'
+        assert 'last_cleanup' not in self.manager.persist, 'failed cleanup should not count as run'
+        self.fail = False
+        self.manager.db_cleanup()
+        self.wait_cleanup()
+        assert self.calls == {'first': 1, 'second': 4, 'third': 1}
+        assert 'db_cleanup_progress' not in self.manager.persist
+        assert 'last_cleanup' in self.manager.persist
+
+    def test_give_up(self):
+        from flexget import manager
+        self.fail = True
+        self.proceed.set()
+        self.manager.db_cleanup(force=True)
+        for attempt in range(1, manager.DB_CLEANUP_ATTEMPTS):
+            self.wait_cleanup()
+            assert self.manager.persist['db_cleanup_progress']['failed'] == {self.handler_name(self.second): attempt}
+            self.manager.db_cleanup()
+        self.wait_cleanup()
+        assert self.calls == {'first': 1, 'second': manager.DB_CLEANUP_ATTEMPTS, 'third': 1}
+        assert 'db_cleanup_progress' not in self.manager.persist, 'failing handler should have been given up'
+        assert 'last_cleanup' in self.manager.persist
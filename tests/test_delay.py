@@ -28,3 +28,25 @@ class TestDelay(FlexGetBase):
         # Make sure entry is only injected once
         self.execute_task('test')
         assert not self.task.entries, 'Entry should only be insert'
+
+
+class TestDelayExcludeFields(FlexGetBase):
+    __yaml__ = """
+        entry_storage:
+          exclude_fields: [description]
+        tasks:
+          test:
+            mock:
+              - {title: 'entry 1', description: 'long description'}
+            delay: 1 hours
+        """
+
+    def test_exclude_fields(self):
+        self.execute_task('test')
+        session = Session()
+        for entry in session.query(DelayedEntry).all():
+            entry.expire = entry.expire - timedelta(hours=1)
+        session.commit()
+        self.execute_task('test')
+        assert self.task.entries, 'Entry should have passed delay and been inserted'
+        assert 'description' not in self.task.entries[0], 'excluded field should not have been stored'
@@ -1,5 +1,5 @@
 from __future__ import unicode_literals, division, absolute_import
-from tests import FlexGetBase
+from tests import FlexGetBase, util
 
 
 class TestInputs(FlexGetBase):
@@ -44,3 +44,62 @@ class TestInputs(FlexGetBase):
         # TODO: fix this
         self.execute_task('test_no_url')
         assert len(self.task.entries) == 2, 'Should have created 2 entries'"""
+
+
+class TestParallelInputs(FlexGetBase):
+
+    __tmp__ = True
+    __yaml__ = """
+        tasks:
+          test_sequential:
+            mock:
+              - {title: 'mock title', url: 'http://mock'}
+            rss:
+              url: rss.xml
+              silent: yes
+            inputs:
+              - rss: {url: rss.xml, silent: yes, link: otherlink}
+              - mock:
+                  - {title: 'inputs title', url: 'http://inputs'}
+          test_parallel:
+            parallel_inputs: 2
+            mock:
+              - {title: 'mock title', url: 'http://mock'}
+            rss:
+              url: rss.xml
+              silent: yes
+            inputs:
+              - rss: {url: rss.xml, silent: yes, link: otherlink}
+              - mock:
+                  - {title: 'inputs title', url: 'http://inputs'}
+          test_persistence:
+            parallel_inputs: yes
+            rss:
+              url: rss.xml
+              silent: yes
+              all_entries: no
+    """
+
+    def setup(self):
+        # Worker threads use database connections of their own, which does not work with an in-memory database
+        self.database_uri = 'sqlite:///%s/test.sqlite' % util.maketemp()
+        super(TestParallelInputs, self).setup()
+
+    def test_same_entries(self):
+        self.execute_task('test_sequential')
+        sequential = [e['title'] for e in self.task.entries]
+        assert 'inputs title' in sequential
+        from flexget.utils.cached_input import cached
+        cached.cache.clear()
+        self.execute_task('test_parallel')
+        assert [e['title'] for e in self.task.entries] == sequential, \
+            'Parallel inputs should produce the same entries in the same order'
+
+    def test_persistence(self):
+        self.execute_task('test_persistence')
+        assert self.task.entries, 'Entries should have been produced on first run.'
+        # reset input cache so that the cache is not used for second execution
+        from flexget.utils.cached_input import cached
+        cached.cache.clear()
+        self.execute_task('test_persistence')
+        assert not self.task.entries, 'rss should have remembered the last entry from a worker thread.'
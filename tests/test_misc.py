@@ -1,4 +1,5 @@
 from __future__ import unicode_literals, division, absolute_import
+import copy
 import os
 import stat
 from tests import FlexGetBase
@@ -161,6 +162,174 @@ class TestEntryUnicodeError(object):
         e['invalid'] = b'\x8e'
 
 
+class TestEntryContainer(object):
+
+    def test_states(self):
+        from flexget.task import EntryContainer
+        container = EntryContainer(Entry('entry %s' % i, 'http://localhost/%s' % i) for i in range(10))
+        container[7].accept()
+        container.append(Entry('entry 10', 'http://localhost/10'))
+        container[10].accept()
+        container[2].accept()
+        container[2].reject()
+        assert [e['title'] for e in container.accepted] == ['entry 7', 'entry 10']
+        assert len(container.entries) == 10 and len(container.rejected) == 1
+        assert container.accepted[1] is container[10]
+        assert container[2] in container.rejected and container[2] not in container.entries
+        # rejecting entries while iterating must not skip any
+        for entry in container.entries:
+            entry.reject()
+        assert not container.entries and len(container.rejected) == 11
+        container[:] = container[5:]
+        container.append(Entry('entry 11', 'http://localhost/11'))
+        assert container.undecided[0] is container[-1]
+        assert len(container.rejected) == 6
+
+
+class TestFrozenConfig(object):
+
+    @raises(TypeError)
+    def test_frozen(self):
+        from flexget.utils.frozen import freeze
+        freeze({'a': {'b': 1}})['a']['b'] = 2
+
+    def test_thaw(self):
+        from flexget.utils.frozen import freeze, thaw
+        frozen = freeze({'a': {'b': [1, {'c': 2}]}, 'd': {'e': 'f'}})
+        thawed = thaw(frozen)
+        thawed['a']['b'][1]['c'] = 3
+        thawed['a']['b'].append(4)
+        assert frozen == {'a': {'b': [1, {'c': 2}]}, 'd': {'e': 'f'}}
+        assert thawed == {'a': {'b': [1, {'c': 3}, 4]}, 'd': {'e': 'f'}}
+        # Parts which were not accessed are shared
+        assert freeze(thawed)['d'] is frozen['d']
+        assert type(copy.deepcopy(frozen)['a']['b'][1]) is dict
+
+    def test_copy(self):
+        from flexget.utils.frozen import freeze, thaw, unfreeze
+        frozen = freeze({'a': {'b': [1]}})
+        for copied in (frozen.copy(), thaw(frozen).copy(), copy.copy(thaw(frozen))):
+            copied['a']['b'].append(2)
+            assert copied == {'a': {'b': [1, 2]}}
+        # Plain dict copies read the raw values, unfreeze gives a modifiable one
+        plain = unfreeze(thaw(frozen))
+        plain['a']['b'].append(2)
+        assert frozen == {'a': {'b': [1]}}
+
+
+class TestEntryCodec(object):
+
+    def test_roundtrip(self):
+        import pickle
+        from datetime import datetime, date, timedelta
+        from dateutil.tz import tzoffset
+        from flexget.utils.entry_codec import encode_entry, decode_entry
+        from flexget.utils.qualities import Quality
+        entry = Entry('title \u2500', 'http://localhost/1')
+        entry.update({'int': -5, 'long': 2 ** 70, 'float': 1.5, 'bool': False, 'none': None,
+                      'list': [1, 'a', {'b': (2, 3)}], 'set': set([1, 2]), 'date': date(2014, 1, 2),
+                      'datetime': datetime(2014, 1, 2, 3, 4, 5, 6), 'timedelta': timedelta(days=-1, seconds=5),
+                      'aware': datetime(2014, 1, 2, tzinfo=tzoffset(None, -3600)), 'quality': Quality('720p hdtv'),
+                      'object': object(), 'mixed': [1, object()], 'skip': 'me'})
+        entry.register_lazy_fields(['lazy'], lambda entry, field: 'lazy')
+        data = encode_entry(entry, exclude=['skip'])
+        decoded = decode_entry(data)
+        expected = dict(entry, mixed=[1])
+        for field in 'object', 'skip', 'lazy':
+            del expected[field]
+        assert decoded == expected
+        assert type(decoded['quality']) is Quality
+        assert decode_entry(encode_entry({'bytes': b'\x8e', 'ints': [0, -1, 2 ** 63, -2 ** 70]})) == \
+            {'bytes': b'\x8e', 'ints': [0, -1, 2 ** 63, -2 ** 70]}
+        assert len(data) < len(pickle.dumps(dict(expected), pickle.HIGHEST_PROTOCOL))
+        # Entries stored before were pickled
+        assert decode_entry(buffer(pickle.dumps({'title': 'old'}, pickle.HIGHEST_PROTOCOL))) == {'title': 'old'}
+
+    def test_quality(self):
+        from flexget.utils import qualities
+        from flexget.utils.entry_codec import encode_entry, decode_entry
+        for quality in [qualities.Quality('720p hdtv'), qualities.get('720p hdtv'), qualities.Quality(),
+                        qualities.Quality('hdtv').replace(resolution=qualities.get('720p').resolution)]:
+            decoded = decode_entry(encode_entry({'quality': quality}))['quality']
+            assert decoded.name == quality.name and decoded == quality
+
+    def test_compress(self):
+        from flexget.utils.entry_codec import encode_entry, decode_entry
+        entry = {'title': 'long', 'description': 'x' * 2000}
+        data = encode_entry(entry)
+        assert len(data) < 200
+        assert decode_entry(data) == entry
+
+
+class TestRerunInjection(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test:
+            mock:
+              - {title: 'entry 1'}
+            accept_all: yes
+            mock_output: yes
+            rerun: 2
+            disable_builtins: yes
+    """
+
+    def test_inputs_not_called(self):
+        self.execute_task('test')
+        assert self.task._rerun_count == 2
+        # mock generates random urls, same url on every run means entries of the first run were injected
+        urls = set(e['url'] for e in self.task.mock_output)
+        assert len(self.task.mock_output) == 3 and len(urls) == 1, 'input was called again on rerun'
+
+
+class TestRerunVolatileInputs(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test:
+            inputs:
+              - emit_series: {from_start: yes}
+            series:
+              - My Show:
+                  identified_by: ep
+            mock_output: yes
+    """
+
+    def test_sub_input_called(self):
+        self.execute_task('test')
+        # emit_series emits the next episode on every rerun, even when called through inputs
+        titles = [e['title'] for e in self.task.mock_output]
+        assert titles[:3] == ['My Show S01E01', 'My Show S01E02', 'My Show S01E03']
+        assert len(set(titles)) == len(titles), 'entries of the first run were injected again'
+
+
+class TestPhasePlan(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test:
+            mock:
+              - {title: 'entry 1'}
+            accept_all: yes
+    """
+
+    def test_plan_cache(self):
+        from flexget.plugin import get_plugin_by_name
+        from flexget.task import phase_plan
+        names = frozenset(['mock', 'accept_all'])
+        plan = phase_plan('filter', names)
+        assert get_plugin_by_name('accept_all') in plan
+        assert phase_plan('filter', names) is plan
+        handler = get_plugin_by_name('accept_all').phase_handlers['filter']
+        priority = handler.priority
+        handler.priority = 1000
+        try:
+            assert phase_plan('filter', names)[0].name == 'accept_all', 'plan was not updated'
+        finally:
+            handler.priority = priority
+        assert phase_plan('filter', names) == plan
+
+
 class TestFilterRequireField(FlexGetBase):
 
     __yaml__ = """
@@ -0,0 +1,123 @@
+from __future__ import unicode_literals, division, absolute_import
+
+from flexget.plugins.cli import performance
+from flexget.plugins.cli.performance import fingerprint, record_query, query_report
+from tests import FlexGetBase
+
+
+class TestQueryFingerprint(object):
+
+    def test_parameters(self):
+        assert fingerprint("SELECT a FROM b WHERE c = 'foo''s' AND d = 5 LIMIT ?") == \
+            'SELECT a FROM b WHERE c = ? AND d = ? LIMIT ?'
+        assert fingerprint('SELECT a_1\n  FROM b WHERE c IN (?, ?, ?)') == fingerprint('SELECT a_1 FROM b WHERE c IN (?)')
+        assert fingerprint('INSERT INTO b (c, d) VALUES (?, ?)') == 'INSERT INTO b (c, d) VALUES (?, ?)'
+
+
+class TestQueryStats(object):
+
+    def setup(self):
+        performance.query_stats.clear()
+
+    def teardown(self):
+        performance.query_stats.clear()
+        performance._current.caller = None
+
+    def test_record(self):
+        performance._current.caller = ('test', 'filter', 'seen')
+        record_query("SELECT a FROM b WHERE c = 'x'", 0.5, 2)
+        stats = record_query("SELECT a FROM b WHERE c = 'y'", 0.25, 1)
+        performance._current.caller = None
+        assert record_query("SELECT a FROM b WHERE c = 'z'", 0.25, 0) is stats
+        assert stats['count'] == 3 and stats['took'] == 1 and stats['rows'] == 3
+        assert stats['callers'] == {('test', 'filter', 'seen'): 2, (None, None, None): 1}
+        assert performance.query_stats.keys() == ['SELECT a FROM b WHERE c = ?']
+
+    def test_report(self):
+        performance._current.caller = ('test', 'filter', 'seen')
+        for i in range(3):
+            record_query('SELECT a FROM b WHERE c = %s' % i, 0.1, 1)
+        performance._current.caller = None
+        record_query('DELETE FROM b', 2, 5)
+        lines = query_report(top=1)
+        assert lines == [
+            'Slowest queries:',
+            '     1 times, took 2.000 sec, 5 rows: DELETE FROM b',
+            '       by no plugin (1)',
+            'Most repeated queries:',
+            '     3 times, took 0.300 sec, 3 rows: SELECT a FROM b WHERE c = ?',
+            '       by test/filter/seen (3)'], lines
+        assert len(query_report()) == 10
+
+
+class TestHooks(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test:
+            mock:
+              - {title: 'entry 1', url: 'http://localhost/1'}
+    """
+
+    def teardown(self):
+        # Leave SQLAlchemy unpatched for the other tests
+        performance.uninstall()
+        performance.performance.clear()
+        performance.query_stats.clear()
+        performance._start.clear()
+        FlexGetBase.teardown(self)
+
+    def handlers(self, name, func):
+        from flexget.event import get_events
+        return [e for e in get_events(name) if e.func is func]
+
+    def test_registered_once(self):
+        from sqlalchemy.engine import ResultProxy
+        self.manager.options.execute.debug_perf = True
+        try:
+            performance.startup(self.manager)
+            process_rows = ResultProxy.__dict__['process_rows']
+            performance.startup(self.manager)
+        finally:
+            self.manager.options.execute.debug_perf = False
+        assert ResultProxy.__dict__['process_rows'] is process_rows, 'ResultProxy should be patched once'
+        assert len(self.handlers('task.execute.before_plugin', performance.before_plugin)) == 1, \
+            'event handlers should be registered once'
+        self.execute_task('test', options={'debug_perf': True})
+        callers = set()
+        for stats in performance.query_stats.itervalues():
+            callers.update(stats['callers'])
+        assert ('test', 'filter', 'seen') in callers, 'queries of seen filter should be recorded'
+        assert any(stats['rows'] for stats in performance.query_stats.itervalues()), 'rows should be counted'
+        assert performance.performance['test']['seen']['queries']
+
+    def test_only_debug_executions(self):
+        performance.install()
+        self.execute_task('test')
+        assert not performance.query_stats, 'execution without --debug-perf should not be recorded'
+        assert not performance.performance
+        self.execute_task('test', options={'debug_perf': True})
+        assert performance.query_stats and performance.performance
+        performance.log_results(self.manager)
+        assert performance.query_stats, 'report is only given for --debug-perf executions'
+        self.manager.options.execute.debug_perf = True
+        try:
+            performance.log_results(self.manager)
+        finally:
+            self.manager.options.execute.debug_perf = False
+        assert not performance.query_stats and not performance.performance and not performance._start, \
+            'statistics should be cleared after the report'
+
+    def test_uninstall(self):
+        from sqlalchemy import event as sa_event
+        from sqlalchemy.engine import Connection, Engine, ResultProxy
+        execute, process_rows = Connection.__dict__['execute'], ResultProxy.__dict__['process_rows']
+        performance.install()
+        assert Connection.__dict__['execute'] is not execute
+        performance.uninstall()
+        assert Connection.__dict__['execute'] is execute
+        assert ResultProxy.__dict__['process_rows'] is process_rows
+        assert not sa_event.contains(Engine, 'before_cursor_execute', performance._before_cursor_execute)
+        assert not sa_event.contains(Engine, 'after_cursor_execute', performance._after_cursor_execute)
+        for name, handler in performance._handlers:
+            assert not self.handlers(name, handler), '%s handler left registered' % name
@@ -1,6 +1,10 @@
 from __future__ import unicode_literals, division, absolute_import
 import os
 import glob
+import shutil
+import subprocess
+import sys
+import tempfile
 
 from nose.tools import raises
 
@@ -61,6 +65,79 @@ class TestPluginApi(object):
         assert 'test_html' in plugin.plugins
 
 
+class TestEvents(object):
+
+    def test_priority_order(self):
+        from flexget.event import add_event_handler, fire_event, remove_event_handlers
+        calls = []
+        add_event_handler('test.priority', lambda: calls.append('low'), priority=10)
+        high = add_event_handler('test.priority', lambda: calls.append('high'), priority=200)
+        try:
+            fire_event('test.priority')
+            assert calls == ['high', 'low']
+            # Changing priority must reorder the handlers
+            high.priority = 1
+            fire_event('test.priority')
+            assert calls == ['high', 'low', 'low', 'high']
+        finally:
+            remove_event_handlers('test.priority')
+        fire_event('test.priority')
+        assert len(calls) == 4
+
+    def test_remove_handler(self):
+        from flexget.event import add_event_handler, fire_event, remove_event_handler, remove_event_handlers
+        calls = []
+
+        def first():
+            calls.append('first')
+
+        def second():
+            calls.append('second')
+
+        add_event_handler('test.remove', first)
+        add_event_handler('test.remove', second)
+        try:
+            # Handlers with the same priority must not be mixed up
+            remove_event_handler('test.remove', second)
+            fire_event('test.remove')
+            assert calls == ['first']
+        finally:
+            remove_event_handlers('test.remove')
+
+
+class TestPluginManifest(object):
+
+    # Loads plugins into a fresh interpreter, prints whether regexp module was imported before and after it was used
+    script = """
+import sys
+from flexget import logger, plugin
+logger.initialize(True)
+plugin.load_plugins()
+module = 'flexget.plugins.filter.regexp'
+before = module in sys.modules
+assert 'filter' in plugin.plugins['regexp'].phase_handlers
+plugin.get_plugin_by_name('regexp').instance
+print before, module in sys.modules, plugin.plugins['regexp'].phase_priority('filter')
+"""
+
+    def setup(self):
+        self.tempdir = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.tempdir)
+
+    def load(self):
+        env = dict(os.environ, FLEXGET_PLUGIN_MANIFEST=os.path.join(self.tempdir, 'manifest.json'))
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        process = subprocess.Popen([sys.executable, '-c', self.script], env=env, cwd=root, stdout=subprocess.PIPE)
+        return process.communicate()[0].split()
+
+    def test_lazy_loading(self):
+        assert self.load() == ['True', 'True', '172'], 'plugins should be imported on the first load'
+        assert os.path.exists(os.path.join(self.tempdir, 'manifest.json')), 'manifest was not written'
+        assert self.load() == ['False', 'True', '172'], 'regexp should be imported only when used'
+
+
 class TestExternalPluginLoading(FlexGetBase):
     __yaml__ = """
         tasks:
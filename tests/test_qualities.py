@@ -14,6 +14,31 @@ class TestQualityModule(object):
             got_val = Quality(test_val).name
             assert got_val == '720p', got_val
 
+    def test_memoized(self):
+        quality = Quality('Test.File.720p.HDTV.x264')
+        assert Quality('Test.File.720p.HDTV.x264') is quality, 'parsed quality should be reused'
+        assert quality.clean_text.lower() == 'test.file...', quality.clean_text
+        try:
+            quality.resolution = Quality('1080p').resolution
+        except AttributeError:
+            pass
+        else:
+            assert False, 'shared quality should not be modifiable'
+        replaced = quality.replace(resolution=Quality('1080p').resolution)
+        assert replaced.name == '1080p hdtv h264', replaced.name
+        assert quality.name == '720p hdtv h264', 'replace should not modify original'
+
+    def test_compiled_requirements(self):
+        from flexget.utils.qualities import Requirements, all_components
+        quals = [Quality().replace(resolution=res, source=src) for res in all_components() for src in all_components()
+                 if res.type == 'resolution' and src.type == 'source']
+        for text in ['720p', '<=720p hdtv+', '720p-1080p !webdl', 'hdtv|webrip >480p', 'any']:
+            req = Requirements(text)
+            for qual in quals:
+                for loose in (False, True):
+                    expected = all(r.allows(q, loose=loose) for r, q in zip(req.components, qual.components))
+                    assert req.allows(qual, loose=loose) == expected, '%s %s loose=%s' % (text, qual, loose)
+
 
 class TestQualityParser(object):
 
@@ -18,3 +18,52 @@ class TestRememberRejected(FlexGetBase):
         self.execute_task('test')
         assert self.task.find_entry('rejected', title='title 1', rejected_by='remember_rejected'),\
             'remember_rejected should have rejected'
+
+
+class TestRememberRejectedMany(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test:
+            mock:
+              - {title: 'title 1', url: 'http://localhost/title1'}
+              - {title: 'title 2', url: 'http://localhost/title2'}
+              - {title: 'title 3', url: 'http://localhost/title3'}
+            only_new: yes
+            disable_builtins: [seen]
+    """
+
+    def test_remember_many(self):
+        self.execute_task('test')
+        self.execute_task('test')
+        assert len(self.task.rejected) == 3, 'all entries should have been remembered'
+        for entry in self.task.rejected:
+            assert entry['rejected_by'] == 'remember_rejected', '%s rejected by %s' % (entry['title'],
+                                                                                    entry['rejected_by'])
+
+    def test_cleanup(self):
+        from datetime import datetime, timedelta
+        from flexget import manager
+        from flexget.plugins.filter.remember_rejected import RememberEntry
+        self.execute_task('test')
+        session = manager.Session()
+        session.query(RememberEntry).update({'added': datetime.now() - timedelta(days=31)})
+        session.commit()
+        batch_size, time_budget = manager.DB_CLEANUP_BATCH_SIZE, manager.DB_CLEANUP_TIME_BUDGET
+        # Handlers stop after one batch and continue on next run
+        manager.DB_CLEANUP_BATCH_SIZE, manager.DB_CLEANUP_TIME_BUDGET = 2, timedelta(0)
+        try:
+            self.manager.db_cleanup(force=True)
+            assert session.query(RememberEntry).count() == 1
+            assert 'db_cleanup_progress' in self.manager.persist
+            self.manager.db_cleanup()
+            assert session.query(RememberEntry).count() == 0
+            for _ in range(10):
+                if 'db_cleanup_progress' not in self.manager.persist:
+                    break
+                self.manager.db_cleanup()
+            else:
+                assert False, 'cleanup did not finish'
+        finally:
+            manager.DB_CLEANUP_BATCH_SIZE, manager.DB_CLEANUP_TIME_BUDGET = batch_size, time_budget
+            session.close()
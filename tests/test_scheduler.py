@@ -0,0 +1,123 @@
+from __future__ import unicode_literals, division, absolute_import
+import sys
+import threading
+from StringIO import StringIO
+
+from flexget.event import add_event_handler, remove_event_handler
+from flexget.scheduler import Job
+from tests.test_database import FileDatabaseBase
+
+
+class TestScheduler(FileDatabaseBase):
+    # Jobs run in threads of their own, which need a database they can all see
+
+    __yaml__ = """
+        schedules:
+          max_workers: 2
+          triggers:
+            - tasks: [a]
+              interval:
+                minutes: 1
+        tasks:
+          a:
+            mock: []
+            sleep: 0.5
+          b:
+            mock: []
+            sleep: 0.5
+          c:
+            mock: []
+            sleep: 0.5
+    """
+
+    def setup(self):
+        FileDatabaseBase.setup(self)
+        self.scheduler = self.manager.scheduler
+        self.lock = threading.Lock()
+        self.started = []
+        self.running = 0
+        self.peak = 0
+        add_event_handler('task.execute.before_plugin', self.before_plugin)
+        add_event_handler('task.execute.after_plugin', self.after_plugin)
+
+    def teardown(self):
+        remove_event_handler('task.execute.before_plugin', self.before_plugin)
+        remove_event_handler('task.execute.after_plugin', self.after_plugin)
+        FileDatabaseBase.teardown(self)
+
+    def before_plugin(self, task, keyword):
+        if keyword != 'sleep':
+            return
+        with self.lock:
+            self.started.append(task.name)
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        sys.stdout.write('stdout of %s\n' % task.name)
+
+    def after_plugin(self, task, keyword):
+        if keyword != 'sleep':
+            return
+        with self.lock:
+            self.running -= 1
+
+    def run_queue(self):
+        self.scheduler.start(run_schedules=False)
+        self.scheduler.shutdown(finish_queue=True)
+        self.scheduler.wait()
+
+    def test_max_workers(self):
+        assert self.scheduler.max_workers == 2, 'max_workers should be loaded from the config'
+        events = self.scheduler.execute(options={'tasks': ['a', 'b', 'c']})
+        self.run_queue()
+        assert all(e.is_set() for e in events), 'all jobs should have finished'
+        assert sorted(self.started) == ['a', 'b', 'c']
+        assert self.peak == 2, 'expected 2 jobs running at the same time, got %s' % self.peak
+
+    def test_priority(self):
+        self.scheduler.max_workers = 1
+        self.scheduler.execute(options={'tasks': ['c']}, priority=3)
+        self.scheduler.execute(options={'tasks': ['a']}, priority=2)
+        self.scheduler.execute(options={'tasks': ['b']}, priority=1)
+        self.run_queue()
+        assert self.started == ['b', 'a', 'c'], 'jobs should run in priority order, got %s' % self.started
+        assert self.peak == 1
+
+    def test_same_task_not_concurrent(self):
+        self.scheduler.execute(options={'tasks': ['a']})
+        self.scheduler.execute(options={'tasks': ['a']})
+        self.run_queue()
+        assert self.started == ['a', 'a']
+        assert self.peak == 1, 'the same task should never run twice at the same time'
+
+    def test_trigger_guard(self):
+        trigger = self.scheduler.triggers[0]
+        assert trigger.should_run
+        running = Job('a', trigger_id=trigger.uid)
+        self.scheduler._running_jobs.append(running)
+        self.scheduler.queue_pending_jobs()
+        assert not self.scheduler.run_queue.qsize(), 'trigger fired while its last job was still running'
+        assert trigger.should_run, 'trigger should stay due'
+        self.scheduler._running_jobs.remove(running)
+        self.scheduler.queue_pending_jobs()
+        assert self.scheduler.run_queue.qsize() == 1
+        assert self.scheduler.run_queue.queue[0].trigger_id == trigger.uid
+        assert not trigger.should_run, 'next run should have been scheduled'
+        # A queued job from the trigger blocks it as well
+        trigger.run_at = trigger.last_run
+        self.scheduler.queue_pending_jobs()
+        assert self.scheduler.run_queue.qsize() == 1
+
+    def test_log_capture(self):
+        outputs = {'a': StringIO(), 'b': StringIO()}
+        for name, output in outputs.iteritems():
+            self.scheduler.execute(options={'tasks': [name]}, output=output)
+        self.run_queue()
+        assert self.peak == 2, 'jobs should have run concurrently'
+        for name, output in outputs.iteritems():
+            other = 'b' if name == 'a' else 'a'
+            lines = output.getvalue().splitlines()
+            assert 'stdout of %s' % name in lines, 'stdout of job %s was not captured' % name
+            assert 'stdout of %s' % other not in lines, 'stdout of job %s leaked into job %s' % (other, name)
+            logged = [line for line in lines if 'Sleeping for' in line]
+            assert len(logged) == 1, 'expected log of job %s only, got %s' % (name, logged)
+            assert logged[0].split()[4] == name, 'log line of another job captured: %s' % logged[0]
@@ -1,5 +1,6 @@
 from __future__ import unicode_literals, division, absolute_import
 from tests import FlexGetBase
+from flexget.event import fire_event
 
 
 class TestFilterSeen(FlexGetBase):
@@ -48,6 +49,24 @@ class TestFilterSeen(FlexGetBase):
             'Item should not have been rejected because of number field'
 
 
+class TestSeenMany(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test:
+            accept_all: yes
+            mock:
+%s
+    """ % '\n'.join("              - {title: 'Title %s', url: 'http://localhost/%s'}" % (i, i) for i in range(1000))
+
+    def test_many(self):
+        # more values than fit into single query
+        self.execute_task('test')
+        assert len(self.task.accepted) == 1000, 'all entries should be accepted on first run'
+        self.execute_task('test')
+        assert len(self.task.rejected) == 1000, 'all entries should be seen on second run'
+
+
 class TestSeenLocal(FlexGetBase):
 
     __yaml__ = """
@@ -83,6 +102,52 @@ class TestSeenLocal(FlexGetBase):
         assert self.task.find_entry('accepted', title='item 2'), 'item 2 should be accepted'
 
 
+class SeenIndexMixin(object):
+    """Runs the tests with seen index built, as in daemon mode."""
+
+    def setup(self):
+        super(SeenIndexMixin, self).setup()
+        fire_event('manager.daemon.started', self.manager)
+
+    def teardown(self):
+        fire_event('manager.daemon.completed', self.manager)
+        super(SeenIndexMixin, self).teardown()
+
+
+class TestFilterSeenIndex(SeenIndexMixin, TestFilterSeen):
+
+    def test_forget(self):
+        self.execute_task('test')
+        fire_event('forget', 'Seen title 1')
+        self.execute_task('test')
+        assert self.task.find_entry('accepted', title='Seen title 1'), 'forgotten entry should be accepted'
+
+    def test_changed_by_other_process(self):
+        from flexget.manager import Session
+        self.execute_task('test')
+        # Index has synced the fields learned by first run
+        self.execute_task('test')
+        # Another process forgets the latest entry and learns a new one with as many fields
+        session = Session()
+        try:
+            session.execute('DELETE FROM seen_field')
+            session.execute('DELETE FROM seen_entry')
+            session.execute("INSERT INTO seen_entry (title, feed, local, added) "
+                            "VALUES ('Seen title 3', 'other', 0, '2014-01-01 00:00:00')")
+            for field, value in [('title', 'Seen title 3'), ('url', 'http://localhost/seen3')]:
+                session.execute("INSERT INTO seen_field (seen_entry_id, field, value, added) "
+                                "SELECT id, :field, :value, added FROM seen_entry", {'field': field, 'value': value})
+            session.commit()
+        finally:
+            session.close()
+        self.execute_task('test2')
+        assert self.task.find_entry('rejected', title='Seen title 3'), 'value seen by other process was not found'
+
+
+class TestSeenLocalIndex(SeenIndexMixin, TestSeenLocal):
+    pass
+
+
 class TestFilterSeenMovies(FlexGetBase):
 
     __yaml__ = """
@@ -632,3 +632,27 @@ class TestSeriesParser(object):
         assert s.valid
         s.parse('Not The Show S01E01')
         assert not s.valid
+
+    def test_name_prefixes(self):
+        def could_match(parser, data):
+            return any(data_prefix.startswith(prefix) for prefix in parser.name_prefixes()
+                       for data_prefix in SeriesParser.data_prefixes(data))
+
+        s = SeriesParser('Law & Order (US)', alternate_names=['L&O'])
+        for data in ['Law.and.Order.S01E01', '[group] law & order s01e01', 'HD 720p: LawAndOrder S01E01',
+                     'L&O S01E01', 'Law & Order (US) S01E01']:
+            s.parse(data)
+            assert s.valid, '%s should be valid' % data
+            assert could_match(s, data), '%s should be a possible match' % data
+        assert not could_match(s, 'The Law S01E01'), 'The Law should not be a possible match'
+        assert SeriesParser('Show', name_regexps=['^show']).name_prefixes() is None, \
+            'custom name regexps can match anything'
+
+    def test_regexp_cache(self):
+        from flexget.utils.titles.series import regexp_cache
+        first = self.parse(name='Cached Show (US)', data='Cached Show S01E01')
+        hits = regexp_cache.hits
+        second = self.parse(name='Cached Show (US)', data='Cached Show S01E01')
+        assert regexp_cache.hits == hits + 1, 'name regexps should have been cached'
+        assert first.name_regexps[0] is second.name_regexps[0], 'compiled regexps should be reused'
+        assert second.valid and second.strict_name, 'parenthetical should still turn on strict_name'